@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import config
+from data_loader import ExcelDataLoader
+from node_processor import NodeProcessor
+from graph_file import GraphFile
+from workbook_watcher import sheet_hashes
+from results_visualizer import ResultsVisualizer
+from synthetic_graph import generate_synthetic_sheets, write_workbook
+
+# Times each stage of the application on synthetic workbooks of increasing size, writes the timings to a JSON file
+# and optionally compares them with an earlier run, flagging stages that got slower than the allowed tolerance.
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def time_stage(stage_function, repeats):
+    """
+    Runs a stage several times and returns its median wall-clock time.
+
+    Parameters:
+        stage_function (callable): The stage to time; it is called without arguments.
+        repeats (int): The number of timed runs.
+
+    Returns:
+        float: The median time in seconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        stage_function()
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings)
+
+def benchmark_size(node_count, arguments):
+    """
+    Benchmarks every stage on one synthetic workbook.
+
+    Parameters:
+        node_count (int): The number of nodes to generate.
+        arguments (Namespace): The parsed command-line arguments.
+
+    Returns:
+        dict: Stage names mapped to median times in seconds; stages that were skipped are None.
+    """
+    sheets = generate_synthetic_sheets(node_count, arguments.degree, arguments.city_density, seed=arguments.seed)
+    yield_names = ", ".join(sorted(pd.concat([sheets[config.SHEET_NODE_YIELDS][config.COLUMN_YIELD_1]]).dropna().unique())[:arguments.yields])
+    stages = {"excel_load": None, "snapshot_load": None, "sheet_hashes": None}
+
+    if node_count <= arguments.excel_max_nodes:
+        workbook_directory = tempfile.mkdtemp(prefix="npe_benchmark_")
+        try:
+            workbook_path = os.path.join(workbook_directory, "synthetic.xlsx")
+            write_workbook(sheets, workbook_path)
+            config.SNAPSHOT_DIRECTORY = os.path.join(workbook_directory, "cache")
+
+            def load_sheets(use_snapshot):
+                loaded_sheets = ExcelDataLoader(workbook_path, use_snapshot=use_snapshot).load_sheets(NodeProcessor.REQUIRED_COLUMNS, NodeProcessor.COLUMN_DTYPES)
+                return {sheet_name: loaded_sheets[sheet_name] for sheet_name in loaded_sheets}
+
+            stages["excel_load"] = time_stage(lambda: load_sheets(False), 1)
+            load_sheets(True)
+            stages["snapshot_load"] = time_stage(lambda: load_sheets(True), arguments.repeats)
+            stages["sheet_hashes"] = time_stage(lambda: sheet_hashes(workbook_path), arguments.repeats)
+        finally:
+            shutil.rmtree(workbook_directory, ignore_errors=True)
+
+    stages["lodging_engine_build"] = time_stage(lambda: NodeProcessor(sheets).build_lodging_engine(), arguments.repeats)
+    stages["lodging_merge"] = time_stage(lambda: NodeProcessor(sheets).merge_nodes_with_lodging(), arguments.repeats)
+    stages["graph_build"] = time_stage(lambda: NodeProcessor(sheets).build_node_graph(), arguments.repeats)
+    stages["connection_solve"] = time_stage(lambda: NodeProcessor(sheets).build_connection_solver(), arguments.repeats)
+
+    processor = NodeProcessor(sheets)
+    processor.build_connection_solver()
+    processor.build_yield_index()
+    graph_directory = tempfile.mkdtemp(prefix="npe_benchmark_graph_")
+    try:
+        graph_file = GraphFile(os.path.join(graph_directory, "synthetic.npg"))
+        workbook_hash = f"{node_count:064d}"
+        stages["graph_file_write"] = time_stage(lambda: graph_file.write(processor.node_graph, processor.yield_index, processor.connection_solver, workbook_hash), arguments.repeats)
+        stages["graph_file_open"] = time_stage(lambda: NodeProcessor(sheets).use_graph_file(graph_file, workbook_hash), arguments.repeats)
+    finally:
+        shutil.rmtree(graph_directory, ignore_errors=True)
+    stages["yield_processing"] = time_stage(lambda: processor.process_nodes(yield_names), arguments.repeats)
+    stages["yield_processing_per_yield"] = stages["yield_processing"] / max(len(yield_names.split(",")), 1)
+    stages["ranked_processing_top5"] = time_stage(lambda: processor.process_ranked(yield_names, 5), arguments.repeats)
+    usage_name = processor.build_lodging_engine().resolve_usage("storage")
+    stages["usage_processing"] = time_stage(lambda: (processor.usage_solvers.clear(), processor.process_usage(yield_names, usage_name)), arguments.repeats)
+    stages["yield_processing_parallel"] = time_stage(lambda: processor.process_nodes(yield_names, 0), arguments.repeats)
+    stages["region_router_build"] = time_stage(lambda: (setattr(processor, "region_router", None), processor.build_region_router()), arguments.repeats)
+    stages["region_processing"] = time_stage(lambda: (processor.region_router.clear_solutions(), processor.process_regions(yield_names)), arguments.repeats)
+    random_generator = np.random.default_rng(arguments.seed)
+    player_overlays = [
+        (f"Player {player_number}", {"connected": {str(node_id): True for node_id in random_generator.choice(processor.node_graph.node_ids, node_count // 20, replace=False).tolist()}})
+        for player_number in range(32)
+    ]
+    stages["player_profiles_32"] = time_stage(lambda: processor.process_player_profiles(yield_names, player_overlays), arguments.repeats)
+    stages["lodging_sheet_reload"] = time_stage(lambda: processor.reload_workbook(sheets, [config.SHEET_WORKERS_LODGING]), arguments.repeats)
+
+    all_yield_results = processor.process_nodes(yield_names)
+    output_directory, config.OUTPUT_DIRECTORY = config.OUTPUT_DIRECTORY, tempfile.mkdtemp(prefix="npe_benchmark_html_")
+    try:
+        # The report as the application writes it, streamed into a file
+        stages["html_render"] = time_stage(lambda: ResultsVisualizer.save_html_report(all_yield_results), arguments.repeats)
+    finally:
+        shutil.rmtree(config.OUTPUT_DIRECTORY, ignore_errors=True)
+        config.OUTPUT_DIRECTORY = output_directory
+    return stages
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Measures, in a fresh interpreter, the seconds from start until the GUI window has been shown and painted once.
+GUI_WINDOW_SCRIPT = """
+import os, sys, time
+started_at = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+import npe_gui
+window = npe_gui.NodePathExplorerGUI()
+window.show()
+app.processEvents()
+print(time.perf_counter() - started_at)
+"""
+
+def time_subprocess(command, repeats, environment=None, reported=False):
+    """
+    Runs a command in a fresh interpreter several times and returns its median time.
+
+    Parameters:
+        command (list): The command line.
+        repeats (int): The number of timed runs.
+        environment (dict, optional): Extra environment variables. Defaults to none.
+        reported (bool, optional): Use the seconds the command prints as its last line instead of the wall-clock time. Defaults to False.
+
+    Returns:
+        float: The median time in seconds, or None when the command fails.
+    """
+    timings = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True, cwd=SOURCE_DIRECTORY, env={**os.environ, **(environment or {})})
+        elapsed = time.perf_counter() - started_at
+        if completed.returncode != 0:
+            return None
+        timings.append(float(completed.stdout.strip().splitlines()[-1]) if reported else elapsed)
+    return statistics.median(timings)
+
+def benchmark_startup(arguments):
+    """
+    Benchmarks how quickly the application starts: module import times, the time until the command line prints
+    its first output, and the time until the GUI window is shown, which is skipped when PyQt5 is not installed.
+
+    Parameters:
+        arguments (Namespace): The parsed command-line arguments.
+
+    Returns:
+        dict: Stage names mapped to median times in seconds; stages that were skipped are None.
+    """
+    def import_command(module_name):
+        return [sys.executable, "-c", f"import time; started_at = time.perf_counter(); import {module_name}; print(time.perf_counter() - started_at)"]
+
+    return {
+        "import_main": time_subprocess(import_command("main"), arguments.repeats, reported=True),
+        "import_node_processor": time_subprocess(import_command("node_processor"), arguments.repeats, reported=True),
+        "cli_help_output": time_subprocess([sys.executable, "main.py", "--help"], arguments.repeats),
+        "gui_first_window": time_subprocess([sys.executable, "-c", GUI_WINDOW_SCRIPT, SOURCE_DIRECTORY], arguments.repeats, {"QT_QPA_PLATFORM": "offscreen"}, reported=True),
+    }
+
+def run_metadata(arguments):
+    """
+    Describes the environment and parameters of a benchmark run.
+
+    Parameters:
+        arguments (Namespace): The parsed command-line arguments.
+
+    Returns:
+        dict: The run metadata.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "parameters": {
+            "sizes": arguments.sizes,
+            "degree": arguments.degree,
+            "city_density": arguments.city_density,
+            "yields": arguments.yields,
+            "repeats": arguments.repeats,
+            "seed": arguments.seed,
+        },
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compares stage timings with a baseline run.
+
+    Parameters:
+        results (dict): The current run's results.
+        baseline (dict): An earlier run's results.
+        tolerance (float): The allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        list: Tuples of (size, stage, baseline seconds, current seconds, regressed) for every stage timed in both runs.
+    """
+    comparisons = []
+    for size, stages in results["sizes"].items():
+        baseline_stages = baseline.get("sizes", {}).get(size, {})
+        for stage, seconds in stages.items():
+            baseline_seconds = baseline_stages.get(stage)
+            if seconds is None or baseline_seconds is None:
+                continue
+            comparisons.append((size, stage, baseline_seconds, seconds, seconds > baseline_seconds * (1 + tolerance)))
+    return comparisons
+
+def parse_arguments():
+    """Parse the command-line arguments of the benchmark runner."""
+    parser = argparse.ArgumentParser(description="BDO NodePath Explorer benchmarks")
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")], default=[1000, 10000], help="Comma-separated node counts, e.g. 1000,10000,100000,1000000.")
+    parser.add_argument("--degree", type=float, default=3.0, help="Mean number of connections per node.")
+    parser.add_argument("--city-density", type=float, default=0.03, help="Fraction of nodes that are cities or towns.")
+    parser.add_argument("--yields", type=int, default=20, help="Number of yields processed per query.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per stage; the median is reported.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic graph.")
+    parser.add_argument("--excel-max-nodes", type=int, default=20000, help="Largest size for which an xlsx file is written and the load stages are timed.")
+    parser.add_argument("--output", help="Path of the JSON results file (defaults to benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--baseline", help="Path of an earlier results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a stage is flagged as a regression.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    results = {"metadata": run_metadata(arguments), "sizes": {}}
+    print("Benchmarking startup...")
+    results["sizes"]["startup"] = benchmark_startup(arguments)
+    for stage, seconds in results["sizes"]["startup"].items():
+        print(f"  {stage:<28} {'skipped' if seconds is None else f'{seconds * 1000:10.2f} ms'}")
+    for node_count in arguments.sizes:
+        print(f"Benchmarking {node_count} nodes...")
+        results["sizes"][str(node_count)] = benchmark_size(node_count, arguments)
+        for stage, seconds in results["sizes"][str(node_count)].items():
+            print(f"  {stage:<28} {'skipped' if seconds is None else f'{seconds * 1000:10.2f} ms'}")
+
+    output_path = arguments.output or os.path.join(RESULTS_DIRECTORY, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results written to {output_path}")
+
+    if arguments.baseline:
+        with open(arguments.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        comparisons = compare_with_baseline(results, baseline, arguments.tolerance)
+        regressions = [comparison for comparison in comparisons if comparison[4]]
+        for size, stage, baseline_seconds, seconds, regressed in comparisons:
+            print(f"{size:>8} {stage:<28} {baseline_seconds * 1000:10.2f} ms -> {seconds * 1000:10.2f} ms {'REGRESSION' if regressed else ''}")
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed by more than {arguments.tolerance:.0%}.")
+            sys.exit(1)
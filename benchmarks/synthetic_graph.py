@@ -0,0 +1,128 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import config
+
+def generate_synthetic_sheets(node_count, mean_degree=3.0, city_density=0.03, yield_count=200, yield_density=0.4, lodgings_per_city=4, seed=0):
+    """
+    Generates a synthetic workbook with the same sheets and columns as BDO_database.xlsx.
+
+    Nodes are laid out on a line and every non-first node is connected to a random earlier node within a short
+    window, which keeps the graph connected and gives it realistic long paths. Extra local connections are added
+    until the requested mean degree is reached. Every connection is written in both directions, as in the real
+    workbook.
+
+    Parameters:
+        node_count (int): The number of nodes.
+        mean_degree (float, optional): The average number of connections per node. Defaults to 3.0.
+        city_density (float, optional): The fraction of nodes that are cities or towns. Defaults to 0.03.
+        yield_count (int, optional): The number of distinct yield names. Defaults to 200.
+        yield_density (float, optional): The fraction of nodes with at least one yield. Defaults to 0.4.
+        lodgings_per_city (int, optional): The number of lodgings per city or town. Defaults to 4.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        dict: Sheet names mapped to DataFrames.
+    """
+    rng = np.random.default_rng(seed)
+    node_ids = np.arange(1, node_count + 1, dtype=np.int64)
+
+    city_mask = rng.random(node_count) < city_density
+    city_mask[0] = True
+    node_types = np.where(city_mask, np.where(rng.random(node_count) < 0.3, "City", "Town"), np.where(rng.random(node_count) < 0.6, "Connection", ""))
+    cp_costs = np.where(city_mask, 0.0, rng.integers(1, 4, node_count).astype(np.float64))
+    nodes_name_region = pd.DataFrame({
+        config.COLUMN_NODE_ID: node_ids,
+        config.COLUMN_NODE_NAME: [f"Node {node_id}" for node_id in node_ids],
+        "Node Region": [f"Region {region}" for region in (node_ids - 1) // 1000],
+        config.COLUMN_CONNECTED: False,
+        config.COLUMN_NODE_TYPE: node_types,
+        config.COLUMN_CP_COST: cp_costs,
+        "Node Manager": "",
+    })
+
+    window = 8
+    tree_sources = node_ids[1:]
+    tree_targets = np.maximum(tree_sources - rng.integers(1, window + 1, node_count - 1), 1)
+    extra_edge_count = max(int(node_count * (mean_degree / 2.0 - 1.0)), 0)
+    extra_sources = rng.integers(1, node_count + 1, extra_edge_count)
+    extra_targets = np.clip(extra_sources + rng.integers(-window, window + 1, extra_edge_count), 1, node_count)
+    sources = np.concatenate([tree_sources, extra_sources])
+    targets = np.concatenate([tree_targets, extra_targets])
+    distinct = sources != targets
+    edges = np.unique(np.stack([np.minimum(sources, targets)[distinct], np.maximum(sources, targets)[distinct]], axis=1), axis=0)
+    connection_sources = np.concatenate([edges[:, 0], edges[:, 1]])
+    connection_targets = np.concatenate([edges[:, 1], edges[:, 0]])
+    node_connections = pd.DataFrame({
+        "Connection ID": np.arange(1, len(connection_sources) + 1, dtype=np.int64),
+        config.COLUMN_NODE_ID: connection_sources,
+        config.CONNECTED_NODE_ID: connection_targets,
+    })
+
+    yield_names = np.array([f"Synthetic Yield {yield_number:04d}" for yield_number in range(yield_count)], dtype=object)
+    has_yield = (rng.random(node_count) < yield_density) & ~city_mask
+    first_yields = np.where(has_yield, yield_names[rng.integers(0, yield_count, node_count)], None)
+    second_yields = np.where(has_yield & (rng.random(node_count) < 0.3), yield_names[rng.integers(0, yield_count, node_count)], None)
+    node_yields = pd.DataFrame({
+        "Yield ID": node_ids,
+        config.COLUMN_NODE_ID: node_ids,
+        config.COLUMN_YIELD_1: first_yields,
+        config.COLUMN_YIELD_2: second_yields,
+    })
+
+    city_ids = node_ids[city_mask]
+    lodging_node_ids = np.repeat(city_ids, lodgings_per_city)
+    lodging_rank = np.tile(np.arange(1, lodgings_per_city + 1), len(city_ids))
+    lodging_cp = rng.integers(1, 4, len(lodging_node_ids))
+    parent_cp = np.where(lodging_rank > 1, np.roll(lodging_cp, 1), 0)
+    lodging_names = [f"Lodging {node_id}-{rank}" for node_id, rank in zip(lodging_node_ids, lodging_rank)]
+    workers_lodging = pd.DataFrame({
+        "Lodging ID": np.arange(1, len(lodging_node_ids) + 1, dtype=np.int64),
+        config.COLUMN_NODE_ID: lodging_node_ids,
+        config.COLUMN_LODGING_NAME: lodging_names,
+        config.COLUMN_CP_COST: lodging_cp,
+        config.COLUMN_PARENT_LODGING: [config.NO_PARENT_LODGING if rank == 1 else f"Lodging {node_id}-{rank - 1}" for node_id, rank in zip(lodging_node_ids, lodging_rank)],
+        config.COLUMN_PARENT_CP_COST: parent_cp,
+        config.COLUMN_TOTAL_LODGING_CP_COST: lodging_cp + parent_cp,
+        "Number of Workers": rng.integers(1, 4, len(lodging_node_ids)),
+        config.COLUMN_AVAILABLE: True,
+    })
+
+    # Every lodging doubles as a house with usages, and each city or town gets one extra workshop on top of it.
+    usage_pool = np.array(["Lodging", "Storage", "Refinery", "Crop Factory", "Wood Workbench", "Mineral Workshop"])
+    workshop_names = [f"Workshop {node_id}" for node_id in city_ids]
+    usage_houses = pd.DataFrame({
+        config.COLUMN_NODE_ID: np.r_[lodging_node_ids, city_ids],
+        config.COLUMN_LODGING_NAME: lodging_names + workshop_names,
+        config.COLUMN_CP_COST: np.r_[lodging_cp, rng.integers(1, 4, len(city_ids))],
+        config.COLUMN_PARENT_LODGING: list(workers_lodging[config.COLUMN_PARENT_LODGING]) + [f"Lodging {node_id}-1" for node_id in city_ids],
+    })
+    usages = np.where(rng.random((len(usage_houses), len(config.COLUMN_USAGES))) < 0.3, rng.choice(usage_pool, (len(usage_houses), len(config.COLUMN_USAGES))), None)
+    usages[:len(lodging_node_ids), 0] = "Lodging"
+    lodging_usages = usage_houses.assign(**{
+        config.COLUMN_PARENT_CP_COST: 0,
+        config.COLUMN_TOTAL_LODGING_CP_COST: usage_houses[config.COLUMN_CP_COST],
+    }).assign(**{usage_column: usages[:, column] for column, usage_column in enumerate(config.COLUMN_USAGES)})
+
+    return {
+        config.SHEET_NODES_NAME_REGION: nodes_name_region,
+        config.SHEET_NODE_CONNECTIONS: node_connections,
+        config.SHEET_NODE_YIELDS: node_yields,
+        config.SHEET_WORKERS_LODGING: workers_lodging,
+        config.SHEET_LODGING_USAGES: lodging_usages,
+    }
+
+def write_workbook(sheets, file_path):
+    """
+    Writes synthetic sheets to an Excel workbook.
+
+    Parameters:
+        sheets (dict): Sheet names mapped to DataFrames.
+        file_path (str): The path of the workbook to write.
+    """
+    with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
+        for sheet_name, sheet_data in sheets.items():
+            sheet_data.to_excel(writer, sheet_name=sheet_name, index=False)
@@ -0,0 +1,126 @@
+import csv
+import json
+import time
+from query_server import results_to_json
+from player_state import parse_overrides
+from profiling import profiler
+
+# Columns of the CSV batch output. Every result row gets the scenario and yield it belongs to; columns a mode does
+# not produce are left empty.
+CSV_COLUMNS = ["Scenario", "Yield", "Rank", "Weight", "Node ID", "Node Name", "Visited Nodes Info", "Lodging Name", "Lodging CP", "Total CP", "Added CP"]
+
+def read_scenarios(scenario_lines):
+    """
+    Decodes a stream of JSONL scenarios. A scenario is either a JSON object or a plain string of yields.
+
+    Recognised keys are "yields" (a comma-separated string or a list), "id", "connected" ({"<Node ID>": true}),
+    "available" ([[<Node ID>, "<lodging name>", true]]), "combined" (bool), "budget" (CP), "top_k" (K) and
+    "lodging_usage" (usage name). Blank lines and lines starting with "#" are skipped.
+
+    Parameters:
+        scenario_lines (iterable): Lines of JSONL text, e.g. an open file or sys.stdin.
+
+    Yields:
+        tuple: The line number and the decoded scenario dict, or the line number and a ValueError for invalid lines.
+    """
+    for line_number, line in enumerate(scenario_lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            scenario = json.loads(line)
+        except ValueError as error:
+            yield line_number, ValueError(f"Invalid JSON on line {line_number}: {error}")
+            continue
+        if isinstance(scenario, str):
+            scenario = {"yields": scenario}
+        if not isinstance(scenario, dict):
+            yield line_number, ValueError(f"Line {line_number} is neither a JSON object nor a string of yields.")
+            continue
+        yield line_number, scenario
+
+def process_scenario(processor, scenario):
+    """
+    Processes one scenario with its overrides applied, and restores the previous flags afterwards.
+
+    Parameters:
+        processor (NodeProcessor): The processor holding the loaded workbook.
+        scenario (dict): The decoded scenario.
+
+    Returns:
+        list: Tuples of a yield name or plan title and its DataFrame of results.
+    """
+    yield_names = scenario.get("yields", "")
+    if isinstance(yield_names, list):
+        yield_names = ", ".join(map(str, yield_names))
+    if not str(yield_names).strip():
+        raise ValueError("No yields given.")
+
+    connected_nodes, available_lodgings = parse_overrides(scenario)
+    original_connected, original_available = processor.current_flags(connected_nodes, available_lodgings)
+    try:
+        # Inside the try, so overrides applied before a failure are restored too; restoring one that was never
+        # applied changes nothing.
+        if connected_nodes or available_lodgings:
+            processor.apply_changes(connected_nodes, available_lodgings)
+        if scenario.get("combined"):
+            return processor.process_combined_plan(yield_names)
+        if scenario.get("budget") is not None:
+            return processor.process_budget_plan(yield_names, float(scenario["budget"]))
+        if scenario.get("lodging_usage"):
+            return processor.process_usage(yield_names, scenario["lodging_usage"])
+        if int(scenario.get("top_k") or 0) > 1:
+            return processor.process_ranked(yield_names, int(scenario["top_k"]))
+        return processor.process_nodes(yield_names)
+    finally:
+        if original_connected or original_available:
+            processor.apply_changes(original_connected, original_available)
+
+def run_batch(processor, scenario_lines, output_sink, output_format="jsonl"):
+    """
+    Processes a stream of scenarios against one loaded workbook and writes each scenario's results as soon as it
+    completes. A failing scenario is reported in the output and does not stop the batch.
+
+    Parameters:
+        processor (NodeProcessor): The processor holding the loaded workbook.
+        scenario_lines (iterable): Lines of JSONL scenarios.
+        output_sink (file-like): A text stream the results are written to.
+        output_format (str, optional): "jsonl" for one JSON object per scenario, or "csv" for one row per result. Defaults to "jsonl".
+
+    Returns:
+        tuple: The number of scenarios processed and the number that failed.
+    """
+    csv_writer = None
+    if output_format == "csv":
+        csv_writer = csv.DictWriter(output_sink, fieldnames=CSV_COLUMNS, extrasaction="ignore", restval="")
+        csv_writer.writeheader()
+
+    scenario_count = failed_count = 0
+    for line_number, scenario in read_scenarios(scenario_lines):
+        scenario_count += 1
+        scenario_id = scenario.get("id", line_number) if isinstance(scenario, dict) else line_number
+        started_at = time.perf_counter()
+        try:
+            if isinstance(scenario, Exception):
+                raise scenario
+            with profiler.span("batch scenario"):
+                all_yield_results = process_scenario(processor, scenario)
+            error_message = None
+        except Exception as error:
+            all_yield_results, error_message = [], str(error)
+            failed_count += 1
+        elapsed_ms = round((time.perf_counter() - started_at) * 1000, 3)
+
+        if csv_writer is not None:
+            if error_message is not None:
+                csv_writer.writerow({"Scenario": scenario_id, "Yield": f"Error: {error_message}"})
+            for yield_name, node_results_dataframe in all_yield_results:
+                for result_row in node_results_dataframe.to_dict(orient="records"):
+                    csv_writer.writerow({"Yield": yield_name, **result_row, "Scenario": scenario_id})
+        else:
+            output_record = {"id": scenario_id, "results": results_to_json(all_yield_results), "elapsed_ms": elapsed_ms}
+            if error_message is not None:
+                output_record["error"] = error_message
+            output_sink.write(json.dumps(output_record) + "\n")
+        output_sink.flush()
+    return scenario_count, failed_count
@@ -0,0 +1,163 @@
+import time
+import numpy as np
+import config
+from combined_planner import CombinedPlan, CombinedPlanner
+
+class BudgetPlan(CombinedPlan):
+    """
+    An investment plan connecting as much weighted yield as a CP budget allows, sharing path nodes between yields.
+
+    Attributes:
+        budget (float): The CP budget the plan had to stay within.
+        covered_weight (float): The summed weight of the connected yields.
+        weight_bound (float): An upper bound on the weight any plan within the budget can cover: the weight of
+            every yield that can be connected on its own within the budget.
+        uncovered_yields (list): Reachable yields that did not fit in the budget.
+    """
+
+    def __init__(self, budget=0.0):
+        """
+        Initializes an empty plan.
+
+        Parameters:
+            budget (float, optional): The CP budget. Defaults to 0.
+        """
+        super().__init__()
+        self.budget = budget
+        self.covered_weight = 0.0
+        self.weight_bound = 0.0
+        self.uncovered_yields = []
+
+    @property
+    def is_optimal(self):
+        """bool: True when the plan covers every yield that fits in the budget on its own."""
+        return self.covered_weight >= self.weight_bound
+
+
+class BudgetPlanner(CombinedPlanner):
+    """
+    Chooses which yields to connect within a CP budget so that the covered weight is as large as possible, a
+    budgeted maximum-coverage problem over the node graph.
+
+    Each greedy step runs one multi-source Dijkstra from the nodes already in the plan (at the lodging of the city
+    or town serving them, as every yield needs a worker lodging of its own) and from every unused city or town (at
+    its connection cost plus its cheapest lodging), which gives the marginal CP of every still uncovered yield at
+    once; the yield with the most weight per marginal CP that still fits is connected.
+    The greedy run is repeated with each affordable yield forced first, heaviest first, for as long as the time
+    budget allows, and the best plan is kept. The search stops early once a plan reaches the upper bound.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph.
+    """
+
+    def plan(self, target_groups, yield_weights, budget, time_budget=None):
+        """
+        Finds the plan covering the most weight within a CP budget.
+
+        Parameters:
+            target_groups (dict): Yield names mapped to arrays of dense indices of the nodes producing them.
+            yield_weights (dict): Yield names mapped to their weight.
+            budget (float): The CP budget.
+            time_budget (float, optional): Seconds to spend improving the plan. Defaults to config.BUDGET_PLAN_TIME_BUDGET.
+
+        Returns:
+            BudgetPlan: The best plan found.
+        """
+        time_budget = config.BUDGET_PLAN_TIME_BUDGET if time_budget is None else time_budget
+        deadline = time.perf_counter() + time_budget
+        target_groups = {yield_name: set(np.asarray(node_indices).tolist()) for yield_name, node_indices in target_groups.items()}
+
+        standalone_costs = self._marginal_costs({}, target_groups)
+        unreachable_yields = [yield_name for yield_name in target_groups if yield_name not in standalone_costs]
+        affordable_yields = sorted(
+            (yield_name for yield_name, (added_cp, _, _) in standalone_costs.items() if added_cp <= budget),
+            key=lambda yield_name: (-yield_weights[yield_name], standalone_costs[yield_name][0], yield_name),
+        )
+        weight_bound = sum(yield_weights[yield_name] for yield_name in affordable_yields)
+
+        best_plan = self._greedy(target_groups, yield_weights, budget)
+        for first_yield in affordable_yields:
+            if best_plan.covered_weight >= weight_bound:
+                break
+            if time.perf_counter() >= deadline:
+                best_plan.complete = False
+                break
+            candidate_plan = self._greedy(target_groups, yield_weights, budget, first_yield)
+            if (candidate_plan.covered_weight, -candidate_plan.total_cp) > (best_plan.covered_weight, -best_plan.total_cp):
+                best_plan = candidate_plan
+
+        best_plan.weight_bound = weight_bound
+        best_plan.unreachable_yields = unreachable_yields
+        covered_yields = set(best_plan.yield_order)
+        best_plan.uncovered_yields = [yield_name for yield_name in target_groups if yield_name not in covered_yields and yield_name not in unreachable_yields]
+        return best_plan
+
+    def _greedy(self, target_groups, yield_weights, budget, first_yield=None):
+        """
+        Grows a plan by repeatedly connecting the yield with the most weight per marginal CP that still fits.
+
+        Parameters:
+            target_groups (dict): Yield names mapped to sets of dense candidate node indices.
+            yield_weights (dict): Yield names mapped to their weight.
+            budget (float): The CP budget.
+            first_yield (str, optional): A yield to connect first, regardless of its ratio.
+
+        Returns:
+            BudgetPlan: The resulting plan.
+        """
+        plan = BudgetPlan(budget)
+        plan_roots = {}
+        remaining_groups = dict(target_groups)
+        while remaining_groups:
+            marginal_costs = self._marginal_costs(plan_roots, remaining_groups)
+            affordable = {
+                yield_name: found for yield_name, found in marginal_costs.items()
+                if plan.total_cp + found[0] <= budget
+            }
+            if first_yield is not None:
+                affordable = {first_yield: affordable[first_yield]} if first_yield in affordable else {}
+                first_yield = None
+            if not affordable:
+                break
+            yield_name = max(affordable, key=lambda name: (
+                yield_weights[name] / affordable[name][0] if affordable[name][0] > 0 else np.inf,
+                yield_weights[name],
+                -affordable[name][0],
+                name,
+            ))
+            added_cp, node_index, path = affordable[yield_name]
+            self._connect(plan, plan_roots, yield_name, node_index, added_cp, path)
+            plan.covered_weight += yield_weights[yield_name]
+            del remaining_groups[yield_name]
+        plan.investment_nodes = set(plan_roots)
+        return plan
+
+    def _marginal_costs(self, plan_roots, target_groups):
+        """
+        Computes, with one Dijkstra, the cheapest CP each yield would add to the current plan.
+
+        Parameters:
+            plan_roots (dict): Dense indices of the nodes in the plan mapped to the city or town serving them.
+            target_groups (dict): Yield names mapped to sets of dense candidate node indices.
+
+        Returns:
+            dict: Each reachable yield mapped to a tuple of its added CP, the dense index of its cheapest node and
+            that node's path to where it joins the plan or a city.
+        """
+        candidate_owners = {}
+        for yield_name, node_indices in target_groups.items():
+            for node_index in node_indices:
+                candidate_owners.setdefault(node_index, []).append(yield_name)
+
+        predecessor = {}
+        settled_candidates = {}
+        for current_cost, node_index in self._settle(plan_roots, predecessor):
+            for yield_name in candidate_owners.get(node_index, ()):
+                if yield_name not in settled_candidates:
+                    settled_candidates[yield_name] = (current_cost, node_index)
+            if len(settled_candidates) == len(target_groups):
+                break
+        return {
+            yield_name: (added_cp, node_index, self._trace(node_index, predecessor))
+            for yield_name, (added_cp, node_index) in settled_candidates.items()
+        }
@@ -0,0 +1,243 @@
+import heapq
+import time
+import numpy as np
+import config
+from profiling import profiler
+
+class CombinedPlan:
+    """
+    A single investment plan connecting one node for each requested yield, sharing path nodes between yields.
+
+    Attributes:
+        total_cp (float): The CP of every node in the plan, each counted once, plus one lodging per connected yield.
+        assignments (list): One dict per connected yield, in the order they were added, with the keys "yield",
+            "node_index", "path" (dense indices from the yield node to where it joins the plan), "root" (the city
+            or town whose lodging serves it) and "added_cp".
+        investment_nodes (set): Dense indices of every node in the plan.
+        lodged_cities (list): Dense indices of the city or town lodging each connected yield's worker, one entry per
+            yield, so a city or town appears once for every worker it houses.
+        unreachable_yields (list): Yields for which no candidate node could be connected.
+        complete (bool): False when the time budget ran out before the search finished.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty plan.
+        """
+        self.total_cp = 0.0
+        self.assignments = []
+        self.investment_nodes = set()
+        self.lodged_cities = []
+        self.unreachable_yields = []
+        self.complete = True
+
+    @property
+    def yield_order(self):
+        """list: The connected yields in the order they were added to the plan."""
+        return [assignment["yield"] for assignment in self.assignments]
+
+
+class CombinedPlanner:
+    """
+    Finds a cheap combined investment plan for several yields at once with a node-weighted group Steiner tree
+    approximation.
+
+    The plan is grown greedily: every step runs a multi-source Dijkstra from the nodes already in the plan (at
+    the lodging of the city or town serving them) and from every unused city or town (at its connection cost plus
+    its cheapest lodging), and the first
+    candidate node of a still unconnected yield to be settled is connected along its path. The greedy order is
+    then improved by re-inserting each yield last, for as long as the time budget allows, and the cheapest plan
+    found so far is returned.
+
+    Path nodes are shared and counted once, but every yield needs a worker of its own, so every yield pays for a
+    lodging in the city or town serving it, even when an earlier yield already lodges a worker there.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph.
+    """
+
+    def __init__(self, node_graph):
+        """
+        Initializes the planner and prepares the graph arrays used by the search.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+        """
+        self.node_graph = node_graph
+        self._node_costs = node_graph.connection_costs().tolist()
+        self._reverse_offsets = node_graph.reverse_offsets.tolist()
+        self._reverse_indices = node_graph.reverse_indices.tolist()
+        self._lodging_cp_cost = node_graph.lodging_cp_cost.tolist()
+        self._city_indices = np.flatnonzero(node_graph.city_town_mask).tolist()
+
+    def plan(self, target_groups, time_budget=None):
+        """
+        Finds the cheapest combined plan within a time budget.
+
+        Parameters:
+            target_groups (dict): Yield names mapped to arrays of dense indices of the nodes producing them.
+            time_budget (float, optional): Seconds to spend improving the plan. Defaults to config.COMBINED_PLAN_TIME_BUDGET.
+
+        Returns:
+            CombinedPlan: The cheapest plan found.
+        """
+        time_budget = config.COMBINED_PLAN_TIME_BUDGET if time_budget is None else time_budget
+        deadline = time.perf_counter() + time_budget
+        target_groups = {yield_name: set(np.asarray(node_indices).tolist()) for yield_name, node_indices in target_groups.items()}
+
+        best_plan = self._build(target_groups)
+        improved = True
+        while improved:
+            improved = False
+            for yield_name in best_plan.yield_order:
+                if time.perf_counter() >= deadline:
+                    best_plan.complete = False
+                    return best_plan
+                reordered = [name for name in best_plan.yield_order if name != yield_name] + [yield_name]
+                candidate_plan = self._build(target_groups, reordered)
+                if candidate_plan.total_cp < best_plan.total_cp:
+                    best_plan = candidate_plan
+                    improved = True
+                    break
+        return best_plan
+
+    def _build(self, target_groups, yield_order=None):
+        """
+        Grows a plan by connecting one yield at a time.
+
+        Parameters:
+            target_groups (dict): Yield names mapped to sets of dense candidate node indices.
+            yield_order (list, optional): The order to connect yields in. Defaults to always connecting the cheapest remaining yield.
+
+        Returns:
+            CombinedPlan: The resulting plan.
+        """
+        plan = CombinedPlan()
+        plan_roots = {}
+        remaining_yields = list(yield_order) if yield_order is not None else list(target_groups)
+        while remaining_yields:
+            searched_yields = remaining_yields[:1] if yield_order is not None else remaining_yields
+            candidate_owner = {}
+            for yield_name in reversed(searched_yields):
+                for node_index in target_groups[yield_name]:
+                    candidate_owner[node_index] = yield_name
+
+            found = self._search(plan_roots, candidate_owner)
+            if found is None:
+                plan.unreachable_yields.extend(searched_yields)
+                for yield_name in searched_yields:
+                    remaining_yields.remove(yield_name)
+                continue
+
+            node_index, added_cp, path = found
+            yield_name = candidate_owner[node_index]
+            remaining_yields.remove(yield_name)
+            self._connect(plan, plan_roots, yield_name, node_index, added_cp, path)
+        plan.investment_nodes = set(plan_roots)
+        return plan
+
+    def _connect(self, plan, plan_roots, yield_name, node_index, added_cp, path):
+        """
+        Adds a yield's path to a plan, lodging its worker in the city or town serving the plan node it joins, or in
+        the city or town it ends at when that is not part of the plan yet.
+
+        Parameters:
+            plan (CombinedPlan): The plan to extend.
+            plan_roots (dict): Dense indices of the nodes in the plan mapped to the city or town serving them; updated in place.
+            yield_name (str): The yield being connected.
+            node_index (int): The dense index of the yield's node.
+            added_cp (float): The CP the path adds to the plan.
+            path (list): Dense indices from the yield's node to where it joins the plan.
+        """
+        attach_index = path[-1]
+        root_index = plan_roots.get(attach_index, attach_index)
+        plan.lodged_cities.append(root_index)
+        for path_index in path:
+            plan_roots.setdefault(path_index, root_index)
+        plan.total_cp += added_cp
+        plan.assignments.append({
+            "yield": yield_name,
+            "node_index": node_index,
+            "path": path,
+            "root": root_index,
+            "added_cp": added_cp,
+        })
+
+    def _settle(self, plan_roots, predecessor):
+        """
+        Runs a multi-source Dijkstra from the current plan (at the lodging of the city or town serving each node)
+        and the unused cities or towns, yielding nodes in the order they are settled. Plan nodes are passed through
+        at no cost, as they are paid for already.
+
+        Parameters:
+            plan_roots (dict): Dense indices of the nodes in the plan mapped to the city or town serving them.
+            predecessor (dict): Filled in with the next node towards the plan or a city for each reached node.
+
+        Yields:
+            tuple: The added CP and dense index of each settled node.
+        """
+        node_costs = self._node_costs
+        reverse_offsets = self._reverse_offsets
+        reverse_indices = self._reverse_indices
+        best_cost = {}
+        heap = []
+        for node_index, root_index in plan_roots.items():
+            best_cost[node_index] = self._lodging_cp_cost[root_index]
+            heap.append((best_cost[node_index], node_index))
+        for city_index in self._city_indices:
+            if city_index not in plan_roots:
+                best_cost[city_index] = node_costs[city_index] + self._lodging_cp_cost[city_index]
+                heap.append((best_cost[city_index], city_index))
+        heapq.heapify(heap)
+
+        settled = set()
+        try:
+            while heap:
+                current_cost, node_index = heapq.heappop(heap)
+                if node_index in settled:
+                    continue
+                settled.add(node_index)
+                yield current_cost, node_index
+                for next_index in reverse_indices[reverse_offsets[node_index]:reverse_offsets[node_index + 1]]:
+                    next_cost = current_cost + (0.0 if next_index in plan_roots else node_costs[next_index])
+                    if next_cost < best_cost.get(next_index, np.inf):
+                        best_cost[next_index] = next_cost
+                        predecessor[next_index] = node_index
+                        heapq.heappush(heap, (next_cost, next_index))
+        finally:
+            profiler.count("nodes expanded", len(settled))
+
+    @staticmethod
+    def _trace(node_index, predecessor):
+        """
+        Follows the predecessors of a settled node to where it joins the plan or a city.
+
+        Parameters:
+            node_index (int): The dense index of the settled node.
+            predecessor (dict): The predecessors filled in by _settle.
+
+        Returns:
+            list: Dense indices from the node to where it joins the plan or a city.
+        """
+        path = [node_index]
+        while path[-1] in predecessor:
+            path.append(predecessor[path[-1]])
+        return path
+
+    def _search(self, plan_roots, candidate_owner):
+        """
+        Runs a multi-source Dijkstra from the current plan and the unused cities or towns, stopping at the first
+        settled candidate node.
+
+        Parameters:
+            plan_roots (dict): Dense indices of the nodes in the plan mapped to the city or town serving them.
+            candidate_owner (dict): Dense indices of candidate nodes mapped to the yield they belong to.
+
+        Returns:
+            tuple: The settled candidate's index, its added CP and its path ending at a plan node or city, or None.
+        """
+        predecessor = {}
+        for current_cost, node_index in self._settle(plan_roots, predecessor):
+            if node_index in candidate_owner:
+                return node_index, current_cost, self._trace(node_index, predecessor)
+        return None
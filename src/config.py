@@ -47,6 +47,29 @@ EXCEL_FILE_PATH = resource_path(r"data\BDO_database.xlsx")
 # Path to the configuration file. This file is used for the application seamless saving functionality.
 CONFIG_FILE = resource_path(r"data\config.json")
 
+# Path to the player state file, which records the player's Connected nodes and Available lodgings on top of the
+# workbook (see player_state.py), so recording progress does not mean editing the Excel file.
+PLAYER_STATE_FILE = resource_path(r"data\player_state.json")
+
+# Directory for binary snapshots of parsed Excel workbooks. A snapshot lets the application skip the slow Excel
+# parse as long as the workbook has not changed; bump the format version whenever the snapshot layout changes.
+SNAPSHOT_DIRECTORY = resource_path("cache")
+SNAPSHOT_FORMAT_VERSION = 2
+
+# Directory and limits of the result cache, which remembers per-yield results keyed by the workbook contents, the
+# Connected/Available state and the yield. The most recent entries are also kept in memory. Bump the version
+# whenever a change to the processing would make previously cached results wrong.
+RESULT_CACHE_DIRECTORY = os.path.join(SNAPSHOT_DIRECTORY, "results")
+RESULT_CACHE_MEMORY_ENTRIES = 256
+RESULT_CACHE_DISK_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_VERSION = 2
+
+# Directory of the binary graph files, which hold the compiled node graph, yield index and cheapest connections of a
+# workbook and are memory-mapped instead of rebuilt from the sheets. Bump the format version whenever the file layout
+# or the way those structures are compiled changes.
+GRAPH_FILE_DIRECTORY = os.path.join(SNAPSHOT_DIRECTORY, "graphs")
+GRAPH_FILE_FORMAT_VERSION = 1
+
 # The name of the sheet within the Excel file that contains all relevant node data. Set to None as the entire
 # file is used without specifying a particular sheet.
 SHEET_NAME_ALL = None
@@ -60,16 +83,67 @@ YIELD_NAMES = "Potato, Wheat, Rice"
 OUTPUT_DIRECTORY = resource_path("output")
 DEFAULT_HTML_FILE_NAME = "results_visualization.html"
 
+# Number of result rows shown per page in the HTML report. Further rows are written into page templates that the
+# browser only renders when their page is opened, which keeps large reports quick to open.
+HTML_TABLE_PAGE_SIZE = 50
+
 # Configuration for opening the HTML output in a new tab of the web browser, enhancing user experience by
 # providing immediate access to the visualization.
 WEBBROWSER_NEW_TAB = 2
 
+# The largest edit distance at which a misspelled yield name is still resolved to a known yield, e.g. "wheet" to "wheat".
+# Names of at most YIELD_FUZZY_SHORT_NAME_LENGTH characters may only be off by one edit, so "rce" still resolves to
+# "rice" but "ore" is not turned into "corn".
+YIELD_FUZZY_MAX_DISTANCE = 2
+YIELD_FUZZY_SHORT_NAME_LENGTH = 4
+
+# Seconds the combined multi-yield plan may spend improving its first greedy solution before the best plan found
+# so far is returned.
+COMBINED_PLAN_TIME_BUDGET = 2.0
+
+# Default number of alternative connection plans listed per yield in ranked mode (the GUI's "Top K" field).
+TOP_K_PATHS = 5
+
+# Number of worker processes used to process yields in parallel. 1 processes every yield in this process, and 0
+# uses one worker per CPU core. Starting the pool takes tens of milliseconds while a yield takes well under one
+# to format, so with this default, queries with fewer than PARALLEL_MIN_YIELDS resolved yields are processed
+# serially; a worker count given explicitly, e.g. with --workers, is always used.
+PARALLEL_WORKER_COUNT = 1
+PARALLEL_MIN_YIELDS = 200
+
+# Seconds the CP-budget planner may spend trying alternative first picks after its greedy plan, and the weight of a
+# yield listed without one, e.g. "wheat:3, potato" weighs wheat 3 and potato DEFAULT_YIELD_WEIGHT.
+BUDGET_PLAN_TIME_BUDGET = 0.5
+DEFAULT_YIELD_WEIGHT = 1.0
+
+# Player profiles evaluated together with --player-profiles: the number of profiles swept in one vectorized pass,
+# which bounds the memory of the profile x connection arrays, and the file name of the profile x yield cost matrix
+# written to the output directory.
+PLAYER_PROFILE_BATCH_SIZE = 64
+PLAYER_PROFILE_MATRIX_FILE_NAME = "player_profile_costs.csv"
+
+# Watch mode (--watch and the GUI's "Watch for changes"): seconds between two checks of the workbook and player state
+# file, and seconds they must stay unchanged before the results are refreshed, so a burst of saves refreshes once.
+WATCH_POLL_INTERVAL = 0.5
+WATCH_DEBOUNCE_SECONDS = 1.0
+
+# Address of the local query server, which keeps the workbook loaded and answers yield queries over HTTP/JSON.
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+# Profiling output, enabled with --profile (plus --profile-cprofile or --profile-memory for cProfile and
+# tracemalloc reports). The JSON trace is written to the output directory and can be opened in chrome://tracing.
+PROFILE_TRACE_FILE_NAME = "profile_trace.json"
+PROFILE_CPROFILE_LINES = 25
+PROFILE_TRACEMALLOC_LINES = 10
+
 # Specific Excel sheet names within the NodeProcessor module. These are utilized for detailed processing
 # and analysis of nodes, their connections, and yields.
 SHEET_WORKERS_LODGING = "Worker's Lodging"
 SHEET_NODES_NAME_REGION = "Nodes Name & Region"
 SHEET_NODE_CONNECTIONS = "Node Connections"
 SHEET_NODE_YIELDS = "Node Yields"
+SHEET_LODGING_USAGES = "Lodging Usages"
 
 # Column names used in DataFrame operations throughout the application. These constants ensure consistency
 # and reduce the risk of errors in data manipulation.
@@ -83,6 +157,13 @@ COLUMN_YIELD_2 = "Yield 2"
 COLUMN_CONNECTED = "Connected"
 COLUMN_CP_COST = "CP Cost"
 COLUMN_NODE_NAME = "Node Name"
+COLUMN_NODE_REGION = "Node Region"
+COLUMN_PARENT_LODGING = "Parent Lodging"
+COLUMN_PARENT_CP_COST = "Parent CP Cost"
+COLUMN_USAGES = [f"Usage {usage_number}" for usage_number in range(1, 8)]
+
+# The "Parent Lodging" value of a lodging that can be bought without buying another lodging first.
+NO_PARENT_LODGING = "none"
 
 # Definitions of node types and identifiers used in logic for processing nodes, specifically focusing on
 # cities and towns due to their significance in the game.
@@ -0,0 +1,224 @@
+import heapq
+import numpy as np
+import config
+from profiling import profiler
+
+class ConnectionSolver:
+    """
+    Computes, in a single pass, the cheapest CP needed to connect every node of a NodeGraph to a city or town.
+
+    The solver runs a node-weighted multi-source Dijkstra seeded from every node whose type is listed in
+    config.NODE_TYPES_CITY_TOWN. Entering a node costs its CP cost, or nothing when the node is already
+    connected. Each city or town is seeded with its own connection cost plus the cost of its cheapest available
+    lodging, so the search minimises the same "Total CP" that is reported for a node. Paths follow the direction
+    of the "Node Connections" sheet, from the target node towards the city or town.
+
+    The lodging of each city or town defaults to the node graph's cheapest worker lodging, but another table can be
+    passed, e.g. the cheapest house with a given usage from a LodgingEngine. Cities or towns with an infinite lodging
+    cost are not used.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph the costs were computed on.
+        lodging_names (list): Name of the lodging used at each city or town.
+        lodging_cp_cost (ndarray): CP cost of the lodging used at each city or town.
+        total_cost (ndarray): Cheapest path CP plus lodging CP per node, or inf when no city or town is reachable.
+        path_cost (ndarray): CP of the nodes on the cheapest path per node, lodging excluded.
+        predecessor (ndarray): Dense index of the next node towards the city or town, or -1 at the city or town itself.
+        root (ndarray): Dense index of the city or town each node's cheapest path ends at, or -1 when unreachable.
+    """
+
+    def __init__(self, node_graph, lodging_names=None, lodging_cp_cost=None):
+        """
+        Initializes the solver and computes the cheapest connection for every node.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            lodging_names (list, optional): Lodging name per node. Defaults to the node graph's lodging names.
+            lodging_cp_cost (ndarray, optional): Lodging CP cost per node. Defaults to the node graph's lodging costs.
+        """
+        self.node_graph = node_graph
+        self.lodging_names = node_graph.lodging_names if lodging_names is None else lodging_names
+        self.lodging_cp_cost = node_graph.lodging_cp_cost if lodging_cp_cost is None else lodging_cp_cost
+        self.total_cost, self.predecessor, self.root = self.solve()
+        self.path_cost = self._path_costs(np.arange(node_graph.node_count))
+
+    def solve(self):
+        """
+        Runs the multi-source Dijkstra over the whole graph.
+
+        Returns:
+            tuple: The total cost, predecessor and root arrays.
+        """
+        node_graph = self.node_graph
+        node_costs = node_graph.connection_costs().tolist()
+        reverse_offsets = node_graph.reverse_offsets.tolist()
+        reverse_indices = node_graph.reverse_indices.tolist()
+        lodging_cp_cost = self.lodging_cp_cost.tolist()
+
+        total_cost = [np.inf] * node_graph.node_count
+        predecessor = [-1] * node_graph.node_count
+        root = [-1] * node_graph.node_count
+        heap = []
+        for city_index in np.flatnonzero(node_graph.city_town_mask).tolist():
+            if lodging_cp_cost[city_index] == np.inf:
+                continue
+            total_cost[city_index] = node_costs[city_index] + lodging_cp_cost[city_index]
+            root[city_index] = city_index
+            heap.append((total_cost[city_index], city_index))
+        heapq.heapify(heap)
+
+        settled = [False] * node_graph.node_count
+        while heap:
+            current_cost, node_index = heapq.heappop(heap)
+            if settled[node_index]:
+                continue
+            settled[node_index] = True
+            for next_index in reverse_indices[reverse_offsets[node_index]:reverse_offsets[node_index + 1]]:
+                next_cost = current_cost + node_costs[next_index]
+                if next_cost < total_cost[next_index]:
+                    total_cost[next_index] = next_cost
+                    predecessor[next_index] = node_index
+                    root[next_index] = root[node_index]
+                    heapq.heappush(heap, (next_cost, next_index))
+
+        profiler.count("nodes expanded", sum(settled))
+        return np.array(total_cost, dtype=np.float64), np.array(predecessor, dtype=np.int64), np.array(root, dtype=np.int64)
+
+    def update(self, changed_node_indices):
+        """
+        Brings the solution up to date after the connection cost or lodging of some nodes changed in the node
+        graph, without re-solving the whole graph.
+
+        Every node whose cheapest path runs through a changed node is reset and re-seeded from its neighbours
+        outside that subtree, and the search is then resumed from those nodes only. Costs can move in either
+        direction: a cheaper node lowers the cost of nodes reached through it, while a dearer one makes the nodes
+        behind it look for another route. Untouched nodes keep their costs, which are still valid upper bounds.
+
+        Parameters:
+            changed_node_indices (iterable): Dense indices of the nodes whose connection cost or lodging changed.
+
+        Returns:
+            ndarray: Sorted dense indices of the nodes whose cheapest path ran through a changed node or was
+            improved, i.e. every node whose reported result may differ.
+        """
+        node_graph = self.node_graph
+        node_costs = node_graph.connection_costs().tolist()
+        reverse_offsets = node_graph.reverse_offsets
+        reverse_indices = node_graph.reverse_indices
+        adjacency_offsets = node_graph.adjacency_offsets
+        adjacency_indices = node_graph.adjacency_indices
+        total_cost = self.total_cost.tolist()
+        predecessor = self.predecessor.tolist()
+        root = self.root.tolist()
+
+        # Collect the subtrees of the predecessor tree hanging off the changed nodes.
+        reset_nodes = set()
+        pending_nodes = [int(node_index) for node_index in changed_node_indices]
+        while pending_nodes:
+            node_index = pending_nodes.pop()
+            if node_index in reset_nodes:
+                continue
+            reset_nodes.add(node_index)
+            for next_index in reverse_indices[reverse_offsets[node_index]:reverse_offsets[node_index + 1]].tolist():
+                if predecessor[next_index] == node_index:
+                    pending_nodes.append(next_index)
+
+        # Re-seed every reset node from its city or town seed or its best neighbour outside the reset subtrees.
+        heap = []
+        for node_index in reset_nodes:
+            best_cost, best_predecessor, best_root = np.inf, -1, -1
+            if node_graph.city_town_mask[node_index] and self.lodging_cp_cost[node_index] < np.inf:
+                best_cost, best_root = node_costs[node_index] + self.lodging_cp_cost[node_index], node_index
+            for previous_index in adjacency_indices[adjacency_offsets[node_index]:adjacency_offsets[node_index + 1]].tolist():
+                if previous_index in reset_nodes:
+                    continue
+                candidate_cost = total_cost[previous_index] + node_costs[node_index]
+                if candidate_cost < best_cost:
+                    best_cost, best_predecessor, best_root = candidate_cost, previous_index, root[previous_index]
+            total_cost[node_index], predecessor[node_index], root[node_index] = best_cost, best_predecessor, best_root
+            if best_cost < np.inf:
+                heap.append((best_cost, node_index))
+        heapq.heapify(heap)
+
+        # Resume the search from the re-seeded nodes; stale heap entries are skipped.
+        changed_nodes = set(reset_nodes)
+        expanded_count = 0
+        while heap:
+            current_cost, node_index = heapq.heappop(heap)
+            if current_cost > total_cost[node_index]:
+                continue
+            expanded_count += 1
+            for next_index in reverse_indices[reverse_offsets[node_index]:reverse_offsets[node_index + 1]].tolist():
+                next_cost = current_cost + node_costs[next_index]
+                if next_cost < total_cost[next_index]:
+                    total_cost[next_index] = next_cost
+                    predecessor[next_index] = node_index
+                    root[next_index] = root[node_index]
+                    changed_nodes.add(next_index)
+                    heapq.heappush(heap, (next_cost, next_index))
+
+        profiler.count("nodes expanded", expanded_count)
+        self.total_cost = np.array(total_cost, dtype=np.float64)
+        self.predecessor = np.array(predecessor, dtype=np.int64)
+        self.root = np.array(root, dtype=np.int64)
+        changed_indices = np.array(sorted(changed_nodes), dtype=np.int64)
+        self.path_cost[changed_indices] = self._path_costs(changed_indices)
+        return changed_indices
+
+    def _path_costs(self, node_indices):
+        """
+        Returns the CP of the nodes on the cheapest path of some nodes, without the lodging.
+
+        Parameters:
+            node_indices (ndarray): Dense indices of the nodes.
+
+        Returns:
+            ndarray: The path CP per node, or inf when no city or town is reachable.
+        """
+        roots = self.root[node_indices]
+        root_lodging_cp_cost = np.where(roots >= 0, self.lodging_cp_cost[np.maximum(roots, 0)], 0.0)
+        return np.where(roots >= 0, self.total_cost[node_indices] - root_lodging_cp_cost, np.inf)
+
+    def is_reachable(self, node_index):
+        """
+        Returns whether a node can be connected to any city or town.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            bool: True when a path to a city or town exists.
+        """
+        return self.root[node_index] >= 0
+
+    def path(self, node_index):
+        """
+        Reconstructs the cheapest path from a node to its city or town by following the predecessor tree.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            list: Dense indices of the nodes on the path, starting at the node and ending at the city or town.
+        """
+        if not self.is_reachable(node_index):
+            return [node_index]
+        path = [node_index]
+        while self.predecessor[path[-1]] >= 0:
+            path.append(int(self.predecessor[path[-1]]))
+        return path
+
+    def lodging(self, node_index):
+        """
+        Returns the lodging used by a node's cheapest path, which is the cheapest lodging of its city or town.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            tuple: The lodging name and its CP cost.
+        """
+        root_index = self.root[node_index]
+        if root_index < 0:
+            return config.DEFAULT_NO_LODGING_NAME, config.DEFAULT_NO_LODGING_CP_COST
+        return self.lodging_names[root_index], self.lodging_cp_cost[root_index]
@@ -1,30 +1,223 @@
+import hashlib
+import logging
+import threading
+from collections.abc import Mapping
 import pandas as pd
 import config
+from snapshot_cache import WorkbookSnapshot
+from profiling import profiler
 
 class ExcelDataLoader:
     """
     A class for loading node data from an Excel file specified in the application's configuration.
-    
+
     Attributes:
         file_path (str): The path to the Excel file containing node data.
+        use_snapshot (bool): Whether parsed sheets are read from and written to a binary snapshot.
+        rebuild_snapshot (bool): Whether an existing snapshot is ignored and rebuilt from the Excel file.
     """
-    
-    def __init__(self, file_path):
+
+    def __init__(self, file_path, use_snapshot=True, rebuild_snapshot=False):
         """
         Initializes the ExcelDataLoader with the path to the Excel file.
-        
+
         Parameters:
             file_path (str): The path to the Excel file to load.
+            use_snapshot (bool, optional): Read and write the binary snapshot of the parsed sheets. Defaults to True.
+            rebuild_snapshot (bool, optional): Re-parse the Excel file and overwrite the snapshot. Defaults to False.
         """
         self.file_path = file_path
+        self.use_snapshot = use_snapshot
+        self.rebuild_snapshot = rebuild_snapshot
 
     def load_excel_data(self):
         """
-        Loads the node data from the Excel file specified at initialization.
-        
+        Loads the node data from the Excel file specified at initialization. When snapshots are enabled and the
+        file has not changed since the last parse, the sheets are read from the snapshot instead.
+
         Returns:
             DataFrame: A Pandas DataFrame containing the loaded node data. The structure of the DataFrame
             will align with the structure of the Excel file, where each row represents a node and columns
             represent node attributes such as Node ID, Name, Type, etc.
         """
-        return pd.read_excel(self.file_path, sheet_name=config.SHEET_NAME_ALL)
+        with profiler.span("load"):
+            if not self.use_snapshot:
+                return pd.read_excel(self.file_path, sheet_name=config.SHEET_NAME_ALL)
+
+            snapshot = WorkbookSnapshot(self.file_path)
+            if not self.rebuild_snapshot:
+                excel_sheets_data = snapshot.load()
+                if excel_sheets_data is not None:
+                    logging.debug(f'Loaded sheets from snapshot {snapshot.snapshot_directory}')
+                    return excel_sheets_data
+
+            excel_sheets_data = pd.read_excel(self.file_path, sheet_name=config.SHEET_NAME_ALL)
+            try:
+                snapshot.save(excel_sheets_data)
+                logging.debug(f'Saved sheets to snapshot {snapshot.snapshot_directory}')
+            except OSError as error:
+                logging.debug(f'Could not save snapshot {snapshot.snapshot_directory}: {error}')
+            return excel_sheets_data
+
+    def content_hash(self):
+        """
+        Returns the SHA-256 hash of the Excel file's contents, which identifies the workbook in result cache keys.
+
+        Returns:
+            str: The hexadecimal content hash.
+        """
+        return WorkbookSnapshot(self.file_path).current_content_hash()
+
+    def load_sheets(self, sheet_columns, column_dtypes=None):
+        """
+        Returns a lazy mapping of the requested sheets. A sheet is only parsed, restricted to the requested
+        columns and converted to the requested dtypes, the first time it is accessed.
+
+        Parameters:
+            sheet_columns (dict): Sheet names mapped to the list of columns to load, or None to load every column.
+            column_dtypes (dict, optional): Column names mapped to the dtype they are converted to. Defaults to none.
+
+        Returns:
+            LazyExcelSheets: A read-only mapping from sheet names to DataFrames.
+        """
+        return LazyExcelSheets(self, sheet_columns, column_dtypes or {})
+
+
+class LazyExcelSheets(Mapping):
+    """
+    A read-only mapping of sheet names to DataFrames that parses each sheet on first access. It can be passed
+    anywhere the dictionary returned by ExcelDataLoader.load_excel_data is expected, as long as only the
+    declared sheets and columns are used.
+
+    Attributes:
+        loader (ExcelDataLoader): The loader providing the file path and snapshot settings.
+        sheet_columns (dict): Sheet names mapped to the columns to load, or None for every column.
+        column_dtypes (dict): Column names mapped to the dtype they are converted to.
+    """
+
+    def __init__(self, loader, sheet_columns, column_dtypes):
+        """
+        Initializes the mapping without parsing anything.
+
+        Parameters:
+            loader (ExcelDataLoader): The loader providing the file path and snapshot settings.
+            sheet_columns (dict): Sheet names mapped to the columns to load, or None for every column.
+            column_dtypes (dict): Column names mapped to the dtype they are converted to.
+        """
+        self.loader = loader
+        self.sheet_columns = dict(sheet_columns)
+        self.column_dtypes = dict(column_dtypes)
+        self._sheets = {}
+        self._excel_file = None
+        self._snapshot = WorkbookSnapshot(loader.file_path) if loader.use_snapshot else None
+        self._manifest = None
+        self._manifest_checked = loader.rebuild_snapshot
+        self._lock = threading.RLock()
+
+    def __getitem__(self, sheet_name):
+        if sheet_name not in self.sheet_columns:
+            raise KeyError(sheet_name)
+        profiler.count("sheet lookups")
+        with self._lock:
+            if sheet_name not in self._sheets:
+                with profiler.span(f"load: {sheet_name}"):
+                    self._sheets[sheet_name] = self._load_sheet(sheet_name)
+            return self._sheets[sheet_name]
+
+    def __iter__(self):
+        return iter(self.sheet_columns)
+
+    def __len__(self):
+        return len(self.sheet_columns)
+
+    def loaded_sheet_names(self):
+        """
+        Returns the names of the sheets that have been parsed or read from the snapshot so far.
+
+        Returns:
+            list: The loaded sheet names.
+        """
+        return list(self._sheets)
+
+    def reuse_sheets(self, previous_sheets, sheet_names):
+        """
+        Takes over sheets another mapping has already loaded, e.g. the sheets of an earlier version of the workbook
+        that did not change, so they are not parsed again. The DataFrames are shared, not copied.
+
+        Parameters:
+            previous_sheets (LazyExcelSheets): The mapping to take the sheets from.
+            sheet_names (iterable): The sheets to take over; sheets it has not loaded are skipped.
+        """
+        loaded_sheet_names = set(previous_sheets.loaded_sheet_names())
+        with self._lock:
+            for sheet_name in sheet_names:
+                if sheet_name in loaded_sheet_names and sheet_name in self.sheet_columns:
+                    self._sheets[sheet_name] = previous_sheets[sheet_name]
+
+    def _entry_name(self, sheet_name):
+        """
+        Builds the snapshot entry name of a sheet, which identifies both the sheet and its projection.
+
+        Parameters:
+            sheet_name (str): The sheet name.
+
+        Returns:
+            str: The snapshot entry name.
+        """
+        columns = self.sheet_columns[sheet_name]
+        projection = repr((columns, sorted((column, str(self.column_dtypes[column])) for column in (columns or []) if column in self.column_dtypes)))
+        return f"{sheet_name}#{hashlib.sha1(projection.encode('utf-8')).hexdigest()[:12]}"
+
+    def _load_sheet(self, sheet_name):
+        """
+        Loads a sheet from the snapshot, or parses it from the Excel file and stores it in the snapshot.
+
+        Parameters:
+            sheet_name (str): The sheet name.
+
+        Returns:
+            DataFrame: The projected and typed sheet.
+        """
+        entry_name = self._entry_name(sheet_name)
+        if self._snapshot is not None:
+            if not self._manifest_checked:
+                self._manifest = self._snapshot.read_valid_manifest()
+                self._manifest_checked = True
+            if self._manifest is not None:
+                sheet_data = self._snapshot.load_entry(self._manifest, entry_name)
+                if sheet_data is not None:
+                    profiler.count("sheets read from snapshot")
+                    logging.debug(f'Loaded sheet {sheet_name} from snapshot {self._snapshot.snapshot_directory}')
+                    return sheet_data
+
+        sheet_data = self._parse_sheet(sheet_name)
+        profiler.count("sheets parsed")
+        if self._snapshot is not None:
+            try:
+                self._manifest = self._snapshot.save_entries({entry_name: sheet_data}, self._manifest)
+            except OSError as error:
+                logging.debug(f'Could not save sheet {sheet_name} to snapshot {self._snapshot.snapshot_directory}: {error}')
+        return sheet_data
+
+    def _parse_sheet(self, sheet_name):
+        """
+        Parses the requested columns of a sheet from the Excel file and applies the configured dtypes.
+        Missing booleans are read as False.
+
+        Parameters:
+            sheet_name (str): The sheet name.
+
+        Returns:
+            DataFrame: The projected and typed sheet.
+        """
+        if self._excel_file is None:
+            self._excel_file = pd.ExcelFile(self.loader.file_path)
+        sheet_data = self._excel_file.parse(sheet_name, usecols=self.sheet_columns[sheet_name])
+        for column, dtype in self.column_dtypes.items():
+            if column not in sheet_data.columns:
+                continue
+            if dtype == "bool":
+                sheet_data[column] = sheet_data[column].fillna(False).astype(bool)
+            else:
+                sheet_data[column] = sheet_data[column].astype(dtype)
+        return sheet_data
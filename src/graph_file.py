@@ -0,0 +1,246 @@
+import os
+import json
+import struct
+import hashlib
+from collections.abc import Sequence
+import numpy as np
+import config
+from node_graph import NodeGraph
+from yield_index import YieldIndex
+from connection_solver import ConnectionSolver
+
+class StringTable(Sequence):
+    """
+    A read-only list of strings stored as references into a table of unique strings, so repeated names such as
+    node types share one string object and the list itself stays a mapped array.
+
+    Attributes:
+        references (ndarray): The table position of each item.
+        strings (list): The unique strings.
+    """
+
+    __slots__ = ("references", "strings")
+
+    def __init__(self, references, strings):
+        """
+        Initializes the list over a string table.
+
+        Parameters:
+            references (ndarray): The table position of each item.
+            strings (list): The unique strings.
+        """
+        self.references = references
+        self.strings = strings
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.strings[position] for position in self.references[index].tolist()]
+        return self.strings[self.references[index]]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return len(self.references)
+
+    def __reduce__(self):
+        # Pickled as a plain list, so worker processes do not need the mapped file.
+        return list, (self[:],)
+
+
+class GraphFile:
+    """
+    Stores the compiled node graph, its yield index and its solved cheapest connections in one versioned binary
+    file that is opened by memory-mapping it, so loading takes no parsing and every process opening the file
+    shares the same pages.
+
+    The file starts with a fixed header: a magic string, the format version and the SHA-256 content hash of the
+    workbook it was compiled from, followed by the length of a JSON directory. The directory names every array
+    with its dtype, shape and offset; the arrays follow, each 8-byte aligned. Node names, node types, lodging
+    names and yield names are stored once in an interned string table, which is decoded when the file is opened.
+    The file is mapped copy-on-write, so applying changes in memory never writes back to it.
+
+    A file is stale when its format version or workbook hash differs from the current ones, and it is rewritten
+    from the freshly compiled structures.
+
+    Attributes:
+        file_path (str): The path of the graph file.
+    """
+
+    MAGIC = b"NPEGRAPH"
+    HEADER_FORMAT = "<8sII64sQ"  # magic, format version, reserved, workbook hash, directory length
+
+    def __init__(self, file_path):
+        """
+        Initializes the graph file.
+
+        Parameters:
+            file_path (str): The path of the graph file.
+        """
+        self.file_path = file_path
+
+    @classmethod
+    def for_workbook(cls, workbook_path, graph_directory=None):
+        """
+        Returns the graph file of a workbook, named after a hash of the workbook's absolute path.
+
+        Parameters:
+            workbook_path (str): The path to the Excel workbook.
+            graph_directory (str, optional): The directory graph files are stored in. Defaults to config.GRAPH_FILE_DIRECTORY.
+
+        Returns:
+            GraphFile: The workbook's graph file.
+        """
+        path_digest = hashlib.sha1(os.path.abspath(workbook_path).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(graph_directory or config.GRAPH_FILE_DIRECTORY, f"{path_digest}.npg"))
+
+    def read_header(self):
+        """
+        Reads the file's header and directory.
+
+        Returns:
+            tuple: The format version, the workbook hash, the directory and the offset where the arrays start, or
+            None when the file is missing or not a graph file.
+        """
+        header_size = struct.calcsize(self.HEADER_FORMAT)
+        try:
+            with open(self.file_path, "rb") as graph_file:
+                header = graph_file.read(header_size)
+                if len(header) < header_size:
+                    return None
+                magic, format_version, _, workbook_hash, directory_length = struct.unpack(self.HEADER_FORMAT, header)
+                if magic != self.MAGIC:
+                    return None
+                directory = json.loads(graph_file.read(directory_length))
+        except (OSError, ValueError):
+            return None
+        data_offset = (header_size + directory_length + 7) // 8 * 8
+        return format_version, workbook_hash.decode("ascii"), directory, data_offset
+
+    def is_current(self, workbook_hash):
+        """
+        Checks whether the file exists and was written by this format version from the given workbook.
+
+        Parameters:
+            workbook_hash (str): The content hash of the workbook.
+
+        Returns:
+            bool: True when the file can be opened in place of compiling the workbook.
+        """
+        header = self.read_header()
+        return header is not None and header[0] == config.GRAPH_FILE_FORMAT_VERSION and header[1] == workbook_hash
+
+    def write(self, node_graph, yield_index, connection_solver, workbook_hash):
+        """
+        Writes the compiled structures to the file, through a temporary file and an atomic rename.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            yield_index (YieldIndex): The yield index.
+            connection_solver (ConnectionSolver): The solved cheapest connections of the graph.
+            workbook_hash (str): The content hash of the workbook the structures were compiled from.
+        """
+        string_positions = {}
+
+        def intern(strings):
+            return np.array([string_positions.setdefault(str(string), len(string_positions)) for string in strings], dtype=np.int32)
+
+        yield_names = list(yield_index.yield_names)
+        yield_node_ids = [np.asarray(yield_index.node_ids_by_yield[yield_name], dtype=np.int64) for yield_name in yield_names]
+        arrays = {
+            "node_ids": node_graph.node_ids,
+            "cp_cost": node_graph.cp_cost,
+            "connected": node_graph.connected,
+            "city_town_mask": node_graph.city_town_mask,
+            "lodging_cp_cost": node_graph.lodging_cp_cost,
+            "adjacency_offsets": node_graph.adjacency_offsets,
+            "adjacency_indices": node_graph.adjacency_indices,
+            "reverse_offsets": node_graph.reverse_offsets,
+            "reverse_indices": node_graph.reverse_indices,
+            "node_name_references": intern(node_graph.node_names),
+            "node_type_references": intern(node_graph.node_types),
+            "lodging_name_references": intern(node_graph.lodging_names),
+            "yield_name_references": intern(yield_names),
+            "yield_offsets": np.r_[0, np.cumsum([len(node_ids) for node_ids in yield_node_ids])].astype(np.int64),
+            "yield_node_ids": np.concatenate(yield_node_ids) if yield_node_ids else np.empty(0, dtype=np.int64),
+            "solver_total_cost": connection_solver.total_cost,
+            "solver_path_cost": connection_solver.path_cost,
+            "solver_predecessor": connection_solver.predecessor,
+            "solver_root": connection_solver.root,
+        }
+        encoded_strings = [string.encode("utf-8") for string in string_positions]
+        arrays["string_offsets"] = np.r_[0, np.cumsum([len(encoded) for encoded in encoded_strings])].astype(np.int64)
+        arrays["string_blob"] = np.frombuffer(b"".join(encoded_strings), dtype=np.uint8)
+
+        directory = {}
+        offset = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            arrays[name] = array
+            directory[name] = [array.dtype.str, list(array.shape), offset]
+            offset += (array.nbytes + 7) // 8 * 8
+        directory_bytes = json.dumps(directory).encode("utf-8")
+        header = struct.pack(self.HEADER_FORMAT, self.MAGIC, config.GRAPH_FILE_FORMAT_VERSION, 0, workbook_hash.encode("ascii"), len(directory_bytes))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        temporary_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as graph_file:
+            graph_file.write(header + directory_bytes)
+            graph_file.write(b"\0" * (-graph_file.tell() % 8))
+            for array in arrays.values():
+                graph_file.write(array.tobytes())
+                graph_file.write(b"\0" * (-array.nbytes % 8))
+        os.replace(temporary_path, self.file_path)
+
+    def open(self):
+        """
+        Memory-maps the file and rebuilds the structures as views on top of it.
+
+        Returns:
+            tuple: The NodeGraph, the YieldIndex and the ConnectionSolver.
+        """
+        _, _, directory, data_offset = self.read_header()
+        mapped_file = np.memmap(self.file_path, dtype=np.uint8, mode="c")
+        arrays = {}
+        for name, (dtype, shape, offset) in directory.items():
+            dtype = np.dtype(dtype)
+            start = data_offset + offset
+            arrays[name] = mapped_file[start:start + dtype.itemsize * int(np.prod(shape))].view(dtype).reshape(shape)
+
+        string_blob = arrays["string_blob"].tobytes()
+        string_offsets = arrays["string_offsets"].tolist()
+        unique_strings = [string_blob[start:end].decode("utf-8") for start, end in zip(string_offsets, string_offsets[1:])]
+
+        def strings(references):
+            return StringTable(references, unique_strings)
+
+        node_graph = NodeGraph.__new__(NodeGraph)
+        for name in ("node_ids", "cp_cost", "connected", "city_town_mask", "lodging_cp_cost", "adjacency_offsets", "adjacency_indices", "reverse_offsets", "reverse_indices"):
+            setattr(node_graph, name, arrays[name])
+        node_graph.index_of = dict(zip(node_graph.node_ids.tolist(), range(len(node_graph.node_ids))))
+        node_graph.node_names = strings(arrays["node_name_references"])
+        node_graph.node_types = strings(arrays["node_type_references"])
+        node_graph.lodging_names = strings(arrays["lodging_name_references"])[:]  # Changed in place by NodeProcessor.apply_changes
+
+        yield_index = YieldIndex.__new__(YieldIndex)
+        yield_index.yield_names = strings(arrays["yield_name_references"])[:]
+        yield_offsets = arrays["yield_offsets"].tolist()
+        yield_index.node_ids_by_yield = {
+            yield_name: arrays["yield_node_ids"][yield_offsets[position]:yield_offsets[position + 1]]
+            for position, yield_name in enumerate(yield_index.yield_names)
+        }
+        yields_by_node_id = {}
+        for yield_name, node_ids in yield_index.node_ids_by_yield.items():
+            for node_id in node_ids.tolist():
+                yields_by_node_id.setdefault(node_id, []).append(yield_name)
+        yield_index.yields_by_node_id = yields_by_node_id  # Already sorted, as yield_names is
+
+        connection_solver = ConnectionSolver.__new__(ConnectionSolver)
+        connection_solver.node_graph = node_graph
+        connection_solver.lodging_names = node_graph.lodging_names
+        connection_solver.lodging_cp_cost = node_graph.lodging_cp_cost
+        connection_solver.total_cost = arrays["solver_total_cost"]
+        connection_solver.path_cost = arrays["solver_path_cost"]
+        connection_solver.predecessor = arrays["solver_predecessor"]
+        connection_solver.root = arrays["solver_root"]
+        return node_graph, yield_index, connection_solver
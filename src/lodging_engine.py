@@ -0,0 +1,256 @@
+import re
+import numpy as np
+import pandas as pd
+import config
+
+class LodgingEngine:
+    """
+    Precomputed lodging costs, built once from the "Worker's Lodging" and "Lodging Usages" sheets.
+
+    Every house listed on either sheet is stored once, keyed by its Node ID and lodging name. The cost of a house
+    is the CP of its whole Parent Lodging chain: its own CP cost plus the chain cost of its parent, which may be a
+    house that is only listed on the "Lodging Usages" sheet. A house can only be used when it and every house in its
+    chain are available; houses missing from the "Worker's Lodging" sheet carry no "Available" flag and count as
+    available. When a parent cannot be found, the sheet's "Total Lodging CP Cost" is used as the chain cost.
+
+    Worker lodgings are the houses listed on the "Worker's Lodging" sheet. An inverted index maps each usage, such as
+    "Refinery" or "Storage", to the houses offering it.
+
+    Attributes:
+        node_ids (ndarray): Node ID per house.
+        lodging_names (list): Lodging name per house.
+        cp_cost (ndarray): The house's own CP cost.
+        parent_position (ndarray): Position of the parent house, or -1 when it has none or it cannot be found.
+        chain_cost (ndarray): CP of the house and every house in its Parent Lodging chain.
+        available (ndarray): The house's own "Available" flag.
+        chain_available (ndarray): True when the house and every house in its chain are available.
+        worker_lodging_mask (ndarray): True for houses listed on the "Worker's Lodging" sheet.
+        positions_by_node_id (dict): Node IDs mapped to arrays of the positions of their houses.
+        positions_by_usage (dict): Normalized usage names mapped to sorted arrays of the positions of the houses offering them.
+        usage_names (dict): Normalized usage names mapped to their display name.
+    """
+
+    def __init__(self, workers_lodging_data, lodging_usages_data=None):
+        """
+        Builds the engine.
+
+        Parameters:
+            workers_lodging_data (DataFrame): Data for worker lodgings.
+            lodging_usages_data (DataFrame, optional): Data for lodging usages. Defaults to none.
+        """
+        house_columns = [config.COLUMN_NODE_ID, config.COLUMN_LODGING_NAME, config.COLUMN_CP_COST, config.COLUMN_PARENT_LODGING, config.COLUMN_TOTAL_LODGING_CP_COST]
+        houses = workers_lodging_data.reindex(columns=house_columns + [config.COLUMN_AVAILABLE]).assign(worker_lodging=True)
+        if lodging_usages_data is not None:
+            houses = pd.concat([houses, lodging_usages_data.reindex(columns=house_columns + config.COLUMN_USAGES).assign(worker_lodging=False)], ignore_index=True)
+        # A house listed on both sheets is kept once, with the "Worker's Lodging" row first and the usages of every row
+        house_keys = list(zip(houses[config.COLUMN_NODE_ID].astype(np.int64).tolist(), houses[config.COLUMN_LODGING_NAME].astype(str).tolist()))
+        first_position = {}
+        for row_position, house_key in enumerate(house_keys):
+            first_position.setdefault(house_key, row_position)
+        unique_rows = sorted(first_position.values())
+
+        self.node_ids = houses[config.COLUMN_NODE_ID].to_numpy(dtype=np.int64)[unique_rows]
+        self.lodging_names = [house_keys[row_position][1] for row_position in unique_rows]
+        self.cp_cost = houses[config.COLUMN_CP_COST].fillna(0).to_numpy(dtype=np.float64)[unique_rows]
+        sheet_total_cost = houses[config.COLUMN_TOTAL_LODGING_CP_COST].fillna(0).to_numpy(dtype=np.float64)[unique_rows]
+        available_flags = houses[config.COLUMN_AVAILABLE]
+        self.available = np.where(available_flags.isna(), True, available_flags.to_numpy(dtype=object)).astype(bool)[unique_rows]
+        self.worker_lodging_mask = houses["worker_lodging"].to_numpy(dtype=bool)[unique_rows]
+        position_of = {house_keys[row_position]: position for position, row_position in enumerate(unique_rows)}
+        parent_names = houses[config.COLUMN_PARENT_LODGING].fillna(config.NO_PARENT_LODGING).astype(str).to_numpy()[unique_rows]
+        self.parent_position = np.array([
+            position_of.get((node_id, parent_name), -1) if parent_name != config.NO_PARENT_LODGING else -1
+            for node_id, parent_name in zip(self.node_ids.tolist(), parent_names.tolist())
+        ], dtype=np.int64)
+        has_unknown_parent = (parent_names != config.NO_PARENT_LODGING) & (self.parent_position < 0)
+        self._own_chain_cost = np.where(has_unknown_parent, sheet_total_cost, self.cp_cost)
+
+        node_order = np.argsort(self.node_ids, kind="stable")
+        node_starts = np.flatnonzero(np.r_[True, np.diff(self.node_ids[node_order]) != 0])
+        self.positions_by_node_id = {
+            int(self.node_ids[node_positions[0]]): node_positions
+            for node_positions in np.split(node_order, node_starts[1:]) if len(node_positions)
+        }
+        self.chain_cost = np.zeros(len(self.node_ids), dtype=np.float64)
+        self.chain_available = np.zeros(len(self.node_ids), dtype=bool)
+        self._resolve_chains(np.arange(len(self.node_ids)))
+
+        self.usage_names = {}
+        usage_positions = {}
+        if lodging_usages_data is not None:
+            usage_rows = np.flatnonzero(~houses["worker_lodging"].to_numpy(dtype=bool))
+            usage_values = houses[config.COLUMN_USAGES].to_numpy(dtype=object)[usage_rows]
+            for row_position, row_usages in zip(usage_rows.tolist(), usage_values.tolist()):
+                for usage in row_usages:
+                    usage_name = self.normalize_usage_name(usage) if isinstance(usage, str) else ""
+                    if usage_name:
+                        self.usage_names.setdefault(usage_name, usage.strip())
+                        usage_positions.setdefault(usage_name, set()).add(position_of[house_keys[row_position]])
+        self.positions_by_usage = {usage_name: np.array(sorted(positions), dtype=np.int64) for usage_name, positions in usage_positions.items()}
+        self._minimum_tables = {}
+
+    @staticmethod
+    def normalize_usage_name(usage_name):
+        """
+        Normalizes a usage name by case-folding it and collapsing runs of whitespace into single spaces.
+
+        Parameters:
+            usage_name (str): The usage name to normalize.
+
+        Returns:
+            str: The normalized usage name.
+        """
+        return re.sub(r"\s+", " ", str(usage_name)).strip().casefold()
+
+    def _resolve_chains(self, positions):
+        """
+        Recomputes the chain cost and chain availability of houses. Parents always belong to the same node, so
+        passing every house of a node recomputes that node completely.
+
+        Parameters:
+            positions (ndarray): Positions of the houses to recompute.
+        """
+        resolved = {}
+        for position in positions.tolist():
+            chain = []
+            current_position = position
+            while current_position >= 0 and current_position not in resolved and current_position not in chain:
+                chain.append(current_position)
+                current_position = int(self.parent_position[current_position])
+            parent_cost, parent_available = resolved.get(current_position, (0.0, True))
+            for chain_position in reversed(chain):
+                parent_cost += self._own_chain_cost[chain_position]
+                parent_available = parent_available and bool(self.available[chain_position])
+                resolved[chain_position] = (parent_cost, parent_available)
+        for position, (chain_cost, chain_available) in resolved.items():
+            self.chain_cost[position] = chain_cost
+            self.chain_available[position] = chain_available
+
+    def _minimum_table(self, usage_name=None):
+        """
+        Returns, per node, the position of the cheapest usable worker lodging or house with a usage. Ties keep the
+        house listed first.
+
+        Parameters:
+            usage_name (str, optional): A normalized usage name. Defaults to worker lodgings.
+
+        Returns:
+            dict: Node IDs mapped to house positions.
+        """
+        if usage_name not in self._minimum_tables:
+            candidate_positions = np.flatnonzero(self.worker_lodging_mask) if usage_name is None else self.positions_by_usage.get(usage_name, np.empty(0, dtype=np.int64))
+            candidate_positions = candidate_positions[self.chain_available[candidate_positions]]
+            order = np.lexsort((candidate_positions, self.chain_cost[candidate_positions], self.node_ids[candidate_positions]))
+            ordered_positions = candidate_positions[order]
+            node_ids, first_indices = np.unique(self.node_ids[ordered_positions], return_index=True)
+            self._minimum_tables[usage_name] = dict(zip(node_ids.tolist(), ordered_positions[first_indices].tolist()))
+        return self._minimum_tables[usage_name]
+
+    def minimum_lodging_table(self, node_ids=None):
+        """
+        Returns the cheapest usable worker lodging per node, in the columns of the "Worker's Lodging" sheet, with
+        "Total Lodging CP Cost" holding the chain cost.
+
+        Parameters:
+            node_ids (iterable, optional): Only include these Node IDs. Defaults to every node with a lodging.
+
+        Returns:
+            DataFrame: One row per node with the columns Node ID, Lodging Name, Total Lodging CP Cost and Available.
+        """
+        minimum_table = self._minimum_table()
+        if node_ids is not None:
+            node_ids = set(map(int, node_ids))
+            minimum_table = {node_id: position for node_id, position in minimum_table.items() if node_id in node_ids}
+        positions = np.array(list(minimum_table.values()), dtype=np.int64)
+        return pd.DataFrame({
+            config.COLUMN_NODE_ID: self.node_ids[positions],
+            config.COLUMN_LODGING_NAME: [self.lodging_names[position] for position in positions.tolist()],
+            config.COLUMN_TOTAL_LODGING_CP_COST: self.chain_cost[positions],
+            config.COLUMN_AVAILABLE: self.chain_available[positions],
+        })
+
+    def minimum_lodging(self, node_id, usage_name=None):
+        """
+        Returns the cheapest usable worker lodging, or house with a usage, of a node.
+
+        Parameters:
+            node_id (int): The Node ID.
+            usage_name (str, optional): A normalized usage name. Defaults to worker lodgings.
+
+        Returns:
+            tuple: The lodging name and its chain cost, or the configured defaults when the node has none.
+        """
+        position = self._minimum_table(usage_name).get(int(node_id))
+        if position is None:
+            return config.DEFAULT_NO_LODGING_NAME, config.DEFAULT_NO_LODGING_CP_COST
+        return self.lodging_names[position], float(self.chain_cost[position])
+
+    def minimum_lodging_arrays(self, node_ids, usage_name=None):
+        """
+        Returns the cheapest usable worker lodging, or house with a usage, for an array of nodes, ready to be used
+        as the lodging costs of a ConnectionSolver.
+
+        Parameters:
+            node_ids (ndarray): Node IDs, e.g. the node_ids of a NodeGraph.
+            usage_name (str, optional): A normalized usage name. Defaults to worker lodgings.
+
+        Returns:
+            tuple: A list of lodging names and an array of chain costs aligned with node_ids; nodes without a
+            matching lodging get config.DEFAULT_NO_LODGING_NAME and an infinite cost.
+        """
+        minimum_table = self._minimum_table(usage_name)
+        positions = np.array([minimum_table.get(node_id, -1) for node_id in np.asarray(node_ids).tolist()], dtype=np.int64)
+        lodging_names = [self.lodging_names[position] if position >= 0 else config.DEFAULT_NO_LODGING_NAME for position in positions.tolist()]
+        return lodging_names, np.where(positions >= 0, self.chain_cost[np.maximum(positions, 0)], np.inf)
+
+    def resolve_usage(self, usage_name):
+        """
+        Resolves a usage name: an exact match after normalization, otherwise the only usage starting with it.
+
+        Parameters:
+            usage_name (str): The requested usage name.
+
+        Returns:
+            str: The normalized usage name, or None when it is unknown or ambiguous.
+        """
+        normalized_name = self.normalize_usage_name(usage_name)
+        if normalized_name in self.positions_by_usage:
+            return normalized_name
+        prefix_matches = [name for name in self.positions_by_usage if normalized_name and name.startswith(normalized_name)]
+        return prefix_matches[0] if len(prefix_matches) == 1 else None
+
+    def lodgings_with_usage(self, usage_name):
+        """
+        Lists the usable houses offering a usage, cheapest first.
+
+        Parameters:
+            usage_name (str): A normalized usage name.
+
+        Returns:
+            list: Tuples of (Node ID, lodging name, chain cost).
+        """
+        positions = self.positions_by_usage.get(usage_name, np.empty(0, dtype=np.int64))
+        positions = positions[self.chain_available[positions]]
+        positions = positions[np.lexsort((positions, self.chain_cost[positions]))]
+        return [(int(self.node_ids[position]), self.lodging_names[position], float(self.chain_cost[position])) for position in positions.tolist()]
+
+    def set_available(self, node_id, lodging_name, is_available):
+        """
+        Changes the "Available" flag of a house and recomputes its node's chains and minimum tables.
+
+        Parameters:
+            node_id (int): The Node ID of the house.
+            lodging_name (str): The lodging name of the house.
+            is_available (bool): The new flag.
+
+        Returns:
+            bool: False when no such house exists.
+        """
+        node_positions = self.positions_by_node_id.get(int(node_id), np.empty(0, dtype=np.int64))
+        matching_positions = [position for position in node_positions.tolist() if self.lodging_names[position] == lodging_name]
+        if not matching_positions:
+            return False
+        self.available[matching_positions] = bool(is_available)
+        self._resolve_chains(node_positions)
+        self._minimum_tables.clear()
+        return True
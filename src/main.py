@@ -1,35 +1,208 @@
+import os
 import sys
-from data_loader import ExcelDataLoader
-from node_processor import NodeProcessor
-from results_visualizer import ResultsVisualizer
+import argparse
+import contextlib
+import multiprocessing
 import config
+from profiling import profiler, setup_profiling
+
+# pandas and the processing modules are imported by load_processor, once the chosen mode needs them, so --help,
+# --serve and argument errors do not wait for them.
 
 def sanitize_yield_names(yield_names):
     """Convert comma-separated string to a set of normalized (stripped, lowercased) yield names."""
     return {name.strip().lower() for name in yield_names.split(',')}
 
+def parse_arguments():
+    """Parse the command-line arguments of the application."""
+    parser = argparse.ArgumentParser(description="BDO NodePath Explorer")
+    parser.add_argument("yield_names", nargs="?", default=config.YIELD_NAMES, help="Comma-separated yield names (defaults to config.YIELD_NAMES).")
+    parser.add_argument("--combined", action="store_true", help="Find one combined plan covering all yields, sharing path nodes between them.")
+    parser.add_argument("--time-budget", type=float, default=config.COMBINED_PLAN_TIME_BUDGET, help="Seconds the combined plan may spend searching (defaults to config.COMBINED_PLAN_TIME_BUDGET).")
+    parser.add_argument("--budget", type=float, metavar="CP", help="Find the nodes and lodgings covering the most yields within a CP budget; yields can be weighted as \"wheat:3, potato:1\".")
+    parser.add_argument("--top-k", type=int, metavar="K", help=f"List the K cheapest distinct connection plans per yield instead of only the cheapest, e.g. --top-k {config.TOP_K_PATHS}.")
+    parser.add_argument("--lodging-usage", metavar="USAGE", help="Connect each yield to the cheapest house with a lodging usage, e.g. \"Refinery\", instead of the cheapest worker lodging.")
+    parser.add_argument("--regions", metavar="REGIONS", help="Route through the region index and keep paths inside these comma-separated regions, e.g. \"Calpheon Territory, Serendia Territory\"; \"all\" allows every region.")
+    parser.add_argument("--player-profiles", action="append", metavar="PATH", help="Compare the yields' cheapest Total CP across players, each described by a JSON overlay file of Connected/Available changes (see player_profiles.py). Can be repeated; a directory stands for its .json files.")
+    parser.add_argument("--state", default=config.PLAYER_STATE_FILE, metavar="FILE", help="Player state file with the Connected nodes and Available lodgings applied on top of the workbook (defaults to config.PLAYER_STATE_FILE).")
+    parser.add_argument("--connect", type=int, nargs="+", default=[], metavar="NODE_ID", help="Record nodes as connected in the player state file and exit.")
+    parser.add_argument("--disconnect", type=int, nargs="+", default=[], metavar="NODE_ID", help="Record nodes as not connected in the player state file and exit.")
+    parser.add_argument("--available", nargs=2, action="append", default=[], metavar=("NODE_ID", "LODGING_NAME"), help="Record a lodging as available in the player state file and exit.")
+    parser.add_argument("--unavailable", nargs=2, action="append", default=[], metavar=("NODE_ID", "LODGING_NAME"), help="Record a lodging as not available in the player state file and exit.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and refresh the results and HTML report whenever the workbook or player state file changes, re-parsing only the changed sheets.")
+    parser.add_argument("--workers", type=int, help="Worker processes to spread the yields over; 0 uses every CPU core (defaults to config.PARALLEL_WORKER_COUNT, used for batches of at least config.PARALLEL_MIN_YIELDS yields).")
+    parser.add_argument("--batch", metavar="FILE", help="Process JSONL scenarios from FILE, or - for stdin, and stream the results without opening a browser (see batch_processor.py).")
+    parser.add_argument("--batch-output", metavar="FILE", help="Write batch results to FILE instead of stdout.")
+    parser.add_argument("--batch-format", choices=("jsonl", "csv"), help="Format of the batch results (defaults to csv for a .csv output file, otherwise jsonl).")
+    parser.add_argument("--serve", action="store_true", help="Keep the workbook loaded and answer queries over local HTTP (see query_server.py).")
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT, help="Port of the query server (defaults to config.SERVER_PORT).")
+    parser.add_argument("--profile", action="store_true", help="Time each stage and print a summary table; a JSON trace is written to the output directory.")
+    parser.add_argument("--profile-cprofile", action="store_true", help="Like --profile, and also run the whole process under cProfile.")
+    parser.add_argument("--profile-memory", action="store_true", help="Like --profile, and also trace memory allocations with tracemalloc.")
+    parser.add_argument("--no-cache", action="store_true", help="Always parse the Excel file and do not use the workbook snapshot or graph file.")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Re-parse the Excel file and rebuild the workbook snapshot and graph file.")
+    parser.add_argument("--no-result-cache", action="store_true", help="Recompute every yield instead of reusing results cached for the same workbook and state.")
+    return parser.parse_args()
+
+def load_processor(arguments):
+    """
+    Loads the workbook named by config.EXCEL_FILE_PATH and returns a NodeProcessor over it. Only the sheets and
+    columns the NodeProcessor needs are parsed, each on first use.
+
+    Parameters:
+        arguments (Namespace): The parsed command-line arguments.
+
+    Returns:
+        NodeProcessor: The processor with the player state applied, using the result cache unless --no-result-cache
+        was given.
+    """
+    from data_loader import ExcelDataLoader
+    from node_processor import NodeProcessor
+    from result_cache import ResultCache
+    from player_state import PlayerState
+
+    loader = ExcelDataLoader(config.EXCEL_FILE_PATH, use_snapshot=not arguments.no_cache, rebuild_snapshot=arguments.rebuild_cache)
+    processor = NodeProcessor(loader.load_sheets(NodeProcessor.REQUIRED_COLUMNS, NodeProcessor.COLUMN_DTYPES))
+    workbook_hash = None if arguments.no_cache and arguments.no_result_cache else loader.content_hash()
+    if not arguments.no_cache:
+        from graph_file import GraphFile
+        processor.use_graph_file(GraphFile.for_workbook(config.EXCEL_FILE_PATH), workbook_hash, rebuild=arguments.rebuild_cache)
+    if not arguments.no_result_cache:
+        processor.use_result_cache(ResultCache(), workbook_hash)
+    processor.apply_player_state(PlayerState.load(arguments.state))
+    return processor
+
+def update_player_state(arguments):
+    """
+    Records the --connect, --disconnect, --available and --unavailable changes in the player state file. The
+    workbook is neither loaded nor changed.
+
+    Parameters:
+        arguments (Namespace): The parsed command-line arguments.
+    """
+    from player_state import PlayerState
+
+    player_state = PlayerState.load(arguments.state)
+    player_state.set_connected(arguments.connect, True)
+    player_state.set_connected(arguments.disconnect, False)
+    player_state.set_available([(int(node_id), lodging_name) for node_id, lodging_name in arguments.available], True)
+    player_state.set_available([(int(node_id), lodging_name) for node_id, lodging_name in arguments.unavailable], False)
+    player_state.save()
+    print(f"Saved {len(player_state.connected_nodes)} node and {len(player_state.available_lodgings)} lodging flags to {arguments.state}.")
+
+def process_yields(processor, arguments):
+    """
+    Processes config.YIELD_NAMES in the mode chosen on the command line.
+
+    Parameters:
+        processor (NodeProcessor): The processor holding the loaded workbook.
+        arguments (Namespace): The parsed command-line arguments.
+
+    Returns:
+        iterable: Tuples of a yield name or plan title and its DataFrame of results; a generator for the per-yield
+        and ranked modes, so each yield can be written out as soon as it is processed.
+    """
+    if arguments.combined:
+        return processor.process_combined_plan(config.YIELD_NAMES, arguments.time_budget)
+    if arguments.budget is not None:
+        return processor.process_budget_plan(config.YIELD_NAMES, arguments.budget)
+    if arguments.lodging_usage:
+        return processor.process_usage(config.YIELD_NAMES, arguments.lodging_usage)
+    if arguments.regions:
+        region_names = None if arguments.regions.strip().lower() == "all" else arguments.regions.split(",")
+        return processor.process_regions(config.YIELD_NAMES, region_names)
+    if arguments.player_profiles:
+        from player_profiles import PlayerProfiles
+        all_yield_results = processor.process_player_profiles(config.YIELD_NAMES, PlayerProfiles.read_overlays(arguments.player_profiles))
+        os.makedirs(config.OUTPUT_DIRECTORY, exist_ok=True)
+        all_yield_results[0][1].to_csv(os.path.join(config.OUTPUT_DIRECTORY, config.PLAYER_PROFILE_MATRIX_FILE_NAME), index=False)
+        return all_yield_results
+    if arguments.top_k:
+        return processor.stream_ranked(config.YIELD_NAMES, arguments.top_k)
+    return processor.stream_nodes(config.YIELD_NAMES, arguments.workers)
+
+def watch(arguments):
+    """
+    Processes the yields, then watches the workbook and the player state file and processes them again whenever
+    either changes, refreshing the console output and the HTML report. Only the sheets that changed are parsed
+    again, and a burst of saves refreshes once. The report is opened in the browser the first time only. Runs until
+    interrupted with Ctrl+C.
+
+    Parameters:
+        arguments (Namespace): The parsed command-line arguments.
+    """
+    from workbook_cache import WarmProcessorCache
+    from result_cache import ResultCache
+    from results_visualizer import ResultsVisualizer
+    from workbook_watcher import FileWatcher
+
+    processor_cache = WarmProcessorCache(use_snapshot=not arguments.no_cache, rebuild_snapshot=arguments.rebuild_cache, result_cache=None if arguments.no_result_cache else ResultCache(), player_state_path=arguments.state)
+    file_watcher = FileWatcher([config.EXCEL_FILE_PATH, arguments.state])
+    report_opened = False
+    while True:
+        try:
+            all_yield_results = process_yields(processor_cache.get_processor(config.EXCEL_FILE_PATH), arguments)
+            ResultsVisualizer.save_html_report(ResultsVisualizer.stream_console_output(all_yield_results))
+        except Exception as error:
+            # E.g. a sheet left with invalid data; the next save is picked up again.
+            print(f"Error: {error}")
+        else:
+            if not report_opened:
+                ResultsVisualizer.open_html()
+                report_opened = True
+        print(f"Watching {config.EXCEL_FILE_PATH} and {arguments.state} for changes. Press Ctrl+C to stop.")
+        try:
+            changed_paths = file_watcher.wait_for_changes()
+        except KeyboardInterrupt:
+            return
+        print(f"Changed: {', '.join(changed_paths)}. Refreshing...")
+
 if __name__ == "__main__":
-    # Check for command-line arguments; if provided, use these, otherwise use config.YIELD_NAMES.
-    if len(sys.argv) > 1:
-        input_yield_names = sys.argv[1]
-        normalized_yield_names = sanitize_yield_names(input_yield_names)
-    else:
-        normalized_yield_names = sanitize_yield_names(config.YIELD_NAMES)
+    # Allow worker processes of the parallel mode to start from a frozen executable.
+    multiprocessing.freeze_support()
+
+    # Use the yield names given on the command line, otherwise config.YIELD_NAMES.
+    arguments = parse_arguments()
+    setup_profiling()
+    if arguments.connect or arguments.disconnect or arguments.available or arguments.unavailable:
+        update_player_state(arguments)
+        raise SystemExit
+    if arguments.serve:
+        import query_server
+        query_server.serve(config.EXCEL_FILE_PATH, port=arguments.port, use_snapshot=not arguments.no_cache, use_result_cache=not arguments.no_result_cache, player_state_path=arguments.state)
+        raise SystemExit
+    if arguments.batch:
+        from batch_processor import run_batch
+        processor = load_processor(arguments)
+        batch_format = arguments.batch_format or ("csv" if (arguments.batch_output or "").lower().endswith(".csv") else "jsonl")
+        with contextlib.ExitStack() as open_files:
+            scenario_lines = sys.stdin if arguments.batch == "-" else open_files.enter_context(open(arguments.batch, "r", encoding="utf-8"))
+            output_sink = open_files.enter_context(open(arguments.batch_output, "w", encoding="utf-8", newline="")) if arguments.batch_output else sys.stdout
+            # Warnings go to stderr, so the results on stdout stay machine-readable.
+            with contextlib.redirect_stdout(sys.stderr):
+                scenario_count, failed_count = run_batch(processor, scenario_lines, output_sink, batch_format)
+        print(f"Processed {scenario_count} scenarios, {failed_count} failed.", file=sys.stderr)
+        if profiler.enabled:
+            print(profiler.finish(os.path.join(config.OUTPUT_DIRECTORY, config.PROFILE_TRACE_FILE_NAME)), file=sys.stderr)
+        raise SystemExit(1 if failed_count else 0)
+    normalized_yield_names = sanitize_yield_names(arguments.yield_names)
 
     # Convert the set back to a sorted comma-separated string and update config.YIELD_NAMES.
     config.YIELD_NAMES = ', '.join(sorted(normalized_yield_names))
 
-    # Load node data from the Excel file specified in the application's configuration.
-    loader = ExcelDataLoader(config.EXCEL_FILE_PATH)
-    excel_sheets_data = loader.load_excel_data()
-    
-    # Process the loaded node data to calculate optimal paths and CP investments for specified yields.
-    processor = NodeProcessor(excel_sheets_data)
-    all_yield_results = processor.process_nodes(config.YIELD_NAMES)
+    # Load node data from the Excel file specified in the application's configuration, then process it to
+    # calculate optimal paths and CP investments for specified yields.
+    if arguments.watch:
+        watch(arguments)
+    else:
+        from results_visualizer import ResultsVisualizer
+        all_yield_results = process_yields(load_processor(arguments), arguments)
 
-    # Output the processed node data and analysis results to the console and an HTML file for easy viewing.
-    ResultsVisualizer.print_console_output(all_yield_results)
+        # Output the processed node data and analysis results to the console and an HTML file for easy viewing,
+        # one yield at a time as it is processed, and open the HTML file in a web browser.
+        ResultsVisualizer.save_html_report(ResultsVisualizer.stream_console_output(all_yield_results))
+        ResultsVisualizer.open_html()
 
-    # Generate and save an HTML file containing the visualized results, and open it in a web browser.
-    html_output = ResultsVisualizer.generate_html_output(all_yield_results)
-    ResultsVisualizer.save_and_open_html(html_output)
+    # Report where the time went when profiling is enabled.
+    if profiler.enabled:
+        print(profiler.finish(os.path.join(config.OUTPUT_DIRECTORY, config.PROFILE_TRACE_FILE_NAME)))
@@ -0,0 +1,150 @@
+import numpy as np
+import config
+
+class NodeGraph:
+    """
+    A compiled, integer-indexed view of the node network, built once from the "Nodes Name & Region",
+    "Node Connections" and "Worker's Lodging" sheets so that per-node lookups are O(1) array reads
+    instead of DataFrame filters.
+
+    Every node is assigned a dense index in the order it appears in the "Nodes Name & Region" sheet.
+    Connections are stored in CSR form: the neighbours of the node at index i are
+    adjacency_indices[adjacency_offsets[i]:adjacency_offsets[i + 1]].
+
+    Attributes:
+        node_ids (ndarray): Node ID per dense index.
+        index_of (dict): Maps a Node ID to its dense index.
+        node_names (list): Node name per dense index.
+        node_types (list): Node type per dense index.
+        cp_cost (ndarray): CP cost to connect each node (missing costs are read as 0).
+        connected (ndarray): Boolean flag per node, True when the node is already connected.
+        city_town_mask (ndarray): Boolean flag per node, True for node types in config.NODE_TYPES_CITY_TOWN.
+        lodging_names (list): Name of the cheapest available lodging per node, or config.DEFAULT_NO_LODGING_NAME.
+        lodging_cp_cost (ndarray): Total CP cost of the cheapest available lodging per node.
+        adjacency_offsets (ndarray): CSR row offsets, of length node_count + 1.
+        adjacency_indices (ndarray): CSR column indices (dense indices of connected nodes).
+        reverse_offsets (ndarray): CSR row offsets of the transposed adjacency, of length node_count + 1.
+        reverse_indices (ndarray): CSR column indices of the transposed adjacency (nodes connecting into each node).
+    """
+
+    def __init__(self, nodes_with_min_lodging_info, node_connection_data):
+        """
+        Compiles the graph from node data merged with minimum lodging information and the node connections.
+
+        Parameters:
+            nodes_with_min_lodging_info (DataFrame): Node data merged with minimum lodging information.
+            node_connection_data (DataFrame): Data for node connections.
+        """
+        self.node_ids = nodes_with_min_lodging_info[config.COLUMN_NODE_ID].to_numpy(dtype=np.int64)
+        self.index_of = {node_id: index for index, node_id in enumerate(self.node_ids.tolist())}
+        self.node_names = nodes_with_min_lodging_info[config.COLUMN_NODE_NAME].tolist()
+        self.node_types = nodes_with_min_lodging_info[config.COLUMN_NODE_TYPE].tolist()
+        self.cp_cost = nodes_with_min_lodging_info[config.COLUMN_CP_COST].fillna(config.DEFAULT_NO_LODGING_CP_COST).to_numpy(dtype=np.float64)
+        self.connected = nodes_with_min_lodging_info[config.COLUMN_CONNECTED].fillna(False).to_numpy(dtype=bool)
+        self.city_town_mask = nodes_with_min_lodging_info[config.COLUMN_NODE_TYPE].isin(config.NODE_TYPES_CITY_TOWN).to_numpy()
+        self.lodging_names = nodes_with_min_lodging_info[config.COLUMN_LODGING_NAME].tolist()
+        self.lodging_cp_cost = nodes_with_min_lodging_info[config.COLUMN_TOTAL_LODGING_CP_COST].to_numpy(dtype=np.float64)
+        source_node_ids = node_connection_data[config.COLUMN_NODE_ID].to_numpy(dtype=np.int64)
+        target_node_ids = node_connection_data[config.CONNECTED_NODE_ID].to_numpy(dtype=np.int64)
+        self.adjacency_offsets, self.adjacency_indices = self._build_adjacency(source_node_ids, target_node_ids)
+        self.reverse_offsets, self.reverse_indices = self._build_adjacency(target_node_ids, source_node_ids)
+
+    @property
+    def node_count(self):
+        """int: The number of nodes in the graph."""
+        return len(self.node_ids)
+
+    def indices_of(self, node_ids):
+        """
+        Maps an array of Node IDs to dense indices, using -1 for IDs that are not part of the graph.
+
+        Parameters:
+            node_ids (ndarray): Node IDs to map.
+
+        Returns:
+            ndarray: The dense index for each Node ID, or -1 when unknown.
+        """
+        order = np.argsort(self.node_ids, kind="stable")
+        sorted_ids = self.node_ids[order]
+        positions = np.clip(np.searchsorted(sorted_ids, node_ids), 0, max(len(sorted_ids) - 1, 0))
+        found = sorted_ids[positions] == node_ids if len(sorted_ids) else np.zeros(len(node_ids), dtype=bool)
+        return np.where(found, order[positions], -1)
+
+    def _build_adjacency(self, source_node_ids, target_node_ids):
+        """
+        Builds CSR adjacency arrays from parallel arrays of connection endpoints. Connections referring to
+        nodes that are missing from the "Nodes Name & Region" sheet are dropped. The original row order of
+        the connections is preserved within each node's neighbour list.
+
+        Parameters:
+            source_node_ids (ndarray): Node ID of each connection's origin.
+            target_node_ids (ndarray): Node ID of each connection's end.
+
+        Returns:
+            tuple: The CSR offsets and indices arrays.
+        """
+        sources = self.indices_of(source_node_ids)
+        targets = self.indices_of(target_node_ids)
+        valid = (sources >= 0) & (targets >= 0)
+        sources, targets = sources[valid], targets[valid]
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(self.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.node_count), out=offsets[1:])
+        return offsets, targets[order].astype(np.int64)
+
+    def index(self, node_id):
+        """
+        Returns the dense index of a Node ID.
+
+        Parameters:
+            node_id (int): The Node ID to look up.
+
+        Returns:
+            int: The dense index of the node.
+        """
+        return self.index_of[int(node_id)]
+
+    def neighbors(self, node_index):
+        """
+        Returns the dense indices of the nodes connected to a node.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            ndarray: Dense indices of the connected nodes.
+        """
+        return self.adjacency_indices[self.adjacency_offsets[node_index]:self.adjacency_offsets[node_index + 1]]
+
+    def incoming_neighbors(self, node_index):
+        """
+        Returns the dense indices of the nodes that have a connection leading into a node.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            ndarray: Dense indices of the nodes connecting into the node.
+        """
+        return self.reverse_indices[self.reverse_offsets[node_index]:self.reverse_offsets[node_index + 1]]
+
+    def connection_costs(self):
+        """
+        Returns the CP needed to connect every node, with already connected nodes costing zero.
+
+        Returns:
+            ndarray: The CP cost of connecting each node.
+        """
+        return np.where(self.connected, config.DEFAULT_NO_LODGING_CP_COST, self.cp_cost)
+
+    def connection_cost(self, node_index):
+        """
+        Returns the CP needed to connect a node, which is zero when the node is already connected.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            float: The CP cost of connecting the node.
+        """
+        return config.DEFAULT_NO_LODGING_CP_COST if self.connected[node_index] else self.cp_cost[node_index]
@@ -1,5 +1,19 @@
+import hashlib
+import logging
+import numpy as np
 import pandas as pd
 import config
+from node_graph import NodeGraph
+from connection_solver import ConnectionSolver
+from yield_index import YieldIndex
+from lodging_engine import LodgingEngine
+from combined_planner import CombinedPlanner
+from budget_planner import BudgetPlanner
+from path_ranker import PathRanker
+from region_router import RegionRouter
+from visited_path import VisitedPath
+from data_loader import LazyExcelSheets
+from profiling import profiler
 
 class NodeProcessor:
     """
@@ -7,8 +21,38 @@ class NodeProcessor:
     
     Attributes:
         excel_sheets_data (DataFrame): A DataFrame containing the loaded node data from an Excel file.
+        node_graph (NodeGraph): The compiled node graph, built on first use.
+        connection_solver (ConnectionSolver): The cheapest connection of every node to a city or town, built on first use.
+        yield_index (YieldIndex): The index from yield names to Node IDs, built on first use.
+        lodging_engine (LodgingEngine): The precomputed lodging costs and usage index, built on first use.
+        usage_solvers (dict): Normalized usage names mapped to a ConnectionSolver ending at the cheapest house with that usage.
+        region_router (RegionRouter): The hierarchical index over the graph's regions, built on first use.
+        result_cache (ResultCache): The cache per-yield results are remembered in, or None to always recompute.
+        workbook_hash (str): The content hash of the loaded workbook, part of every result cache key.
+        workbook_flags (tuple): The workbook's own "Connected" and "Available" flags of every node and lodging
+            apply_changes has changed, recorded before its first change, so a player state can restore them.
+        applied_player_state (tuple): The "Connected" and "Available" flags of the player state applied last.
     """
 
+    # Sheets and columns read by the processor, and the dtypes they are loaded with. Passing these to
+    # ExcelDataLoader.load_sheets skips parsing every other sheet and column of the workbook.
+    REQUIRED_COLUMNS = {
+        config.SHEET_NODES_NAME_REGION: [config.COLUMN_NODE_ID, config.COLUMN_NODE_NAME, config.COLUMN_NODE_REGION, config.COLUMN_CONNECTED, config.COLUMN_NODE_TYPE, config.COLUMN_CP_COST],
+        config.SHEET_NODE_CONNECTIONS: [config.COLUMN_NODE_ID, config.CONNECTED_NODE_ID],
+        config.SHEET_NODE_YIELDS: [config.COLUMN_NODE_ID, config.COLUMN_YIELD_1, config.COLUMN_YIELD_2],
+        config.SHEET_WORKERS_LODGING: [config.COLUMN_NODE_ID, config.COLUMN_LODGING_NAME, config.COLUMN_CP_COST, config.COLUMN_PARENT_LODGING, config.COLUMN_TOTAL_LODGING_CP_COST, config.COLUMN_AVAILABLE],
+        config.SHEET_LODGING_USAGES: [config.COLUMN_NODE_ID, config.COLUMN_LODGING_NAME, config.COLUMN_CP_COST, config.COLUMN_PARENT_LODGING, config.COLUMN_TOTAL_LODGING_CP_COST] + config.COLUMN_USAGES,
+    }
+    COLUMN_DTYPES = {
+        config.COLUMN_NODE_ID: "int64",
+        config.CONNECTED_NODE_ID: "int64",
+        config.COLUMN_CONNECTED: "bool",
+        config.COLUMN_AVAILABLE: "bool",
+        config.COLUMN_CP_COST: "float64",
+        config.COLUMN_YIELD_1: "category",
+        config.COLUMN_YIELD_2: "category",
+    }
+
     def __init__(self, excel_sheets_data):
         """
         Initializes the NodeProcessor with node data.
@@ -17,16 +61,97 @@ class NodeProcessor:
             excel_sheets_data (DataFrame): Node data loaded from an Excel file.
         """
         self.excel_sheets_data = excel_sheets_data
+        self.node_graph = None
+        self.connection_solver = None
+        self.yield_index = None
+        self.lodging_engine = None
+        self.usage_solvers = {}
+        self.region_router = None
+        self.result_cache = None
+        self.workbook_hash = None
+        self.workbook_flags = ({}, {})
+        self.applied_player_state = ({}, {})
+
+    def use_result_cache(self, result_cache, workbook_hash):
+        """
+        Remembers per-yield results in a cache, so repeated or overlapping queries against the same workbook and
+        Connected/Available state are not recomputed.
+        
+        Parameters:
+            result_cache (ResultCache): The cache to use, or None to stop caching.
+            workbook_hash (str): The content hash of the loaded workbook.
+        """
+        self.result_cache = result_cache
+        self.workbook_hash = workbook_hash
+
+    def state_hash(self):
+        """
+        Hashes the current "Connected" flags and lodging "Available" flags, including changes applied in memory.
+        
+        Returns:
+            str: The hexadecimal state hash.
+        """
+        state_digest = hashlib.sha1(self.build_node_graph().connected.tobytes())
+        # Read from the sheet, which apply_changes keeps in step, so hashing does not build the lodging engine.
+        state_digest.update(self.excel_sheets_data[config.SHEET_WORKERS_LODGING][config.COLUMN_AVAILABLE].to_numpy(dtype=bool).tobytes())
+        return state_digest.hexdigest()
+
+    def use_graph_file(self, graph_file, workbook_hash, rebuild=False):
+        """
+        Loads the node graph, the yield index and the cheapest connections from a memory-mapped graph file instead
+        of compiling them from the sheets. A missing or stale file is written from freshly compiled structures, so
+        the next load can map it. Call this before the graph is first built.
+        
+        Parameters:
+            graph_file (GraphFile): The workbook's graph file.
+            workbook_hash (str): The content hash of the loaded workbook.
+            rebuild (bool, optional): Ignore an existing file and write a new one. Defaults to False.
+            
+        Returns:
+            bool: True when the structures were mapped from the file.
+        """
+        if self.node_graph is not None:
+            return False  # Already compiled, possibly with changes applied that the file must not record
+        if not rebuild and graph_file.is_current(workbook_hash):
+            with profiler.span("graph file open"):
+                self.node_graph, self.yield_index, self.connection_solver = graph_file.open()
+            return True
+        connection_solver = self.build_connection_solver()
+        yield_index = self.build_yield_index()
+        try:
+            with profiler.span("graph file write"):
+                graph_file.write(self.node_graph, yield_index, connection_solver, workbook_hash)
+        except OSError as error:
+            logging.debug(f'Could not write graph file {graph_file.file_path}: {error}')
+        return False
 
-    def get_min_lodging_per_node(self):
+    def build_lodging_engine(self):
         """
-        Filters available lodgings and returns the one with the minimum CP cost per node.
+        Builds the lodging engine from the "Worker's Lodging" and, when present, "Lodging Usages" sheets. The engine
+        is built once and reused by every subsequent call.
         
+        Returns:
+            LodgingEngine: The lodging engine.
+        """
+        if self.lodging_engine is None:
+            workers_lodging_data = self.excel_sheets_data[config.SHEET_WORKERS_LODGING]
+            lodging_usages_data = self.excel_sheets_data[config.SHEET_LODGING_USAGES] if config.SHEET_LODGING_USAGES in self.excel_sheets_data else None
+            with profiler.span("lodging engine build"):
+                self.lodging_engine = LodgingEngine(workers_lodging_data, lodging_usages_data)
+        return self.lodging_engine
+
+    def get_min_lodging_per_node(self, node_ids=None):
+        """
+        Returns the available lodging with the minimum CP cost per node, costing each lodging with its whole Parent
+        Lodging chain.
+        
+        Parameters:
+            node_ids (iterable, optional): Only consider the lodgings of these Node IDs. Defaults to every node.
+            
         Returns:
             DataFrame: A DataFrame of lodgings with the minimum CP cost per node.
         """
-        filtered_lodgings_available = self.excel_sheets_data[config.SHEET_WORKERS_LODGING][self.excel_sheets_data[config.SHEET_WORKERS_LODGING][config.COLUMN_AVAILABLE] == True]
-        return filtered_lodgings_available.loc[filtered_lodgings_available.groupby(config.COLUMN_NODE_ID)[config.COLUMN_TOTAL_LODGING_CP_COST].idxmin()]
+        return self.build_lodging_engine().minimum_lodging_table(node_ids)
 
     def merge_nodes_with_lodging(self):
         """
@@ -36,136 +161,722 @@ class NodeProcessor:
             DataFrame: A DataFrame containing node information merged with minimum lodging CP costs.
         """
         node_names_and_regions = self.excel_sheets_data[config.SHEET_NODES_NAME_REGION]
-        minimum_lodging_cp_costs = self.get_min_lodging_per_node()[[config.COLUMN_NODE_ID, config.COLUMN_LODGING_NAME, config.COLUMN_TOTAL_LODGING_CP_COST, config.COLUMN_AVAILABLE]]
-        return pd.merge(node_names_and_regions, minimum_lodging_cp_costs, on=config.COLUMN_NODE_ID, how="left").fillna({config.COLUMN_TOTAL_LODGING_CP_COST: config.DEFAULT_NO_LODGING_CP_COST, config.COLUMN_LODGING_NAME: config.DEFAULT_NO_LODGING_NAME})
+        with profiler.span("lodging merge"):
+            minimum_lodging_cp_costs = self.get_min_lodging_per_node()
+            return pd.merge(node_names_and_regions, minimum_lodging_cp_costs, on=config.COLUMN_NODE_ID, how="left").fillna({config.COLUMN_TOTAL_LODGING_CP_COST: config.DEFAULT_NO_LODGING_CP_COST, config.COLUMN_LODGING_NAME: config.DEFAULT_NO_LODGING_NAME})
+
+    def build_node_graph(self):
+        """
+        Compiles the node, connection and lodging sheets into a NodeGraph. The graph is built once and reused
+        by every subsequent call.
+        
+        Returns:
+            NodeGraph: The compiled node graph.
+        """
+        if self.node_graph is None:
+            nodes_with_min_lodging_info = self.merge_nodes_with_lodging()
+            node_connection_data = self.excel_sheets_data[config.SHEET_NODE_CONNECTIONS]
+            with profiler.span("graph build"):
+                self.node_graph = NodeGraph(nodes_with_min_lodging_info, node_connection_data)
+        return self.node_graph
+
+    def build_connection_solver(self):
+        """
+        Computes the cheapest connection from every node to a city or town in a single multi-source pass.
+        The solver is built once and reused by every subsequent call.
+        
+        Returns:
+            ConnectionSolver: The solved cheapest-connection costs and predecessor tree.
+        """
+        if self.connection_solver is None:
+            node_graph = self.build_node_graph()
+            with profiler.span("path search"):
+                self.connection_solver = ConnectionSolver(node_graph)
+        return self.connection_solver
+
+    def apply_changes(self, connected_nodes=None, available_lodgings=None):
+        """
+        Applies changes to the "Connected" and "Available" flags without reloading the workbook. The loaded sheets,
+        the node graph's lodging table and the cheapest connections are updated in place, touching only the nodes
+        whose cheapest path the change can reach.
+        
+        Parameters:
+            connected_nodes (dict, optional): Node IDs mapped to their new "Connected" flag.
+            available_lodgings (dict, optional): Tuples of (Node ID, lodging name) mapped to their new "Available" flag.
+            
+        Returns:
+            list: The normalized names of the yields whose results may have changed.
+        """
+        node_graph = self.build_node_graph()
+        connection_solver = self.build_connection_solver()
+        changed_node_indices = set()
+
+        with profiler.span("incremental update"):
+            # Record the workbook's flags of everything changed for the first time, so a player state can restore them.
+            workbook_connected, workbook_available = self.workbook_flags
+            original_connected, original_available = self.current_flags(
+                {node_id: None for node_id in connected_nodes or {} if node_id not in workbook_connected},
+                {lodging: None for lodging in available_lodgings or {} if lodging not in workbook_available},
+            )
+            workbook_connected.update(original_connected)
+            workbook_available.update(original_available)
+
+            node_names_and_regions = self.excel_sheets_data[config.SHEET_NODES_NAME_REGION]
+            for node_id, is_connected in (connected_nodes or {}).items():
+                if int(node_id) not in node_graph.index_of:
+                    print(f"Warning: Node ID {node_id} not found in the Excel sheet. Skipping...")
+                    continue
+                node_index = node_graph.index(node_id)
+                node_names_and_regions.loc[node_names_and_regions[config.COLUMN_NODE_ID] == int(node_id), config.COLUMN_CONNECTED] = bool(is_connected)
+                if node_graph.connected[node_index] != bool(is_connected):
+                    node_graph.connected[node_index] = bool(is_connected)
+                    changed_node_indices.add(node_index)
+
+            workers_lodging_data = self.excel_sheets_data[config.SHEET_WORKERS_LODGING]
+            lodging_engine = self.build_lodging_engine()
+            lodging_node_ids = set()
+            for (node_id, lodging_name), is_available in (available_lodgings or {}).items():
+                lodging_rows = (workers_lodging_data[config.COLUMN_NODE_ID] == int(node_id)) & (workers_lodging_data[config.COLUMN_LODGING_NAME] == lodging_name)
+                if not lodging_rows.any() or int(node_id) not in node_graph.index_of:
+                    print(f"Warning: Lodging '{lodging_name}' of Node ID {node_id} not found in the Excel sheet. Skipping...")
+                    continue
+                workers_lodging_data.loc[lodging_rows, config.COLUMN_AVAILABLE] = bool(is_available)
+                lodging_engine.set_available(node_id, lodging_name, is_available)
+                lodging_node_ids.add(int(node_id))
+
+            # Look up the new cheapest available lodging of the affected nodes only.
+            for node_id in lodging_node_ids:
+                node_index = node_graph.index(node_id)
+                lodging_name, lodging_cp_cost = lodging_engine.minimum_lodging(node_id)
+                if (node_graph.lodging_names[node_index], node_graph.lodging_cp_cost[node_index]) != (lodging_name, lodging_cp_cost):
+                    node_graph.lodging_names[node_index] = lodging_name
+                    node_graph.lodging_cp_cost[node_index] = lodging_cp_cost
+                    changed_node_indices.add(node_index)
 
-    def process_nodes(self, target_yields):
+            if changed_node_indices or lodging_node_ids:
+                self.usage_solvers.clear()  # Rebuilt on their next use
+            if not changed_node_indices:
+                return []
+            if self.region_router is not None:
+                self.region_router.update(changed_node_indices)
+            affected_node_indices = connection_solver.update(changed_node_indices)
+            profiler.count("nodes updated", len(affected_node_indices))
+            return self.build_yield_index().yields_of(node_graph.node_ids[affected_node_indices])
+
+    def reload_workbook(self, excel_sheets_data, changed_sheet_names, workbook_hash=None):
+        """
+        Switches to a changed version of the workbook, rebuilding only the structures compiled from the sheets that
+        changed: the yield index for "Node Yields", the lodging engine and the graph's lodging costs for the lodging
+        sheets, and the node graph with everything built on it for the node and connection sheets. Sheets that did
+        not change are taken over from the current version instead of being parsed again. Changes applied in memory
+        are kept for the sheets taken over and lost for the others, so apply the player state again afterwards.
+        
+        Parameters:
+            excel_sheets_data (LazyExcelSheets): The sheets of the changed workbook.
+            changed_sheet_names (iterable): The names of the sheets that changed, e.g. from workbook_watcher.changed_sheets.
+            workbook_hash (str, optional): The content hash of the changed workbook. Defaults to none.
+            
+        Returns:
+            set: The names of the required sheets that changed.
+        """
+        changed_sheet_names = set(changed_sheet_names) & set(self.REQUIRED_COLUMNS)
+        if isinstance(excel_sheets_data, LazyExcelSheets) and isinstance(self.excel_sheets_data, LazyExcelSheets):
+            excel_sheets_data.reuse_sheets(self.excel_sheets_data, set(self.REQUIRED_COLUMNS) - changed_sheet_names)
+        self.excel_sheets_data = excel_sheets_data
+        self.workbook_hash = workbook_hash
+
+        with profiler.span("workbook reload"):
+            if changed_sheet_names & {config.SHEET_WORKERS_LODGING, config.SHEET_LODGING_USAGES}:
+                self.lodging_engine = None
+                self.usage_solvers.clear()
+                self.workbook_flags[1].clear()
+                if self.node_graph is not None and not changed_sheet_names & {config.SHEET_NODES_NAME_REGION, config.SHEET_NODE_CONNECTIONS}:
+                    self.reload_lodging_costs()
+            if changed_sheet_names & {config.SHEET_NODES_NAME_REGION, config.SHEET_NODE_CONNECTIONS}:
+                self.node_graph = None
+                self.connection_solver = None
+                self.region_router = None
+                self.usage_solvers.clear()
+                self.workbook_flags[0].clear()
+            if config.SHEET_NODE_YIELDS in changed_sheet_names:
+                self.yield_index = None
+        return changed_sheet_names
+
+    def reload_lodging_costs(self):
+        """
+        Looks up the cheapest available lodging of every node again after the lodging engine was rebuilt, and updates
+        the cheapest connections of the nodes whose lodging changed in place.
+        """
+        node_graph = self.node_graph
+        lodging_names, lodging_cp_cost = self.build_lodging_engine().minimum_lodging_arrays(node_graph.node_ids)
+        lodging_cp_cost = np.where(np.isfinite(lodging_cp_cost), lodging_cp_cost, config.DEFAULT_NO_LODGING_CP_COST)
+        changed_node_indices = {
+            node_index for node_index in np.flatnonzero(lodging_cp_cost != node_graph.lodging_cp_cost).tolist()
+        } | {
+            node_index for node_index, lodging_name in enumerate(lodging_names) if lodging_name != node_graph.lodging_names[node_index]
+        }
+        for node_index in changed_node_indices:
+            node_graph.lodging_names[node_index] = lodging_names[node_index]
+            node_graph.lodging_cp_cost[node_index] = lodging_cp_cost[node_index]
+        profiler.count("lodgings reloaded", len(changed_node_indices))
+        if changed_node_indices and self.connection_solver is not None:
+            if self.region_router is not None:
+                self.region_router.update(changed_node_indices)
+            self.connection_solver.update(changed_node_indices)
+
+    def current_flags(self, connected_nodes, available_lodgings):
+        """
+        Reads the current flags of the given nodes and lodgings, e.g. so overrides can be restored afterwards.
+
+        Parameters:
+            connected_nodes (dict): Node IDs, mapped to anything.
+            available_lodgings (dict): Tuples of (Node ID, lodging name), mapped to anything.
+
+        Returns:
+            tuple: The current flags, in the same shape as the arguments. Unknown nodes and lodgings are left out.
+        """
+        node_graph = self.build_node_graph()
+        lodging_engine = self.build_lodging_engine()
+        original_connected = {
+            node_id: bool(node_graph.connected[node_graph.index(node_id)])
+            for node_id in connected_nodes if node_id in node_graph.index_of
+        }
+        original_available = {}
+        for node_id, lodging_name in available_lodgings:
+            for position in lodging_engine.positions_by_node_id.get(node_id, []):
+                if lodging_engine.lodging_names[position] == lodging_name:
+                    original_available[(node_id, lodging_name)] = bool(lodging_engine.available[position])
+        return original_connected, original_available
+
+    def apply_player_state(self, player_state):
+        """
+        Applies a player state on top of the workbook's flags, replacing the state applied before: nodes and lodgings
+        the previous state listed but this one does not get their workbook flags back, while changes made through
+        apply_changes alone are kept. Only the differences go through apply_changes, so the workbook is never
+        re-parsed.
+        
+        Parameters:
+            player_state (PlayerState): The player state.
+            
+        Returns:
+            list: The normalized names of the yields whose results may have changed.
+        """
+        previous_connected, previous_available = self.applied_player_state
+        workbook_connected, workbook_available = self.workbook_flags
+        connected_nodes = {node_id: workbook_connected[node_id] for node_id in previous_connected if node_id in workbook_connected}
+        connected_nodes.update(player_state.connected_nodes)
+        available_lodgings = {lodging: workbook_available[lodging] for lodging in previous_available if lodging in workbook_available}
+        available_lodgings.update(player_state.available_lodgings)
+        self.applied_player_state = (dict(player_state.connected_nodes), dict(player_state.available_lodgings))
+        if not (connected_nodes or available_lodgings):
+            return []
+        current_connected, current_available = self.current_flags(connected_nodes, available_lodgings)
+        return self.apply_changes(
+            {node_id: is_connected for node_id, is_connected in connected_nodes.items() if current_connected.get(node_id) != is_connected},
+            {lodging: is_available for lodging, is_available in available_lodgings.items() if current_available.get(lodging) != is_available},
+        )
+
+    def build_usage_solver(self, usage_name):
+        """
+        Computes the cheapest connection from every node to a city or town, ending at the cheapest house of that city
+        or town offering a usage instead of its cheapest worker lodging. Solvers are built once per usage and reused
+        until the next change is applied.
+        
+        Parameters:
+            usage_name (str): A normalized usage name.
+            
+        Returns:
+            ConnectionSolver: The solved cheapest connections to a house with the usage.
+        """
+        if usage_name not in self.usage_solvers:
+            node_graph = self.build_node_graph()
+            lodging_names, lodging_cp_cost = self.build_lodging_engine().minimum_lodging_arrays(node_graph.node_ids, usage_name)
+            with profiler.span("path search"):
+                self.usage_solvers[usage_name] = ConnectionSolver(node_graph, lodging_names, lodging_cp_cost)
+        return self.usage_solvers[usage_name]
+
+    def build_region_router(self):
+        """
+        Builds the hierarchical index that partitions the node graph by the "Node Region" column. The index is built
+        once and kept up to date by apply_changes, which only rebuilds the regions of the changed nodes.
+        
+        Returns:
+            RegionRouter: The region router.
+        """
+        if self.region_router is None:
+            node_graph = self.build_node_graph()
+            node_names_and_regions = self.excel_sheets_data[config.SHEET_NODES_NAME_REGION]
+            region_by_node_id = dict(zip(node_names_and_regions[config.COLUMN_NODE_ID].tolist(), node_names_and_regions[config.COLUMN_NODE_REGION].fillna("").astype(str).tolist()))
+            self.region_router = RegionRouter(node_graph, [region_by_node_id.get(node_id, "") for node_id in node_graph.node_ids.tolist()])
+        return self.region_router
+
+    def build_yield_index(self):
+        """
+        Builds the inverted index from normalized yield names to Node IDs. The index is built once and reused by
+        every subsequent call.
+        
+        Returns:
+            YieldIndex: The yield index.
+        """
+        if self.yield_index is None:
+            node_yields_data = self.excel_sheets_data[config.SHEET_NODE_YIELDS]
+            with profiler.span("yield index build"):
+                self.yield_index = YieldIndex(node_yields_data)
+        return self.yield_index
+
+    def resolve_target_yields(self, target_yields):
+        """
+        Resolves comma-separated yield names through the yield index and maps each yield to the dense graph indices
+        of the nodes producing it. Unknown yields are reported and skipped, misspelled ones are reported along with
+        the yield they were resolved to, and names resolving to a yield listed before are merged into it.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            
+        Returns:
+            list: A list of tuples, each containing a resolved yield name and an array of dense node indices.
+        """
+        node_graph = self.build_node_graph()
+        yield_index = self.build_yield_index()
+
+        resolved_target_yields, resolved_yield_names = [], set()
+        with profiler.span("yield filtering"):
+            for target_yield, (resolved_yield, target_node_ids) in yield_index.lookup_many(map(lambda x: x.strip().lower(), target_yields.split(","))).items():
+                if resolved_yield is None:
+                    print(f"Warning: Yield '{target_yield.capitalize()}' not found in the Excel sheet. Skipping...")
+                    continue
+                if resolved_yield in resolved_yield_names:
+                    print(f"Warning: Yield '{target_yield.capitalize()}' resolves to '{resolved_yield.capitalize()}', which is already listed. Merging...")
+                    continue
+                if resolved_yield != yield_index.normalize_yield_name(target_yield):
+                    print(f"Warning: Yield '{target_yield.capitalize()}' not found in the Excel sheet. Using '{resolved_yield.capitalize()}' instead.")
+                resolved_yield_names.add(resolved_yield)
+                target_node_indices = node_graph.indices_of(target_node_ids)
+                resolved_target_yields.append((resolved_yield, target_node_indices[target_node_indices >= 0]))
+        return resolved_target_yields
+
+    def process_nodes(self, target_yields, worker_count=None):
         """
         Processes nodes based on target yields, merging data, and calculating paths and CP investments.
         
         Parameters:
             target_yields (str): A string of target yields separated by commas.
+            worker_count (int, optional): Worker processes to spread the yields over; 0 uses every CPU core. Defaults to
+                config.PARALLEL_WORKER_COUNT, which is only used for at least config.PARALLEL_MIN_YIELDS yields.
             
         Returns:
             list: A list of tuples, each containing a target yield and its corresponding DataFrame of node results.
         """
-        nodes_with_min_lodging_info = self.merge_nodes_with_lodging()
-        city_and_town_nodes = nodes_with_min_lodging_info[nodes_with_min_lodging_info[config.COLUMN_NODE_TYPE].isin(config.NODE_TYPES_CITY_TOWN)]
-        node_connection_data = self.excel_sheets_data[config.SHEET_NODE_CONNECTIONS]
+        return list(self.stream_nodes(target_yields, worker_count))
+
+    def stream_nodes(self, target_yields, worker_count=None):
+        """
+        Processes nodes like process_nodes, but as a generator that hands out each yield's results as soon as they
+        are ready, so they can be written out while the next yield is processed. Yields spread over worker processes
+        are processed in one batch before the first is handed out.
         
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            worker_count (int, optional): Worker processes to spread the yields over, as for process_nodes.
+            
+        Yields:
+            tuple: A target yield and its corresponding DataFrame of node results.
+        """
+        self.build_connection_solver()
+        resolved_target_yields = self.resolve_target_yields(target_yields)
+        minimum_parallel_yields = config.PARALLEL_MIN_YIELDS if worker_count is None else 1
+        worker_count = config.PARALLEL_WORKER_COUNT if worker_count is None else worker_count
+        use_workers = worker_count != 1 and len(resolved_target_yields) >= minimum_parallel_yields
+
+        def process_yields(uncached_target_yields):
+            if use_workers and len(uncached_target_yields) >= minimum_parallel_yields:
+                from parallel_processor import process_yields_in_parallel
+                return process_yields_in_parallel(self, uncached_target_yields, worker_count)
+            return [self.process_yield(resolved_yield, target_node_indices) for resolved_yield, target_node_indices in uncached_target_yields]
+
+        yield from self.stream_yield_results(("nodes",), resolved_target_yields, process_yields, in_one_batch=use_workers)
+
+    def process_usage(self, target_yields, usage_name):
+        """
+        Processes nodes based on target yields like process_nodes, but connects every yield to the cheapest house
+        offering a usage, such as "Refinery" or "Storage", instead of the cheapest worker lodging.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            usage_name (str): The lodging usage, matched case-insensitively; a unique prefix is enough.
+            
+        Returns:
+            list: A list of tuples, each containing a target yield with the usage and its corresponding DataFrame of node results.
+        """
+        lodging_engine = self.build_lodging_engine()
+        resolved_usage = lodging_engine.resolve_usage(usage_name)
+        if resolved_usage is None:
+            print(f"Warning: Lodging usage '{usage_name}' not found in the Excel sheet. Known usages: {', '.join(sorted(lodging_engine.usage_names.values()))}")
+            return []
+        resolved_target_yields = self.resolve_target_yields(target_yields)
+
+        def process_yields(uncached_target_yields):
+            connection_solver = self.build_usage_solver(resolved_usage)
+            return [self.process_yield(resolved_yield, target_node_indices, connection_solver) for resolved_yield, target_node_indices in uncached_target_yields]
+
         all_yield_results = []
-        for target_yield in map(lambda x: x.strip().lower(), target_yields.split(",")):
-            nodes_matching_target_yields = self.excel_sheets_data[config.SHEET_NODE_YIELDS]
-            nodes_matching_target_yields = nodes_matching_target_yields[
-                nodes_matching_target_yields[[config.COLUMN_YIELD_1, config.COLUMN_YIELD_2]]
-                .map(lambda x: str(x).lower() if x is not None else '')
-                .isin([target_yield]).any(axis=1)
-            ]
-            if nodes_matching_target_yields.empty:
-                print(f"Warning: Yield '{target_yield.capitalize()}' not found in the Excel sheet. Skipping...")
+        for (resolved_yield, _), yield_result in zip(resolved_target_yields, self.cached_yield_results(("usage", resolved_usage), resolved_target_yields, process_yields)):
+            if yield_result is None:
+                print(f"Warning: No node yielding '{resolved_yield.capitalize()}' can be connected to a '{lodging_engine.usage_names[resolved_usage]}' lodging. Skipping...")
                 continue
+            yield_name, node_processing_results = yield_result
+            all_yield_results.append((f"{yield_name} ({lodging_engine.usage_names[resolved_usage]})", node_processing_results))
+        return all_yield_results
+
+    def process_regions(self, target_yields, region_names=None):
+        """
+        Processes nodes based on target yields like process_nodes, but answers every query through the region router,
+        optionally keeping paths inside some regions.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            region_names (list, optional): Names or unique prefixes of the regions paths may use, matched case-insensitively. Defaults to every region.
+            
+        Returns:
+            list: A list of tuples, each containing a target yield and its corresponding DataFrame of node results.
+        """
+        region_router = self.build_region_router()
+        allowed_regions = None
+        if region_names:
+            allowed_regions, unknown_region_names = region_router.resolve_regions(region_names)
+            for unknown_region_name in unknown_region_names:
+                print(f"Warning: Region '{unknown_region_name}' not found in the Excel sheet, or ambiguous. Skipping...")
+            if not allowed_regions:
+                print(f"Warning: None of the regions were found in the Excel sheet. Known regions: {', '.join(sorted(region_name for region_name in region_router.region_names if region_name))}")
+                return []
+            allowed_regions = frozenset(allowed_regions)
+        region_title = None if allowed_regions is None else ", ".join(region_router.region_names[region] for region in sorted(allowed_regions))
+        resolved_target_yields = self.resolve_target_yields(target_yields)
 
-            detailed_target_nodes_info = pd.merge(nodes_matching_target_yields, nodes_with_min_lodging_info, on=config.COLUMN_NODE_ID)
-            node_processing_results = [self.process_node(node, city_and_town_nodes, node_connection_data, nodes_with_min_lodging_info) for _, node in detailed_target_nodes_info.iterrows()]
-            node_results_dataframe = pd.DataFrame(node_processing_results)
-            minimum_cp_cost = node_results_dataframe["Total CP"].min()
-            results_with_minimum_cp = node_results_dataframe[node_results_dataframe["Total CP"] == minimum_cp_cost]
-            all_yield_results.append((target_yield.capitalize(), results_with_minimum_cp))
+        def process_yields(uncached_target_yields):
+            yield_results = []
+            for resolved_yield, target_node_indices in uncached_target_yields:
+                with profiler.span("region routing"):
+                    routed_connections = region_router.connections(target_node_indices, allowed_regions)
+                yield_results.append(self.process_yield(resolved_yield, target_node_indices, routed_connections))
+            return yield_results
 
+        all_yield_results = []
+        for (resolved_yield, _), yield_result in zip(resolved_target_yields, self.cached_yield_results(("regions", region_title), resolved_target_yields, process_yields)):
+            if yield_result is None:
+                print(f"Warning: No node yielding '{resolved_yield.capitalize()}' can be connected to a city or town{'' if region_title is None else ' within ' + region_title}. Skipping...")
+                continue
+            yield_name, node_processing_results = yield_result
+            all_yield_results.append((yield_name if region_title is None else f"{yield_name} ({region_title})", node_processing_results))
         return all_yield_results
 
+    def cached_yield_results(self, mode, resolved_target_yields, process_yields):
+        """
+        Answers per-yield results from the result cache where possible and processes only the remaining yields.
+        Results are keyed by the workbook hash, the state hash, the yield, config.RESULT_CACHE_VERSION and the mode.
+        
+        Parameters:
+            mode (tuple): JSON-serializable values identifying the kind of results and their options, e.g. ("ranked", 5).
+            resolved_target_yields (list): Tuples of a resolved yield name and the dense indices of its nodes.
+            process_yields (callable): Processes a list of such tuples and returns one result per yield.
+            
+        Returns:
+            list: One result per yield, in the order of resolved_target_yields.
+        """
+        if self.result_cache is None:
+            return process_yields(resolved_target_yields)
+
+        state_hash = self.state_hash()
+        cache_keys = [self.result_cache.key(self.workbook_hash, state_hash, resolved_yield, config.RESULT_CACHE_VERSION, *mode) for resolved_yield, _ in resolved_target_yields]
+        yield_results = [self.result_cache.get(cache_key, self.result_cache.MISSING) for cache_key in cache_keys]
+        uncached_positions = [position for position, yield_result in enumerate(yield_results) if yield_result is self.result_cache.MISSING]
+        if uncached_positions:
+            processed_results = process_yields([resolved_target_yields[position] for position in uncached_positions])
+            for position, yield_result in zip(uncached_positions, processed_results):
+                yield_results[position] = yield_result
+                self.result_cache.put(cache_keys[position], yield_result)
+        return yield_results
 
-    def process_node(self, node, city_and_town_nodes, node_connection_data, nodes_with_min_lodging_info):
+    def stream_yield_results(self, mode, resolved_target_yields, process_yields, in_one_batch=False):
         """
-        Calculates the CP and path for a single node and returns its details.
+        Hands out the results of the yields one at a time through cached_yield_results, skipping yields that no node
+        can connect.
         
         Parameters:
-            node (Series): A Series representing a single node's data.
-            city_and_town_nodes (DataFrame): Data for city and town nodes.
-            node_connection_data (DataFrame): Data for node connections.
-            nodes_with_min_lodging_info (DataFrame): Node data merged with minimum lodging information.
+            mode (tuple): The mode, as for cached_yield_results.
+            resolved_target_yields (list): Tuples of a resolved yield name and the dense indices of its nodes.
+            process_yields (callable): Processes a list of such tuples and returns one result per yield.
+            in_one_batch (bool, optional): Pass all yields to process_yields at once instead of one by one. Defaults to False.
+            
+        Yields:
+            tuple: The results of each yield that can be connected, in the order of resolved_target_yields.
+        """
+        batches = [resolved_target_yields] if in_one_batch else [[resolved_target_yield] for resolved_target_yield in resolved_target_yields]
+        for batch in batches:
+            for (resolved_yield, _), yield_result in zip(batch, self.cached_yield_results(mode, batch, process_yields)):
+                if yield_result is None:
+                    print(f"Warning: No node yielding '{resolved_yield.capitalize()}' can be connected to a city or town. Skipping...")
+                    continue
+                yield yield_result
+
+    def process_yield(self, resolved_yield, target_node_indices, connection_solver=None):
+        """
+        Builds the results of one yield: every candidate node whose Total CP equals the minimum.
+        
+        Parameters:
+            resolved_yield (str): The resolved yield name.
+            target_node_indices (ndarray): Dense indices of the nodes producing the yield.
+            connection_solver (ConnectionSolver, optional): The solved connections to use. Defaults to the worker lodging connections.
             
         Returns:
-            dict: Details of the processed node including ID, name, visited nodes, lodging name, lodging CP, and total CP.
+            tuple: The capitalized yield name and a DataFrame of node results, or None when no node can be connected.
         """
-        visited_node_ids, total_path_cp_cost = self.find_path_and_cp(node[config.COLUMN_NODE_ID], city_and_town_nodes, node_connection_data, nodes_with_min_lodging_info)
-        selected_lodging_name, selected_lodging_cp_cost = self.get_lodging_details(visited_node_ids, nodes_with_min_lodging_info)
-        total_cp_for_node = total_path_cp_cost + selected_lodging_cp_cost
-        return {
-            "Node ID": node[config.COLUMN_NODE_ID],
-            "Node Name": node[config.COLUMN_NODE_NAME],
-            "Visited Nodes Info": self.format_visited_nodes(visited_node_ids, nodes_with_min_lodging_info),
-            "Lodging Name": selected_lodging_name,
-            "Lodging CP": selected_lodging_cp_cost,
-            "Total CP": total_cp_for_node,
-        }
+        node_graph = self.build_node_graph()
+        connection_solver = self.build_connection_solver() if connection_solver is None else connection_solver
+        target_total_cp = connection_solver.total_cost[target_node_indices]
+        if not np.isfinite(target_total_cp).any():
+            return None
+
+        minimum_cp_cost = target_total_cp.min()
+        profiler.count("candidate nodes evaluated", len(target_node_indices))
+        with profiler.span("formatting"):
+            cheapest_node_indices = target_node_indices[target_total_cp == minimum_cp_cost].tolist()
+            node_processing_results = pd.DataFrame([self.process_node(node_index, node_graph, connection_solver) for node_index in cheapest_node_indices])
+        return resolved_yield.capitalize(), node_processing_results
+
+    def process_ranked(self, target_yields, top_k=None):
+        """
+        Processes nodes based on target yields and returns the K cheapest distinct connection plans per yield,
+        across all candidate nodes, instead of only the cheapest ones.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            top_k (int, optional): The number of plans per yield. Defaults to config.TOP_K_PATHS.
+            
+        Returns:
+            list: A list of tuples, each containing a target yield and a DataFrame of its ranked plans, cheapest first.
+        """
+        return list(self.stream_ranked(target_yields, top_k))
+
+    def stream_ranked(self, target_yields, top_k=None):
+        """
+        Ranks the connection plans like process_ranked, but as a generator that hands out each yield's plans as soon
+        as they are ready.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            top_k (int, optional): The number of plans per yield. Defaults to config.TOP_K_PATHS.
+            
+        Yields:
+            tuple: A target yield and a DataFrame of its ranked plans, cheapest first.
+        """
+        top_k = config.TOP_K_PATHS if top_k is None else top_k
+        path_rankers = []  # Built on the first yield that is not cached
+
+        def rank_yields(uncached_target_yields):
+            if not path_rankers:
+                path_rankers.append(PathRanker(self.build_node_graph(), self.build_connection_solver()))
+            return [self.rank_yield(resolved_yield, target_node_indices, path_rankers[0], top_k) for resolved_yield, target_node_indices in uncached_target_yields]
 
-    def find_path_and_cp(self, node_id, city_and_town_nodes, node_connection_data, nodes_with_min_lodging_info, visited_node_ids=None, total_cp_for_node=config.DEFAULT_NO_LODGING_CP_COST):
+        yield from self.stream_yield_results(("ranked", top_k), self.resolve_target_yields(target_yields), rank_yields)
+
+    def rank_yield(self, resolved_yield, target_node_indices, path_ranker, top_k):
         """
-        Recursively finds the cheapest path to connect a node to a city or town, calculating the total CP cost.
+        Builds the ranked results of one yield: its K cheapest distinct connection plans.
         
         Parameters:
-            node_id (int): The ID of the current node being processed.
-            city_and_town_nodes (DataFrame): DataFrame containing data for city and town nodes.
-            node_connection_data (DataFrame): DataFrame detailing connections between nodes.
-            nodes_with_min_lodging_info (DataFrame): Node data merged with lodging information.
-            visited_node_ids (set, optional): A set of node IDs that have already been visited. Defaults to None.
-            total_cp_for_node (int, optional): The accumulated CP cost for the current path. Defaults to config.DEFAULT_NO_LODGING_CP_COST.
+            resolved_yield (str): The resolved yield name.
+            target_node_indices (ndarray): Dense indices of the nodes producing the yield.
+            path_ranker (PathRanker): The ranker over the solved graph.
+            top_k (int): The number of plans.
             
         Returns:
-            tuple: A tuple containing a set of visited node IDs and the total CP cost for the path.
+            tuple: The capitalized yield name and a DataFrame of its ranked plans, or None when no node can be connected.
         """
-        if visited_node_ids is None:
-            visited_node_ids = set()
-        visited_node_ids.add(node_id)
+        node_graph = self.build_node_graph()
+        with profiler.span("path ranking"):
+            ranked_paths = path_ranker.rank(target_node_indices, top_k)
+        if not ranked_paths:
+            return None
+        profiler.count("candidate nodes evaluated", len(target_node_indices))
+        with profiler.span("formatting"):
+            ranked_results = pd.DataFrame([
+                {
+                    "Rank": rank,
+                    "Node ID": node_graph.node_ids[path[0]],
+                    "Node Name": node_graph.node_names[path[0]],
+                    "Visited Nodes Info": VisitedPath.from_path(path, node_graph),
+                    "Lodging Name": node_graph.lodging_names[path[-1]],
+                    "Lodging CP": node_graph.lodging_cp_cost[path[-1]],
+                    "Total CP": total_cp_for_path,
+                }
+                for rank, (total_cp_for_path, path) in enumerate(ranked_paths, 1)
+            ])
+        return resolved_yield.capitalize(), ranked_results
 
-        current_node_info = nodes_with_min_lodging_info[nodes_with_min_lodging_info[config.COLUMN_NODE_ID] == node_id].iloc[0]
-        current_node_cp_cost = config.DEFAULT_NO_LODGING_CP_COST if current_node_info[config.COLUMN_CONNECTED] else current_node_info[config.COLUMN_CP_COST]
-        total_cp_for_node += current_node_cp_cost
+    def process_combined_plan(self, target_yields, time_budget=None):
+        """
+        Finds one combined investment plan covering every target yield, counting path nodes shared between yields
+        only once and a lodging for every yield's worker.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            time_budget (float, optional): Seconds to spend improving the plan. Defaults to config.COMBINED_PLAN_TIME_BUDGET.
+            
+        Returns:
+            list: A list with a single tuple of the plan's title and a DataFrame with one row per connected yield.
+        """
+        node_graph = self.build_node_graph()
+        target_groups = dict(self.resolve_target_yields(target_yields))
+        with profiler.span("combined plan search"):
+            combined_plan = CombinedPlanner(node_graph).plan(target_groups, time_budget)
+        for unreachable_yield in combined_plan.unreachable_yields:
+            print(f"Warning: No node yielding '{unreachable_yield.capitalize()}' can be connected to a city or town. Skipping...")
+        if not combined_plan.complete:
+            print("Warning: The combined plan time budget ran out. Showing the best plan found so far.")
 
-        if node_id in city_and_town_nodes[config.COLUMN_NODE_ID].values:
-            return visited_node_ids, total_cp_for_node
+        plan_rows = []
+        for assignment in combined_plan.assignments:
+            node_index, root_index = assignment["node_index"], assignment["root"]
+            plan_rows.append({
+                "Yield": assignment["yield"].capitalize(),
+                "Node ID": node_graph.node_ids[node_index],
+                "Node Name": node_graph.node_names[node_index],
+                "Visited Nodes Info": VisitedPath.from_path(assignment["path"], node_graph),
+                "Lodging Name": node_graph.lodging_names[root_index],
+                "Lodging CP": node_graph.lodging_cp_cost[root_index],
+                "Added CP": assignment["added_cp"],
+            })
+        plan_results = pd.DataFrame(plan_rows)
+        return [(f"Combined Plan ({combined_plan.total_cp} CP)", plan_results)]
 
-        for connected_node in node_connection_data[node_connection_data[config.COLUMN_NODE_ID] == node_id][config.CONNECTED_NODE_ID]:
-            if connected_node not in visited_node_ids:
-                result_visited, result_cp = self.find_path_and_cp(
-                    connected_node, city_and_town_nodes, node_connection_data, nodes_with_min_lodging_info, visited_node_ids.copy(), total_cp_for_node
-                )
-                if result_visited:
-                    return result_visited, result_cp
-        return visited_node_ids, total_cp_for_node
+    @staticmethod
+    def parse_weighted_yields(target_yields):
+        """
+        Splits comma-separated yield names with optional weights, written as "name:weight".
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas, e.g. "wheat:3, potato".
+            
+        Returns:
+            list: Tuples of the yield name and its weight, config.DEFAULT_YIELD_WEIGHT when none is given.
+        """
+        weighted_yields = []
+        for target_yield in target_yields.split(","):
+            yield_name, _, weight = target_yield.rpartition(":") if ":" in target_yield else (target_yield, "", "")
+            if not yield_name.strip():
+                continue
+            try:
+                weighted_yields.append((yield_name.strip(), float(weight) if weight.strip() else config.DEFAULT_YIELD_WEIGHT))
+            except ValueError:
+                print(f"Warning: Weight '{weight.strip()}' of yield '{yield_name.strip().capitalize()}' is not a number. Using {config.DEFAULT_YIELD_WEIGHT}.")
+                weighted_yields.append((yield_name.strip(), config.DEFAULT_YIELD_WEIGHT))
+        return weighted_yields
 
-    def get_lodging_details(self, visited_node_ids, nodes_with_min_lodging_info):
+    def process_budget_plan(self, target_yields, budget, time_budget=None):
         """
-        Finds lodging details for the last city or town in the visited nodes path, which includes the lodging name and CP cost.
+        Finds the investment, nodes and lodgings, that connects the most weighted yield within a CP budget, counting
+        shared path nodes once and a lodging for every yield's worker.
         
         Parameters:
-            visited_node_ids (set): A set of visited node IDs during path finding.
-            nodes_with_min_lodging_info (DataFrame): Node data merged with lodging information.
+            target_yields (str): A string of target yields separated by commas, each optionally weighted as "name:weight".
+            budget (float): The CP budget.
+            time_budget (float, optional): Seconds to spend improving the plan. Defaults to config.BUDGET_PLAN_TIME_BUDGET.
             
         Returns:
-            tuple: A tuple containing the lodging name and its CP cost for the last visited city or town node.
+            list: A list with a single tuple of the plan's title and a DataFrame with one row per connected yield.
         """
-        for node_id in reversed(list(visited_node_ids)):
-            if nodes_with_min_lodging_info.loc[nodes_with_min_lodging_info[config.COLUMN_NODE_ID] == node_id, config.COLUMN_NODE_TYPE].values[0] in config.NODE_TYPES_CITY_TOWN:
-                lodging_info = nodes_with_min_lodging_info.loc[nodes_with_min_lodging_info[config.COLUMN_NODE_ID] == node_id, [config.COLUMN_LODGING_NAME, config.COLUMN_TOTAL_LODGING_CP_COST]].iloc[0]
-                return lodging_info[config.COLUMN_LODGING_NAME], lodging_info[config.COLUMN_TOTAL_LODGING_CP_COST]
-        return config.DEFAULT_NO_LODGING_NAME, config.DEFAULT_NO_LODGING_CP_COST
+        node_graph = self.build_node_graph()
+        target_groups, yield_weights = {}, {}
+        for yield_name, weight in self.parse_weighted_yields(target_yields):
+            for resolved_yield, target_node_indices in self.resolve_target_yields(yield_name):
+                target_groups[resolved_yield] = target_node_indices
+                yield_weights[resolved_yield] = max(weight, yield_weights.get(resolved_yield, weight))
+        with profiler.span("budget plan search"):
+            budget_plan = BudgetPlanner(node_graph).plan(target_groups, yield_weights, budget, time_budget)
+        for unreachable_yield in budget_plan.unreachable_yields:
+            print(f"Warning: No node yielding '{unreachable_yield.capitalize()}' can be connected to a city or town. Skipping...")
+        if budget_plan.uncovered_yields:
+            print(f"Not covered within {budget} CP: {', '.join(yield_name.capitalize() for yield_name in budget_plan.uncovered_yields)}")
+        if not budget_plan.complete:
+            print("Note: The budget plan time budget ran out before every alternative was tried. Showing the best plan found.")
+
+        plan_rows = []
+        for assignment in budget_plan.assignments:
+            node_index, root_index = assignment["node_index"], assignment["root"]
+            plan_rows.append({
+                "Yield": assignment["yield"].capitalize(),
+                "Weight": yield_weights[assignment["yield"]],
+                "Node ID": node_graph.node_ids[node_index],
+                "Node Name": node_graph.node_names[node_index],
+                "Visited Nodes Info": VisitedPath.from_path(assignment["path"], node_graph),
+                "Lodging Name": node_graph.lodging_names[root_index],
+                "Lodging CP": node_graph.lodging_cp_cost[root_index],
+                "Added CP": assignment["added_cp"],
+            })
+        plan_results = pd.DataFrame(plan_rows)
+        plan_title = f"Budget Plan ({budget_plan.total_cp} of {budget} CP, weight {budget_plan.covered_weight} of at most {budget_plan.weight_bound})"
+        return [(plan_title, plan_results)]
+
+    def process_player_profiles(self, target_yields, overlays):
+        """
+        Computes the cheapest Total CP of every target yield for several players at once, each with their own
+        "Connected" and "Available" flags, in vectorized sweeps over the shared node graph instead of one run per player.
+        
+        Parameters:
+            target_yields (str): A string of target yields separated by commas.
+            overlays (list): Tuples of a player name and the decoded overlay dict (see PlayerProfiles).
+            
+        Returns:
+            list: A list with a single tuple of the title and a DataFrame with one row per player and one column per
+            yield, holding the yield's cheapest Total CP, or NaN when no node yielding it can be connected.
+        """
+        from player_profiles import PlayerProfiles, PlayerProfileSolver
+        node_graph = self.build_node_graph()
+        resolved_target_yields = self.resolve_target_yields(target_yields)
+        player_profiles = PlayerProfiles.from_overlays(overlays, node_graph, self.build_lodging_engine())
+        with profiler.span("player profile sweep"):
+            total_costs = PlayerProfileSolver(node_graph, self.build_lodging_engine()).solve(player_profiles)
+
+        profile_costs = pd.DataFrame({"Player": player_profiles.profile_names})
+        for resolved_yield, target_node_indices in resolved_target_yields:
+            yield_costs = total_costs[:, target_node_indices].min(axis=1, initial=np.inf)
+            profile_costs[resolved_yield.capitalize()] = np.where(np.isfinite(yield_costs), yield_costs, np.nan)
+        return [(f"Player Profiles ({len(player_profiles)} players)", profile_costs)]
+
+    def process_node(self, node_index, node_graph, connection_solver):
+        """
+        Looks up the cheapest path and CP for a single node and returns its details.
+        
+        Parameters:
+            node_index (int): The dense graph index of the node to process.
+            node_graph (NodeGraph): The compiled node graph.
+            connection_solver (ConnectionSolver): The solved cheapest connections.
+            
+        Returns:
+            dict: Details of the processed node including ID, name, visited nodes (a VisitedPath), lodging name, lodging CP, and total CP.
+        """
+        visited_path, total_path_cp_cost = self.find_path_and_cp(node_index, connection_solver)
+        selected_lodging_name, selected_lodging_cp_cost = connection_solver.lodging(node_index)
+        total_cp_for_node = total_path_cp_cost + selected_lodging_cp_cost
+        return {
+            "Node ID": node_graph.node_ids[node_index],
+            "Node Name": node_graph.node_names[node_index],
+            "Visited Nodes Info": VisitedPath.from_path(visited_path, node_graph),
+            "Lodging Name": selected_lodging_name,
+            "Lodging CP": selected_lodging_cp_cost,
+            "Total CP": total_cp_for_node,
+        }
 
-    def format_visited_nodes(self, visited_node_ids, nodes_with_min_lodging_info):
+    def find_path_and_cp(self, node_index, connection_solver):
         """
-        Formats the information of visited nodes for display, providing details like node name, ID, and CP cost.
+        Finds the cheapest path to connect a node to a city or town, calculating its CP cost.
         
         Parameters:
-            visited_node_ids (set): A set of visited node IDs during path finding.
-            nodes_with_min_lodging_info (DataFrame): Node data merged with lodging information.
+            node_index (int): The dense graph index of the node.
+            connection_solver (ConnectionSolver): The solved cheapest connections.
             
         Returns:
-            str: A string representation of the visited nodes, detailing their names, IDs, and CP costs.
+            tuple: A tuple containing the list of node indices on the path (ending at the city or town) and the CP cost of the path.
         """
-        formatted_visited_node_info = []
-        for node_id in visited_node_ids:
-            current_node_info = nodes_with_min_lodging_info.loc[nodes_with_min_lodging_info[config.COLUMN_NODE_ID] == node_id].iloc[0]
-            connection_cost_text = "*0.0 CP" if current_node_info[config.COLUMN_CONNECTED] else f"{current_node_info['CP Cost']} CP"
-            formatted_visited_node_info.append(f"{current_node_info['Node Name']} (ID: {node_id} - CP: {connection_cost_text})")
-        return ", ".join(sorted(formatted_visited_node_info, key=lambda x: int(x.split("(ID: ")[1].split("- ")[0])))
+        return connection_solver.path(node_index), connection_solver.path_cost[node_index]
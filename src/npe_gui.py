@@ -2,34 +2,146 @@ import sys
 import os
 import ctypes
 import json
+import threading
 import webbrowser
 import logging
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QLabel, QLineEdit, QTextEdit, QFileDialog, QDesktopWidget
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QLineEdit, QTextEdit, QFileDialog, QDesktopWidget, QProgressBar, QSpinBox, QCheckBox
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
 import config
 from config import resource_path
 from config import setup_logging
-from data_loader import ExcelDataLoader
-from node_processor import NodeProcessor
-from results_visualizer import ResultsVisualizer
+from profiling import profiler, setup_profiling
+from player_state import PlayerState
+from workbook_watcher import FileWatcher
 
-# Set up logging
+# Set up logging and, with --profile, stage timing; cProfile runs on the processing threads only
 setup_logging()
+setup_profiling(profile_calling_thread=False)
 
 logging.info('Starting the NodePathExplorerGUI application.')
 
+class BackgroundProcessorCache:
+    # Creates the WarmProcessorCache, and with it pandas and the processing modules, on a daemon thread once the
+    # window is shown, and pre-parses the workbook in the path field so the first query does not wait for it.
+    # get_processor waits for that load, so callers can use it like a WarmProcessorCache.
+    def __init__(self, use_snapshot=True, rebuild_snapshot=False, use_result_cache=True, player_state_path=None):
+        self.use_snapshot = use_snapshot
+        self.rebuild_snapshot = rebuild_snapshot
+        self.use_result_cache = use_result_cache
+        self.player_state_path = player_state_path
+        self.processor_cache = None
+        self.ready = threading.Event()
+        self.loader_thread = None
+        self.start_lock = threading.Lock()
+
+    def start(self, excel_file_path=None):
+        # Start the background load once; later calls do nothing
+        with self.start_lock:
+            if self.loader_thread is None:
+                self.loader_thread = threading.Thread(target=self.load, args=(excel_file_path,), daemon=True)
+                self.loader_thread.start()
+
+    def load(self, excel_file_path):
+        try:
+            from workbook_cache import WarmProcessorCache
+            from result_cache import ResultCache
+            # Results are shared with the command line through the on-disk result cache
+            self.processor_cache = WarmProcessorCache(use_snapshot=self.use_snapshot, rebuild_snapshot=self.rebuild_snapshot, result_cache=ResultCache() if self.use_result_cache else None, player_state_path=self.player_state_path)
+            self.ready.set()
+            if excel_file_path and os.path.isfile(excel_file_path):
+                self.processor_cache.get_processor(excel_file_path)
+        except Exception:
+            logging.exception('Preloading the workbook failed.')
+        finally:
+            self.ready.set()
+
+    def get_processor(self, excel_file_path):
+        # Wait for the background imports; a workbook still being preloaded is waited for by the cache's lock
+        self.start()
+        self.ready.wait()
+        if self.processor_cache is None:
+            raise RuntimeError('The processing modules could not be loaded; see the log for details.')
+        return self.processor_cache.get_processor(excel_file_path)
+
+class ProcessingCancelled(Exception):
+    # Raised between yields once cancellation was requested, which also discards the half-written HTML report
+    pass
+
+class ProcessingWorker(QObject):
+    # Runs the workbook load, the per-yield processing and the HTML generation off the Qt main thread.
+    # Results are streamed yield by yield into the console and the HTML report, and cancellation is checked between yields.
+    progress = pyqtSignal(int, int, str)
+    yieldProcessed = pyqtSignal(str, object)
+    finished = pyqtSignal()
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, processor_cache, excel_file_path, yield_names, top_k=1):
+        super().__init__()
+        self.processor_cache = processor_cache
+        self.excel_file_path = excel_file_path
+        self.yield_names = yield_names
+        self.top_k = top_k
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        # Request cancellation; the worker stops before starting the next yield
+        self.cancel_event.set()
+
+    def run(self):
+        # cProfile only sees the thread it runs on, so with --profile-cprofile the processing is profiled here
+        with profiler.profile_thread():
+            try:
+                # Imported here, as it pulls in numpy, so the window opens without waiting for it
+                from results_visualizer import ResultsVisualizer
+                self.progress.emit(0, 0, 'Loading workbook...')
+                processor = self.processor_cache.get_processor(self.excel_file_path)
+                # Resolve the names once, so misspelled names of the same yield are merged and processed once
+                resolved_yield_names = [resolved_yield for resolved_yield, _ in processor.resolve_target_yields(self.yield_names)]
+                ResultsVisualizer.save_html_report(ResultsVisualizer.stream_console_output(self.process_yields(processor, resolved_yield_names)))
+                self.finished.emit()
+            except ProcessingCancelled:
+                self.cancelled.emit()
+            except Exception as error:
+                logging.exception('Data processing failed.')
+                self.failed.emit(str(error))
+
+    def process_yields(self, processor, resolved_yield_names):
+        # Hand out each yield's results as soon as they are processed, so they are written while the next one runs
+        for yield_number, resolved_yield in enumerate(resolved_yield_names):
+            if self.cancel_event.is_set():
+                raise ProcessingCancelled()
+            self.progress.emit(yield_number, len(resolved_yield_names), resolved_yield.capitalize())
+            # A Top K above one lists the K cheapest connection plans instead of only the cheapest
+            yield_results = processor.process_ranked(resolved_yield, self.top_k) if self.top_k > 1 else processor.process_nodes(resolved_yield)
+            for yield_result in yield_results:
+                self.yieldProcessed.emit(*yield_result)
+                yield yield_result
+        self.progress.emit(len(resolved_yield_names), len(resolved_yield_names), 'Generating HTML...')
+
 class NodePathExplorerGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.title = 'BDO Node Path Explorer (v1.1.0)'
+        self.processorCache = BackgroundProcessorCache(use_snapshot='--no-cache' not in sys.argv, rebuild_snapshot='--rebuild-cache' in sys.argv, use_result_cache='--no-result-cache' not in sys.argv, player_state_path=config.PLAYER_STATE_FILE)
+        self.workerThread = None
+        self.worker = None
+        self.fileWatcher = None
+        self.watchPending = False
+        self.autoRefresh = False
+        self.openHTMLWhenDone = True
+        self.watchTimer = QTimer(self)
+        self.watchTimer.timeout.connect(self.pollWatchedFiles)
         self.initUI()
         self.loadSettings()
+        # Preload once the event loop runs, i.e. after the window has been shown
+        QTimer.singleShot(0, lambda: self.processorCache.start(self.excelFilePathLineEdit.text()))
 
     def initUI(self):
         # Initialize the main window and its UI elements
         self.setWindowTitle(self.title)
-        self.setFixedSize(640, 480)
+        self.setFixedSize(640, 720)
         self.centerWindow()
         self.setWindowIcon(QIcon(resource_path(r'assets\app_icon.ico')))
         if '--log' in sys.argv:
@@ -62,11 +174,76 @@ class NodePathExplorerGUI(QMainWindow):
         self.yieldNamesTextEdit.setPlaceholderText("Enter yield names, separated by commas")
         self.layout.addWidget(self.yieldNamesTextEdit)
 
-        # Button to process data
+        # Number of cheapest connection plans listed per yield; 1 lists only the cheapest
+        self.topKLayout = QHBoxLayout()
+        self.topKLabel = QLabel("Top K paths per yield:")
+        self.topKLayout.addWidget(self.topKLabel)
+        self.topKSpinBox = QSpinBox(self)
+        self.topKSpinBox.setRange(1, 100)
+        self.topKSpinBox.setValue(1)
+        self.topKLayout.addWidget(self.topKSpinBox)
+        self.topKLayout.addStretch()
+        # Re-run the query whenever the workbook or the player state file changes
+        self.watchCheckBox = QCheckBox('Watch for changes', self)
+        self.watchCheckBox.toggled.connect(self.toggleWatch)
+        self.topKLayout.addWidget(self.watchCheckBox)
+        self.layout.addLayout(self.topKLayout)
+
+        # Record progress in the player state file instead of editing the workbook; the next run applies it
+        self.stateNodesLayout = QHBoxLayout()
+        self.stateNodesLabel = QLabel("Node IDs:")
+        self.stateNodesLayout.addWidget(self.stateNodesLabel)
+        self.stateNodesLineEdit = QLineEdit(self)
+        self.stateNodesLineEdit.setPlaceholderText("e.g. 301, 302")
+        self.stateNodesLayout.addWidget(self.stateNodesLineEdit)
+        self.connectNodesButton = QPushButton('Connect')
+        self.connectNodesButton.clicked.connect(lambda: self.recordNodeState(True))
+        self.styleButton(self.connectNodesButton)
+        self.stateNodesLayout.addWidget(self.connectNodesButton)
+        self.disconnectNodesButton = QPushButton('Disconnect')
+        self.disconnectNodesButton.clicked.connect(lambda: self.recordNodeState(False))
+        self.styleButton(self.disconnectNodesButton)
+        self.stateNodesLayout.addWidget(self.disconnectNodesButton)
+        self.layout.addLayout(self.stateNodesLayout)
+
+        self.stateLodgingLayout = QHBoxLayout()
+        self.stateLodgingLabel = QLabel("Lodging:")
+        self.stateLodgingLayout.addWidget(self.stateLodgingLabel)
+        self.stateLodgingLineEdit = QLineEdit(self)
+        self.stateLodgingLineEdit.setPlaceholderText("<Node ID>:<lodging name>, e.g. 301:Heidel 4-1, 1F")
+        self.stateLodgingLayout.addWidget(self.stateLodgingLineEdit)
+        self.availableLodgingButton = QPushButton('Available')
+        self.availableLodgingButton.clicked.connect(lambda: self.recordLodgingState(True))
+        self.styleButton(self.availableLodgingButton)
+        self.stateLodgingLayout.addWidget(self.availableLodgingButton)
+        self.unavailableLodgingButton = QPushButton('Unavailable')
+        self.unavailableLodgingButton.clicked.connect(lambda: self.recordLodgingState(False))
+        self.styleButton(self.unavailableLodgingButton)
+        self.stateLodgingLayout.addWidget(self.unavailableLodgingButton)
+        self.layout.addLayout(self.stateLodgingLayout)
+
+        # Buttons to process data and to cancel a running process
+        self.processingButtonsLayout = QHBoxLayout()
         self.processButton = QPushButton('Process Data')
         self.processButton.clicked.connect(self.processData)
         self.styleButton(self.processButton)
-        self.layout.addWidget(self.processButton)
+        self.processingButtonsLayout.addWidget(self.processButton)
+        self.cancelButton = QPushButton('Cancel')
+        self.cancelButton.clicked.connect(self.cancelProcessing)
+        self.cancelButton.setEnabled(False)
+        self.styleButton(self.cancelButton)
+        self.processingButtonsLayout.addWidget(self.cancelButton)
+        self.layout.addLayout(self.processingButtonsLayout)
+
+        # Progress of the running process and the results streamed in as each yield finishes
+        self.progressBar = QProgressBar(self)
+        self.progressBar.setFormat('Idle')
+        self.progressBar.setTextVisible(True)
+        self.layout.addWidget(self.progressBar)
+        self.resultsTextEdit = QTextEdit(self)
+        self.resultsTextEdit.setReadOnly(True)
+        self.resultsTextEdit.setLineWrapMode(QTextEdit.NoWrap)
+        self.layout.addWidget(self.resultsTextEdit)
 
         # Button to open results visualization in a web browser
         self.openHTMLButton = QPushButton('Open Results Visualization')
@@ -77,6 +254,7 @@ class NodePathExplorerGUI(QMainWindow):
         # Auto-save settings when text fields change
         self.excelFilePathLineEdit.textChanged.connect(self.saveSettings)
         self.yieldNamesTextEdit.textChanged.connect(self.saveSettings)
+        self.topKSpinBox.valueChanged.connect(self.saveSettings)
 
         self.centralWidget.setLayout(self.layout)
 
@@ -96,6 +274,7 @@ class NodePathExplorerGUI(QMainWindow):
 
     def processData(self):
         # Process data using the specified Excel file and Yield names, normalize and sort yield names
+        auto_refresh, self.autoRefresh = self.autoRefresh, False
         excel_file_path = self.excelFilePathLineEdit.text()
         if '--log' in sys.argv:
             logging.debug(f'Excel File Path is: {excel_file_path}')
@@ -108,21 +287,125 @@ class NodePathExplorerGUI(QMainWindow):
             yield_names = ', '.join(sorted({name.strip().lower() for name in yield_names.split(',')}))
 
         if excel_file_path:
+            if self.workerThread is not None:
+                return
             config.EXCEL_FILE_PATH = excel_file_path
             config.YIELD_NAMES = yield_names
-            loader = ExcelDataLoader(excel_file_path)
-            excel_sheets_data = loader.load_excel_data()
-            processor = NodeProcessor(excel_sheets_data)
-            all_yield_results = processor.process_nodes(yield_names)
-            ResultsVisualizer.print_console_output(all_yield_results)
-            html_output = ResultsVisualizer.generate_html_output(all_yield_results)
-            ResultsVisualizer.save_and_open_html(html_output)
-            if '--log' in sys.argv:
-                logging.debug("Data processing complete.")
+            self.resultsTextEdit.clear()
+            self.openHTMLWhenDone = not auto_refresh
+            self.processButton.setEnabled(False)
+            self.cancelButton.setEnabled(True)
+
+            # Run the processing on a background thread so the window stays responsive
+            self.workerThread = QThread(self)
+            self.worker = ProcessingWorker(self.processorCache, excel_file_path, yield_names, self.topKSpinBox.value())
+            self.worker.moveToThread(self.workerThread)
+            self.workerThread.started.connect(self.worker.run)
+            self.worker.progress.connect(self.onProcessingProgress)
+            self.worker.yieldProcessed.connect(self.onYieldProcessed)
+            self.worker.finished.connect(self.onProcessingFinished)
+            self.worker.cancelled.connect(self.onProcessingCancelled)
+            self.worker.failed.connect(self.onProcessingFailed)
+            self.workerThread.start()
         else:
             if '--log' in sys.argv:
                 logging.debug("Please select an Excel file and enter yield names.")
 
+    def recordNodeState(self, is_connected):
+        # Save the entered nodes as connected or not; the state file is written atomically and the workbook is untouched
+        try:
+            node_ids = PlayerState.parse_node_ids(self.stateNodesLineEdit.text())
+            player_state = PlayerState.load(config.PLAYER_STATE_FILE)
+            player_state.set_connected(node_ids, is_connected)
+            player_state.save()
+        except (OSError, ValueError) as error:
+            self.resultsTextEdit.append(f"Error: {error}")
+            return
+        self.resultsTextEdit.append(f"Marked nodes {', '.join(map(str, node_ids))} as {'connected' if is_connected else 'not connected'}.")
+
+    def recordLodgingState(self, is_available):
+        # Save the entered lodging as available or not
+        try:
+            lodging = PlayerState.parse_lodging(self.stateLodgingLineEdit.text())
+            player_state = PlayerState.load(config.PLAYER_STATE_FILE)
+            player_state.set_available([lodging], is_available)
+            player_state.save()
+        except (OSError, ValueError) as error:
+            self.resultsTextEdit.append(f"Error: {error}")
+            return
+        self.resultsTextEdit.append(f"Marked lodging '{lodging[1]}' of node {lodging[0]} as {'available' if is_available else 'not available'}.")
+
+    def toggleWatch(self, checked):
+        # Poll the watched files on the main thread; the cache re-parses only the sheets that changed
+        if checked:
+            self.fileWatcher = FileWatcher([self.excelFilePathLineEdit.text(), config.PLAYER_STATE_FILE])
+            self.watchTimer.start(int(config.WATCH_POLL_INTERVAL * 1000))
+        else:
+            self.watchTimer.stop()
+            self.fileWatcher = None
+            self.watchPending = False
+
+    def pollWatchedFiles(self):
+        # Refresh once the changes have settled; a change during a run is refreshed after it
+        excel_file_path = os.path.abspath(self.excelFilePathLineEdit.text())
+        if self.fileWatcher.file_paths[0] != excel_file_path:
+            self.fileWatcher = FileWatcher([excel_file_path, config.PLAYER_STATE_FILE])
+        if self.fileWatcher.poll():
+            self.watchPending = True
+        if self.watchPending and self.workerThread is None:
+            self.watchPending = False
+            self.autoRefresh = True
+            self.processData()
+
+    def cancelProcessing(self):
+        # Ask the running worker to stop after the current yield
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancelButton.setEnabled(False)
+            self.progressBar.setFormat('Cancelling...')
+
+    def onProcessingProgress(self, done, total, message):
+        # Update the progress bar; a total of zero shows a busy indicator
+        self.progressBar.setMaximum(total)
+        self.progressBar.setValue(done)
+        self.progressBar.setFormat(f'{message} (%v/%m)' if total else message)
+
+    def onYieldProcessed(self, yield_name, node_results_dataframe):
+        # Append a finished yield's results as soon as they are available
+        self.resultsTextEdit.append(f"Node Processing Results for Yield: {yield_name}\n\n{node_results_dataframe.to_string(index=False)}\n")
+
+    def onProcessingFinished(self):
+        from results_visualizer import ResultsVisualizer
+        # Watch refreshes rewrite the report without opening another browser tab
+        if self.openHTMLWhenDone:
+            ResultsVisualizer.open_html()
+        self.progressBar.setFormat('Done')
+        if '--log' in sys.argv:
+            logging.debug("Data processing complete.")
+        self.stopWorkerThread()
+
+    def onProcessingCancelled(self):
+        self.progressBar.setFormat('Cancelled')
+        if '--log' in sys.argv:
+            logging.debug("Data processing cancelled.")
+        self.stopWorkerThread()
+
+    def onProcessingFailed(self, message):
+        self.progressBar.setFormat('Failed')
+        self.resultsTextEdit.append(f"Error: {message}")
+        self.stopWorkerThread()
+
+    def stopWorkerThread(self):
+        # Shut down the finished worker thread and re-enable processing
+        self.workerThread.quit()
+        self.workerThread.wait()
+        self.worker.deleteLater()
+        self.workerThread.deleteLater()
+        self.worker = None
+        self.workerThread = None
+        self.processButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+
     def openResultsVisualization(self):
         # Open the results visualization in the default web browser
         absolute_file_path = os.path.abspath(os.path.join(config.OUTPUT_DIRECTORY, config.DEFAULT_HTML_FILE_NAME))
@@ -137,7 +420,8 @@ class NodePathExplorerGUI(QMainWindow):
         # Save settings to a JSON file whenever text changes
         settings = {
             'excelFilePath': self.excelFilePathLineEdit.text(),
-            'yieldNames': self.yieldNamesTextEdit.toPlainText()
+            'yieldNames': self.yieldNamesTextEdit.toPlainText(),
+            'topK': self.topKSpinBox.value()
         }
         config_dir = os.path.dirname(config.CONFIG_FILE)
         if not os.path.exists(config_dir):
@@ -158,6 +442,7 @@ class NodePathExplorerGUI(QMainWindow):
                 settings = json.load(config_file)
                 self.excelFilePathLineEdit.setText(settings.get(resource_path('excelFilePath'), config.EXCEL_FILE_PATH))
                 self.yieldNamesTextEdit.setText(settings.get('yieldNames', ''))
+                self.topKSpinBox.setValue(settings.get('topK', 1))
 
         except FileNotFoundError:
             self.excelFilePathLineEdit.setText(config.EXCEL_FILE_PATH)
@@ -169,4 +454,7 @@ if __name__ == '__main__':
     ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
     ex = NodePathExplorerGUI()
     ex.show()
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    if profiler.enabled:
+        print(profiler.finish(os.path.join(config.OUTPUT_DIRECTORY, config.PROFILE_TRACE_FILE_NAME)))
+    sys.exit(exit_code)
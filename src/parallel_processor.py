@@ -0,0 +1,147 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from node_graph import NodeGraph
+from connection_solver import ConnectionSolver
+
+class SharedGraphMemory:
+    """
+    Places the arrays needed to format yield results, from a NodeGraph and its solved ConnectionSolver, in a
+    single shared memory block, so worker processes map them instead of receiving a pickled copy with every task.
+    Numeric arrays are stored as raw buffers and viewed in place by the workers; the name lists are stored once
+    as a pickled blob in the same block. The adjacency arrays are not shared, as formatting does not need them.
+
+    Attributes:
+        shared_block (SharedMemory): The shared memory block holding the arrays.
+        layout (dict): Array names mapped to tuples of (kind, dtype, shape, offset, size) describing where they are stored.
+    """
+
+    GRAPH_ARRAYS = ("node_ids", "cp_cost", "connected", "city_town_mask", "lodging_cp_cost")
+    GRAPH_LISTS = ("node_names", "node_types", "lodging_names")
+    SOLVER_ARRAYS = ("total_cost", "path_cost", "predecessor", "root")
+
+    def __init__(self, node_graph, connection_solver):
+        """
+        Copies the arrays into a new shared memory block.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            connection_solver (ConnectionSolver): The solved cheapest connections.
+        """
+        blobs = {name: np.ascontiguousarray(getattr(node_graph, name)) for name in self.GRAPH_ARRAYS}
+        blobs.update({f"solver.{name}": np.ascontiguousarray(getattr(connection_solver, name)) for name in self.SOLVER_ARRAYS})
+        blobs["lists"] = pickle.dumps({name: getattr(node_graph, name) for name in self.GRAPH_LISTS}, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.layout = {}
+        offset = 0
+        for name, blob in blobs.items():
+            size = blob.nbytes if isinstance(blob, np.ndarray) else len(blob)
+            if isinstance(blob, np.ndarray):
+                self.layout[name] = ("array", blob.dtype.str, blob.shape, offset, size)
+            else:
+                self.layout[name] = ("bytes", None, None, offset, size)
+            offset += (size + 7) // 8 * 8  # Keep every array 8-byte aligned
+        self.shared_block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, blob in blobs.items():
+            _, _, _, start, size = self.layout[name]
+            self.shared_block.buf[start:start + size] = blob.tobytes() if isinstance(blob, np.ndarray) else blob
+
+    @staticmethod
+    def attach(block_name, layout):
+        """
+        Maps a shared memory block created by another process and rebuilds read-only views of the graph and
+        solver on top of it.
+
+        Parameters:
+            block_name (str): The name of the shared memory block.
+            layout (dict): The layout of the block.
+
+        Returns:
+            tuple: The attached SharedMemory, the NodeGraph view and the ConnectionSolver view.
+        """
+        shared_block = shared_memory.SharedMemory(name=block_name)
+        views = {}
+        for name, (kind, dtype, shape, start, size) in layout.items():
+            if kind == "array":
+                views[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shared_block.buf, offset=start)
+                views[name].flags.writeable = False
+            else:
+                views[name] = pickle.loads(shared_block.buf[start:start + size])
+
+        node_graph = NodeGraph.__new__(NodeGraph)
+        for name in SharedGraphMemory.GRAPH_ARRAYS:
+            setattr(node_graph, name, views[name])
+        for name, values in views["lists"].items():
+            setattr(node_graph, name, values)
+        connection_solver = ConnectionSolver.__new__(ConnectionSolver)
+        connection_solver.node_graph = node_graph
+        connection_solver.lodging_names = node_graph.lodging_names
+        connection_solver.lodging_cp_cost = node_graph.lodging_cp_cost
+        for name in SharedGraphMemory.SOLVER_ARRAYS:
+            setattr(connection_solver, name, views[f"solver.{name}"])
+        return shared_block, node_graph, connection_solver
+
+    def close(self):
+        """
+        Releases and removes the shared memory block.
+        """
+        self.shared_block.close()
+        self.shared_block.unlink()
+
+
+# The processor of each worker process, set up once by _initialize_worker from the shared memory block.
+_worker_processor = None
+_worker_shared_block = None
+
+def _initialize_worker(block_name, layout):
+    """
+    Attaches a worker process to the shared graph and prepares a NodeProcessor over it.
+
+    Parameters:
+        block_name (str): The name of the shared memory block.
+        layout (dict): The layout of the block.
+    """
+    from node_processor import NodeProcessor
+
+    global _worker_processor, _worker_shared_block
+    _worker_shared_block, node_graph, connection_solver = SharedGraphMemory.attach(block_name, layout)
+    _worker_processor = NodeProcessor(None)
+    _worker_processor.node_graph = node_graph
+    _worker_processor.connection_solver = connection_solver
+
+def _process_yield(resolved_target_yield):
+    """
+    Processes one yield in a worker process.
+
+    Parameters:
+        resolved_target_yield (tuple): The resolved yield name and the dense indices of its nodes.
+
+    Returns:
+        tuple: The yield name and its DataFrame of node results, or None when no node can be connected.
+    """
+    resolved_yield, target_node_indices = resolved_target_yield
+    return _worker_processor.process_yield(resolved_yield, target_node_indices)
+
+def process_yields_in_parallel(processor, resolved_target_yields, worker_count=0):
+    """
+    Processes yields across a pool of worker processes sharing the processor's solved graph. Results are returned
+    in the order of the yields, so they match serial processing exactly.
+
+    Parameters:
+        processor (NodeProcessor): A processor whose connection solver is built.
+        resolved_target_yields (list): Tuples of a resolved yield name and the dense indices of its nodes.
+        worker_count (int, optional): The number of worker processes; 0 uses one per CPU core. Defaults to 0.
+
+    Returns:
+        list: Per yield, a tuple of the yield name and its DataFrame of node results, or None when no node can be connected.
+    """
+    worker_count = min(worker_count or os.cpu_count() or 1, len(resolved_target_yields))
+    shared_graph = SharedGraphMemory(processor.build_node_graph(), processor.build_connection_solver())
+    try:
+        with ProcessPoolExecutor(max_workers=worker_count, initializer=_initialize_worker, initargs=(shared_graph.shared_block.name, shared_graph.layout)) as executor:
+            chunk_size = max(len(resolved_target_yields) // (worker_count * 4), 1)
+            return list(executor.map(_process_yield, resolved_target_yields, chunksize=chunk_size))
+    finally:
+        shared_graph.close()
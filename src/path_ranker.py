@@ -0,0 +1,174 @@
+import heapq
+import numpy as np
+from profiling import profiler
+
+class PathRanker:
+    """
+    Ranks the K cheapest distinct connection plans from a set of candidate nodes to any city or town, using Yen's
+    K-shortest simple paths algorithm on the node-weighted graph.
+
+    A plan is a simple path from a candidate node to a city or town, and costs the connection cost of each of its
+    nodes plus the cheapest lodging of the city or town it ends at. The candidates and the cities or towns are
+    treated as joined to a virtual source and sink, so one ranking covers every candidate node at once. The
+    cheapest plan is read from the solved ConnectionSolver, and each further plan is found with A* searches from
+    the spur node guided by the solved costs. Ranking stops once K plans are proven optimal.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph.
+        connection_solver (ConnectionSolver): The solved cheapest connections of the same graph.
+    """
+
+    def __init__(self, node_graph, connection_solver):
+        """
+        Initializes the ranker and prepares the graph arrays used by the searches.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            connection_solver (ConnectionSolver): The solved cheapest connections of the same graph.
+        """
+        self.node_graph = node_graph
+        self.connection_solver = connection_solver
+        node_costs = node_graph.connection_costs()
+        self._node_costs = node_costs.tolist()
+        self._adjacency_offsets = node_graph.adjacency_offsets.tolist()
+        self._adjacency_indices = node_graph.adjacency_indices.tolist()
+        self._lodging_cp_cost = node_graph.lodging_cp_cost.tolist()
+        self._city_mask = node_graph.city_town_mask.tolist()
+        # Cheapest cost from each node onwards to a lodging, excluding the node itself, in the unrestricted graph
+        self._remaining_cost = (connection_solver.total_cost - node_costs).tolist()
+
+    def path_cost(self, path):
+        """
+        Returns the Total CP of a plan.
+
+        Parameters:
+            path (list): Dense indices from the candidate node to the city or town.
+
+        Returns:
+            float: The connection cost of every node on the path plus the lodging of its last node.
+        """
+        return sum(self._node_costs[node_index] for node_index in path) + self._lodging_cp_cost[path[-1]]
+
+    def rank(self, target_node_indices, k):
+        """
+        Returns the K cheapest distinct plans connecting any of the candidate nodes, cheapest first. Plans of equal
+        cost are ordered by their node sequence, so the ranking is deterministic.
+
+        Parameters:
+            target_node_indices (ndarray): Dense indices of the candidate nodes.
+            k (int): The number of plans to return.
+
+        Returns:
+            list: Tuples of (Total CP, path), where path lists dense indices from the candidate node to the city or town.
+        """
+        candidate_indices = sorted(set(np.asarray(target_node_indices).tolist()))
+        first_path = self._best_candidate_path(candidate_indices, set())
+        if first_path is None or k <= 0:
+            return []
+
+        ranked_paths = [first_path]
+        candidate_heap = []
+        seen_paths = {tuple(first_path[1])}
+        while len(ranked_paths) < k:
+            _, last_path = ranked_paths[-1]
+
+            # Deviate from the virtual source: the cheapest plan from a candidate that no ranked plan starts at.
+            used_start_nodes = {path[0] for _, path in ranked_paths}
+            source_spur = self._best_candidate_path(candidate_indices, used_start_nodes)
+            if source_spur is not None and tuple(source_spur[1]) not in seen_paths:
+                seen_paths.add(tuple(source_spur[1]))
+                heapq.heappush(candidate_heap, (source_spur[0], source_spur[1]))
+
+            # Deviate at every node of the last ranked plan.
+            for spur_position, spur_index in enumerate(last_path):
+                root_path = last_path[:spur_position + 1]
+                blocked_edges = set()
+                blocks_lodging = False
+                for _, ranked_path in ranked_paths:
+                    if ranked_path[:spur_position + 1] == root_path:
+                        if len(ranked_path) > spur_position + 1:
+                            blocked_edges.add(ranked_path[spur_position + 1])
+                        else:
+                            blocks_lodging = True
+                spur_path = self._spur_path(spur_index, set(root_path[:-1]), blocked_edges, blocks_lodging)
+                if spur_path is None:
+                    continue
+                candidate_path = root_path[:-1] + spur_path
+                if tuple(candidate_path) in seen_paths:
+                    continue
+                seen_paths.add(tuple(candidate_path))
+                heapq.heappush(candidate_heap, (self.path_cost(candidate_path), candidate_path))
+
+            if not candidate_heap:
+                break
+            ranked_paths.append(heapq.heappop(candidate_heap))
+        profiler.count("ranked paths", len(ranked_paths))
+        return ranked_paths
+
+    def _best_candidate_path(self, candidate_indices, excluded_indices):
+        """
+        Returns the cheapest unrestricted plan from a candidate node, read from the solved connections.
+
+        Parameters:
+            candidate_indices (list): Dense indices of the candidate nodes.
+            excluded_indices (set): Candidates that may not be used.
+
+        Returns:
+            tuple: The Total CP and path of the cheapest plan, or None when no allowed candidate is reachable.
+        """
+        total_cost = self.connection_solver.total_cost
+        best_path = None
+        for node_index in candidate_indices:
+            if node_index in excluded_indices or not np.isfinite(total_cost[node_index]):
+                continue
+            candidate_path = (float(total_cost[node_index]), self.connection_solver.path(node_index))
+            if best_path is None or candidate_path < best_path:
+                best_path = candidate_path
+        return best_path
+
+    def _spur_path(self, spur_index, removed_indices, blocked_edges, blocks_lodging):
+        """
+        Finds the cheapest path from a spur node to any city or town, avoiding some nodes and some of the spur
+        node's onward connections.
+
+        The search is an A* from the spur node, guided by the solved cost of reaching a city or town from each
+        node in the full graph. Removing nodes and connections can only make paths dearer, so that cost never
+        overestimates and the first city or town whose lodging is settled ends the cheapest path.
+
+        Parameters:
+            spur_index (int): The dense index of the spur node.
+            removed_indices (set): Dense indices of nodes the path may not use.
+            blocked_edges (set): Dense indices of nodes the spur node may not continue to.
+            blocks_lodging (bool): True when the spur node may not end the path at its own lodging.
+
+        Returns:
+            list: Dense indices from the spur node to the city or town, or None when there is no such path.
+        """
+        node_costs = self._node_costs
+        adjacency_offsets = self._adjacency_offsets
+        adjacency_indices = self._adjacency_indices
+        remaining_cost = self._remaining_cost
+        best_cost = {spur_index: 0.0}
+        predecessor = {}
+        heap = [(remaining_cost[spur_index], 0.0, spur_index, False)]
+        while heap:
+            _, current_cost, node_index, is_lodging = heapq.heappop(heap)
+            if is_lodging:
+                path = [node_index]
+                while path[-1] in predecessor:
+                    path.append(predecessor[path[-1]])
+                return path[::-1]
+            if current_cost > best_cost[node_index]:
+                continue
+            if self._city_mask[node_index] and not (node_index == spur_index and blocks_lodging):
+                lodging_cost = current_cost + self._lodging_cp_cost[node_index]
+                heapq.heappush(heap, (lodging_cost, lodging_cost, node_index, True))
+            for next_index in adjacency_indices[adjacency_offsets[node_index]:adjacency_offsets[node_index + 1]]:
+                if next_index == spur_index or next_index in removed_indices or (node_index == spur_index and next_index in blocked_edges):
+                    continue
+                next_cost = current_cost + node_costs[next_index]
+                if next_cost < best_cost.get(next_index, np.inf) and remaining_cost[next_index] < np.inf:
+                    best_cost[next_index] = next_cost
+                    predecessor[next_index] = node_index
+                    heapq.heappush(heap, (next_cost + remaining_cost[next_index], next_cost, next_index, False))
+        return None
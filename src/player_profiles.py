@@ -0,0 +1,255 @@
+import os
+import json
+import numpy as np
+import config
+from player_state import parse_overrides
+from profiling import profiler
+
+class PlayerProfiles:
+    """
+    The "Connected" and "Available" flags of several players, stored as bitsets: one row of packed bits per player,
+    with one bit per node of the node graph and one bit per house of the lodging engine.
+
+    A player is described by an overlay, a small JSON file with the same "connected" and "available" keys as a batch
+    scenario, which is applied on top of the flags of the loaded workbook, e.g.
+    {"name": "Alice", "connected": {"301": true}, "available": [[301, "Heidel 4-1, 1F", false]]}.
+
+    Attributes:
+        profile_names (list): The name of each player.
+        connected_bits (ndarray): Packed "Connected" flags, one row per player.
+        available_bits (ndarray): Packed "Available" flags, one row per player.
+        node_count (int): The number of nodes, i.e. of meaningful bits in a row of connected_bits.
+        house_count (int): The number of houses, i.e. of meaningful bits in a row of available_bits.
+    """
+
+    def __init__(self, profile_names, connected, available):
+        """
+        Packs the flags of the players.
+
+        Parameters:
+            profile_names (list): The name of each player.
+            connected (ndarray): Boolean "Connected" flags, one row per player and one column per node.
+            available (ndarray): Boolean "Available" flags, one row per player and one column per house.
+        """
+        self.profile_names = list(profile_names)
+        self.node_count = connected.shape[1]
+        self.house_count = available.shape[1]
+        self.connected_bits = np.packbits(connected, axis=1)
+        self.available_bits = np.packbits(available, axis=1)
+
+    def __len__(self):
+        return len(self.profile_names)
+
+    @classmethod
+    def from_overlays(cls, overlays, node_graph, lodging_engine):
+        """
+        Builds the profiles of players from their overlays.
+
+        Parameters:
+            overlays (list): Tuples of a player name and the decoded overlay dict.
+            node_graph (NodeGraph): The compiled node graph, holding the workbook's "Connected" flags.
+            lodging_engine (LodgingEngine): The lodging engine, holding the workbook's "Available" flags.
+
+        Returns:
+            PlayerProfiles: The profiles, in the order of the overlays.
+        """
+        connected = np.tile(node_graph.connected, (len(overlays), 1))
+        available = np.tile(lodging_engine.available, (len(overlays), 1))
+        for profile_position, (profile_name, overlay) in enumerate(overlays):
+            connected_nodes, available_lodgings = parse_overrides(overlay)
+            for node_id, is_connected in connected_nodes.items():
+                if node_id not in node_graph.index_of:
+                    print(f"Warning: Node ID {node_id} of player '{profile_name}' not found in the Excel sheet. Skipping...")
+                    continue
+                connected[profile_position, node_graph.index(node_id)] = is_connected
+            for (node_id, lodging_name), is_available in available_lodgings.items():
+                positions = [position for position in lodging_engine.positions_by_node_id.get(node_id, np.empty(0, dtype=np.int64)).tolist() if lodging_engine.lodging_names[position] == lodging_name]
+                if not positions:
+                    print(f"Warning: Lodging '{lodging_name}' of Node ID {node_id} of player '{profile_name}' not found in the Excel sheet. Skipping...")
+                    continue
+                available[profile_position, positions] = is_available
+        return cls([profile_name for profile_name, _ in overlays], connected, available)
+
+    @staticmethod
+    def read_overlays(overlay_paths):
+        """
+        Reads player overlay files. A directory stands for every .json file in it, in name order, and a player is named
+        after the overlay's "name" key, or else its file name.
+
+        Parameters:
+            overlay_paths (list): Paths of overlay files or directories of them.
+
+        Returns:
+            list: Tuples of a player name and the decoded overlay dict.
+        """
+        file_paths = []
+        for overlay_path in overlay_paths:
+            if os.path.isdir(overlay_path):
+                file_paths.extend(os.path.join(overlay_path, file_name) for file_name in sorted(os.listdir(overlay_path)) if file_name.lower().endswith(".json"))
+            else:
+                file_paths.append(overlay_path)
+        overlays = []
+        for file_path in file_paths:
+            with open(file_path, "r", encoding="utf-8") as overlay_file:
+                overlay = json.load(overlay_file)
+            if not isinstance(overlay, dict):
+                raise ValueError(f"The player overlay {file_path} is not a JSON object.")
+            overlays.append((str(overlay.get("name", os.path.splitext(os.path.basename(file_path))[0])), overlay))
+        return overlays
+
+    def connected_matrix(self, profile_slice=slice(None)):
+        """
+        Unpacks the "Connected" flags of some players.
+
+        Parameters:
+            profile_slice (slice, optional): The players to unpack. Defaults to every player.
+
+        Returns:
+            ndarray: Boolean flags, one row per player and one column per node.
+        """
+        return np.unpackbits(self.connected_bits[profile_slice], axis=1, count=self.node_count).astype(bool)
+
+    def available_matrix(self, profile_slice=slice(None)):
+        """
+        Unpacks the "Available" flags of some players.
+
+        Parameters:
+            profile_slice (slice, optional): The players to unpack. Defaults to every player.
+
+        Returns:
+            ndarray: Boolean flags, one row per player and one column per house.
+        """
+        return np.unpackbits(self.available_bits[profile_slice], axis=1, count=self.house_count).astype(bool)
+
+
+class PlayerProfileSolver:
+    """
+    Computes the cheapest connection cost of every node for many players at once.
+
+    Every player shares the node graph and the lodging engine; only the connection costs, which follow the "Connected"
+    flags, and the lodging costs of cities and towns, which follow the "Available" flags, differ. The costs of a batch
+    of players are held in one player x node array and solved by a vectorized Bellman-Ford sweep seeded at the cities
+    and towns: each round relaxes, for all players together, only the nodes next to a node whose cost dropped in the
+    previous round. The costs equal those of one ConnectionSolver per player.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph.
+        lodging_engine (LodgingEngine): The lodging engine.
+        city_indices (ndarray): Dense indices of the cities and towns.
+    """
+
+    def __init__(self, node_graph, lodging_engine):
+        """
+        Initializes the solver.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            lodging_engine (LodgingEngine): The lodging engine.
+        """
+        self.node_graph = node_graph
+        self.lodging_engine = lodging_engine
+        self.city_indices = np.flatnonzero(node_graph.city_town_mask)
+
+        # Worker lodgings of nodes in the graph, grouped by node, to take the cheapest usable one per node.
+        worker_positions = np.flatnonzero(lodging_engine.worker_lodging_mask)
+        worker_positions = worker_positions[np.isin(lodging_engine.node_ids[worker_positions], node_graph.node_ids)]
+        self._worker_positions = worker_positions[np.argsort(lodging_engine.node_ids[worker_positions], kind="stable")]
+        worker_node_ids = lodging_engine.node_ids[self._worker_positions]
+        self._worker_group_starts = np.flatnonzero(np.r_[True, np.diff(worker_node_ids) != 0]) if len(worker_node_ids) else np.empty(0, dtype=np.int64)
+        self._worker_node_indices = np.array([node_graph.index(node_id) for node_id in worker_node_ids[self._worker_group_starts].tolist()], dtype=np.int64)
+        self._child_positions = np.flatnonzero(lodging_engine.parent_position >= 0)
+        self._parent_positions = lodging_engine.parent_position[self._child_positions]
+
+    def lodging_costs(self, available):
+        """
+        Returns, per player, the chain cost of the cheapest usable worker lodging of every node, mirroring
+        LodgingEngine.minimum_lodging_arrays for worker lodgings.
+
+        Parameters:
+            available (ndarray): Boolean "Available" flags, one row per player and one column per house.
+
+        Returns:
+            ndarray: Lodging CP, one row per player and one column per node; nodes without a usable lodging cost
+            config.DEFAULT_NO_LODGING_CP_COST, as in the node graph.
+        """
+        # A house is usable when it and every house in its Parent Lodging chain are available.
+        chain_available = available.copy()
+        for _ in range(len(self._child_positions)):
+            parent_available = available[:, self._child_positions] & chain_available[:, self._parent_positions]
+            if np.array_equal(parent_available, chain_available[:, self._child_positions]):
+                break
+            chain_available[:, self._child_positions] = parent_available
+
+        lodging_cp_cost = np.full((available.shape[0], self.node_graph.node_count), float(config.DEFAULT_NO_LODGING_CP_COST))
+        if len(self._worker_positions):
+            house_costs = np.where(chain_available[:, self._worker_positions], self.lodging_engine.chain_cost[self._worker_positions], np.inf)
+            minimum_costs = np.minimum.reduceat(house_costs, self._worker_group_starts, axis=1)
+            lodging_cp_cost[:, self._worker_node_indices] = np.where(np.isfinite(minimum_costs), minimum_costs, config.DEFAULT_NO_LODGING_CP_COST)
+        return lodging_cp_cost
+
+    @staticmethod
+    def _row_positions(offsets, rows):
+        """
+        Returns the positions of the entries of some rows of a CSR array.
+
+        Parameters:
+            offsets (ndarray): The CSR offsets.
+            rows (ndarray): The rows.
+
+        Returns:
+            tuple: The positions of the rows' entries, concatenated, and where each row's entries start among them.
+        """
+        starts = offsets[rows]
+        lengths = offsets[rows + 1] - starts
+        segment_starts = np.cumsum(lengths) - lengths
+        return np.arange(lengths.sum()) + np.repeat(starts - segment_starts, lengths), segment_starts
+
+    def total_costs(self, connection_costs, lodging_cp_cost):
+        """
+        Runs the vectorized sweep for a batch of players.
+
+        Parameters:
+            connection_costs (ndarray): CP needed to connect each node, one row per player.
+            lodging_cp_cost (ndarray): Lodging CP of each node, one row per player.
+
+        Returns:
+            ndarray: Cheapest path CP plus lodging CP per node, one row per player, or inf when no city or town is
+            reachable.
+        """
+        node_graph = self.node_graph
+        total_cost = np.full(connection_costs.shape, np.inf)
+        total_cost[:, self.city_indices] = connection_costs[:, self.city_indices] + lodging_cp_cost[:, self.city_indices]
+        frontier = self.city_indices
+        sweep_rounds = 0
+        while len(frontier):
+            # Only nodes with a connection into the frontier can improve.
+            reverse_positions, _ = self._row_positions(node_graph.reverse_offsets, frontier)
+            rows = np.unique(node_graph.reverse_indices[reverse_positions])
+            adjacency_positions, segment_starts = self._row_positions(node_graph.adjacency_offsets, rows)
+            next_costs = np.minimum.reduceat(total_cost[:, node_graph.adjacency_indices[adjacency_positions]], segment_starts, axis=1)
+            candidate_costs = next_costs + connection_costs[:, rows]
+            improved = candidate_costs < total_cost[:, rows]
+            total_cost[:, rows] = np.where(improved, candidate_costs, total_cost[:, rows])
+            frontier = rows[improved.any(axis=0)]
+            sweep_rounds += 1
+        profiler.count("player profile sweep rounds", sweep_rounds)
+        return total_cost
+
+    def solve(self, player_profiles, batch_size=config.PLAYER_PROFILE_BATCH_SIZE):
+        """
+        Computes the cheapest connection cost of every node for every player, config.PLAYER_PROFILE_BATCH_SIZE
+        players per sweep.
+
+        Parameters:
+            player_profiles (PlayerProfiles): The players.
+            batch_size (int, optional): The number of players swept together. Defaults to config.PLAYER_PROFILE_BATCH_SIZE.
+
+        Returns:
+            ndarray: Cheapest path CP plus lodging CP per node, one row per player.
+        """
+        total_costs = []
+        for batch_start in range(0, len(player_profiles), max(batch_size, 1)):
+            profile_slice = slice(batch_start, batch_start + max(batch_size, 1))
+            connection_costs = np.where(player_profiles.connected_matrix(profile_slice), config.DEFAULT_NO_LODGING_CP_COST, self.node_graph.cp_cost)
+            total_costs.append(self.total_costs(connection_costs, self.lodging_costs(player_profiles.available_matrix(profile_slice))))
+        return np.vstack(total_costs) if total_costs else np.empty((0, self.node_graph.node_count))
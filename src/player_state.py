@@ -0,0 +1,143 @@
+import os
+import json
+
+def parse_overrides(scenario):
+    """
+    Reads the "Connected" and "Available" overrides of a scenario, player overlay or player state.
+
+    Parameters:
+        scenario (dict): The decoded scenario.
+
+    Returns:
+        tuple: Node IDs mapped to their "Connected" flag, and (Node ID, lodging name) tuples mapped to their "Available" flag.
+    """
+    connected_nodes = {int(node_id): bool(is_connected) for node_id, is_connected in scenario.get("connected", {}).items()}
+    available_lodgings = {(int(node_id), lodging_name): bool(is_available) for node_id, lodging_name, is_available in scenario.get("available", [])}
+    return connected_nodes, available_lodgings
+
+class PlayerState:
+    """
+    The player's progress, i.e. the "Connected" flags of nodes and the "Available" flags of lodgings, kept in a small
+    sidecar JSON file next to the workbook instead of in the workbook itself. The workbook holds the game data; the
+    state is applied on top of it with NodeProcessor.apply_player_state, so recording progress never rewrites or
+    re-parses the workbook.
+
+    The file uses the same "connected" and "available" keys as batch scenarios and player overlays, e.g.
+    {"connected": {"301": true}, "available": [[301, "Heidel 4-1, 1F", true]]}. Nodes and lodgings it does not list
+    keep the flags of the workbook.
+
+    Attributes:
+        file_path (str): The path of the state file.
+        connected_nodes (dict): Node IDs mapped to their "Connected" flag.
+        available_lodgings (dict): Tuples of (Node ID, lodging name) mapped to their "Available" flag.
+    """
+
+    def __init__(self, file_path, connected_nodes=None, available_lodgings=None):
+        """
+        Initializes the state.
+
+        Parameters:
+            file_path (str): The path of the state file.
+            connected_nodes (dict, optional): Node IDs mapped to their "Connected" flag. Defaults to none.
+            available_lodgings (dict, optional): Tuples of (Node ID, lodging name) mapped to their "Available" flag. Defaults to none.
+        """
+        self.file_path = file_path
+        self.connected_nodes = dict(connected_nodes or {})
+        self.available_lodgings = dict(available_lodgings or {})
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Reads a state file. A missing file is an empty state, which leaves every flag as in the workbook.
+
+        Parameters:
+            file_path (str): The path of the state file.
+
+        Returns:
+            PlayerState: The state.
+        """
+        try:
+            with open(file_path, "r", encoding="utf-8") as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return cls(file_path)
+        if not isinstance(state, dict):
+            raise ValueError(f"The player state {file_path} is not a JSON object.")
+        return cls(file_path, *parse_overrides(state))
+
+    def to_dict(self):
+        """
+        Returns the state in the layout of the state file.
+
+        Returns:
+            dict: The "connected" and "available" keys, sorted by Node ID.
+        """
+        return {
+            "connected": {str(node_id): is_connected for node_id, is_connected in sorted(self.connected_nodes.items())},
+            "available": [[node_id, lodging_name, is_available] for (node_id, lodging_name), is_available in sorted(self.available_lodgings.items())],
+        }
+
+    def save(self):
+        """
+        Writes the state file through a temporary file and an atomic rename, so a reader never sees a partly written
+        file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        temporary_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as state_file:
+            json.dump(self.to_dict(), state_file, indent=2)
+        os.replace(temporary_path, self.file_path)
+
+    def set_connected(self, node_ids, is_connected):
+        """
+        Records nodes as connected or disconnected.
+
+        Parameters:
+            node_ids (iterable): The Node IDs.
+            is_connected (bool): The new "Connected" flag.
+        """
+        for node_id in node_ids:
+            self.connected_nodes[int(node_id)] = bool(is_connected)
+
+    def set_available(self, lodgings, is_available):
+        """
+        Records lodgings as available or unavailable.
+
+        Parameters:
+            lodgings (iterable): Tuples of (Node ID, lodging name).
+            is_available (bool): The new "Available" flag.
+        """
+        for node_id, lodging_name in lodgings:
+            self.available_lodgings[(int(node_id), lodging_name)] = bool(is_available)
+
+    @staticmethod
+    def parse_node_ids(node_ids_text):
+        """
+        Reads a comma-separated list of Node IDs, e.g. "301, 302".
+
+        Parameters:
+            node_ids_text (str): The list.
+
+        Returns:
+            list: The Node IDs.
+        """
+        try:
+            return [int(node_id) for node_id in node_ids_text.split(",") if node_id.strip()]
+        except ValueError:
+            raise ValueError(f"Invalid Node IDs '{node_ids_text}'; expected comma-separated numbers.") from None
+
+    @staticmethod
+    def parse_lodging(lodging_text):
+        """
+        Reads a lodging given as "<Node ID>:<lodging name>", e.g. "301:Heidel 4-1, 1F".
+
+        Parameters:
+            lodging_text (str): The lodging.
+
+        Returns:
+            tuple: The Node ID and the lodging name.
+        """
+        node_id, separator, lodging_name = lodging_text.partition(":")
+        if not separator or not node_id.strip().isdigit() or not lodging_name.strip():
+            raise ValueError(f"Invalid lodging '{lodging_text}'; expected '<Node ID>:<lodging name>'.")
+        return int(node_id), lodging_name.strip()
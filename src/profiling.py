@@ -0,0 +1,237 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import threading
+import cProfile
+import tracemalloc
+import config
+
+class _NullSpan:
+    """A reusable context manager that does nothing, returned by Profiler.span while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """A context manager recording the wall-clock duration of one stage."""
+
+    __slots__ = ("profiler", "name", "started_at")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record_span(self.name, self.started_at, time.perf_counter())
+        return False
+
+class _ThreadProfile:
+    """A context manager running the shared cProfile profile on the current thread, returned by Profiler.profile_thread."""
+
+    __slots__ = ("cprofile",)
+
+    def __init__(self, cprofile):
+        self.cprofile = cprofile
+
+    def __enter__(self):
+        self.cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cprofile.disable()
+        return False
+
+class Profiler:
+    """
+    Collects timing spans and counters for the stages of a run. While disabled, span returns a shared no-op
+    context manager and count returns immediately, so instrumented code pays almost nothing in normal runs.
+
+    Attributes:
+        enabled (bool): Whether spans and counters are recorded.
+        spans (list): Recorded spans as tuples of (name, thread id, start seconds, end seconds).
+        counters (dict): Counter names mapped to their totals.
+    """
+
+    def __init__(self):
+        """
+        Initializes a disabled profiler.
+        """
+        self.enabled = False
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._cprofile = None
+
+    def enable(self, use_cprofile=False, use_tracemalloc=False, profile_calling_thread=True):
+        """
+        Starts recording spans and counters, optionally under cProfile and tracemalloc.
+
+        Parameters:
+            use_cprofile (bool, optional): Also run cProfile on the calling thread. Defaults to False.
+            use_tracemalloc (bool, optional): Also trace memory allocations. Defaults to False.
+            profile_calling_thread (bool, optional): Start cProfile on the calling thread right away; otherwise only
+                the blocks run under profile_thread are profiled, e.g. on a worker thread. Defaults to True.
+        """
+        self.enabled = True
+        self.spans = []
+        self.counters = {}
+        self._origin = time.perf_counter()
+        if use_cprofile:
+            self._cprofile = cProfile.Profile()
+            if profile_calling_thread:
+                self._cprofile.enable()
+        if use_tracemalloc:
+            tracemalloc.start()
+
+    def profile_thread(self):
+        """
+        Returns a context manager running cProfile on the current thread for the duration of a block, since cProfile
+        only profiles the thread it was enabled on. Does nothing unless cProfile was requested.
+
+        Returns:
+            context manager: The profiled block.
+        """
+        if self._cprofile is None:
+            return _NULL_SPAN
+        return _ThreadProfile(self._cprofile)
+
+    def span(self, name):
+        """
+        Returns a context manager timing the enclosed block under a stage name.
+
+        Parameters:
+            name (str): The stage name.
+
+        Returns:
+            A context manager.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record_span(self, name, started_at, ended_at):
+        """
+        Records a finished span.
+
+        Parameters:
+            name (str): The stage name.
+            started_at (float): The start time from time.perf_counter.
+            ended_at (float): The end time from time.perf_counter.
+        """
+        with self._lock:
+            self.spans.append((name, threading.get_ident(), started_at, ended_at))
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter.
+
+        Parameters:
+            name (str): The counter name.
+            amount (int, optional): The amount to add. Defaults to 1.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary_table(self):
+        """
+        Builds a text table of the total, call count and mean duration of each stage, followed by the counters.
+
+        Returns:
+            str: The summary table.
+        """
+        totals = {}
+        for name, _, started_at, ended_at in self.spans:
+            calls, seconds = totals.get(name, (0, 0.0))
+            totals[name] = (calls + 1, seconds + ended_at - started_at)
+        lines = [f"{'Stage':<32} {'Calls':>7} {'Total ms':>12} {'Mean ms':>12}"]
+        for name, (calls, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<32} {calls:>7} {seconds * 1000:>12.3f} {seconds * 1000 / calls:>12.3f}")
+        if self.counters:
+            lines.append("")
+            lines.append(f"{'Counter':<32} {'Value':>7}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<32} {value:>7}")
+        return "\n".join(lines)
+
+    def write_trace(self, file_path):
+        """
+        Writes the spans and counters as a JSON trace in the Chrome trace event format, which can be opened in
+        chrome://tracing or Perfetto.
+
+        Parameters:
+            file_path (str): The path of the trace file.
+        """
+        trace_events = [
+            {"name": name, "ph": "X", "pid": os.getpid(), "tid": thread_id, "ts": (started_at - self._origin) * 1e6, "dur": (ended_at - started_at) * 1e6}
+            for name, thread_id, started_at, ended_at in self.spans
+        ]
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        with open(file_path, "w") as trace_file:
+            json.dump({"traceEvents": trace_events, "counters": self.counters}, trace_file)
+
+    def finish(self, trace_file_path=None):
+        """
+        Stops cProfile and tracemalloc if they were started, and builds the report of the run.
+
+        Parameters:
+            trace_file_path (str, optional): Where to write the JSON trace. Defaults to not writing one.
+
+        Returns:
+            str: The summary table, followed by the cProfile and tracemalloc reports when enabled.
+        """
+        report_sections = [self.summary_table()]
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            cprofile_output = io.StringIO()
+            try:
+                pstats.Stats(self._cprofile, stream=cprofile_output).sort_stats("cumulative").print_stats(config.PROFILE_CPROFILE_LINES)
+            except TypeError:
+                # pstats refuses a profile without any calls, e.g. when no block ran under profile_thread.
+                cprofile_output.write("cProfile: no calls profiled.")
+            report_sections.append(cprofile_output.getvalue())
+            self._cprofile = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory_lines = [f"Traced memory: current {current_bytes / 1024:.1f} KiB, peak {peak_bytes / 1024:.1f} KiB"]
+            memory_lines.extend(str(statistic) for statistic in snapshot.statistics("lineno")[:config.PROFILE_TRACEMALLOC_LINES])
+            report_sections.append("\n".join(memory_lines))
+        if trace_file_path:
+            self.write_trace(trace_file_path)
+            report_sections.append(f"Trace written to {trace_file_path}")
+        return "\n\n".join(report_sections)
+
+# The process-wide profiler used by every instrumented module.
+profiler = Profiler()
+
+def setup_profiling(profile_calling_thread=True):
+    """
+    Enables the profiler when '--profile' is given on the command line; '--profile-cprofile' and '--profile-memory'
+    additionally run cProfile and tracemalloc.
+
+    Parameters:
+        profile_calling_thread (bool, optional): Run cProfile on the calling thread, see Profiler.enable. Defaults to True.
+
+    Returns:
+        bool: True when profiling was enabled.
+    """
+    if not any(flag in sys.argv for flag in ("--profile", "--profile-cprofile", "--profile-memory")):
+        return False
+    profiler.enable(use_cprofile='--profile-cprofile' in sys.argv, use_tracemalloc='--profile-memory' in sys.argv, profile_calling_thread=profile_calling_thread)
+    return True
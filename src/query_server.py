@@ -0,0 +1,339 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import config
+
+# The query server keeps the parsed workbook and the compiled node graph in memory and answers yield-path queries
+# over local HTTP/JSON. pandas and the processing modules are only imported by the server, so the thin client
+# starts as fast as the interpreter does.
+
+def json_default(value):
+    """
+    Converts values json cannot encode, such as the VisitedPath of a result, to JSON-serializable data.
+
+    Parameters:
+        value: The value to convert.
+
+    Returns:
+        The converted value: the hop records of a VisitedPath, otherwise its string form.
+    """
+    return value.to_records() if hasattr(value, "to_records") else str(value)
+
+def results_to_json(all_yield_results):
+    """
+    Converts processing results to JSON-serializable data.
+
+    Parameters:
+        all_yield_results (list): A list of tuples, each containing a yield name and a DataFrame with the results for that yield.
+
+    Returns:
+        list: One dict per yield with the keys "yield" and "nodes", the latter a list of result rows. Visited nodes
+        are exported as a list of hops, in path order.
+    """
+    return [
+        {"yield": yield_name, "nodes": json.loads(node_results_dataframe.to_json(orient="records", default_handler=json_default))}
+        for yield_name, node_results_dataframe in all_yield_results
+    ]
+
+class ReadWriteLock:
+    """
+    A readers-writer lock: any number of readers hold it at the same time, while a writer holds it alone. A waiting
+    writer keeps new readers out, so a steady stream of readers cannot hold it off.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writing = False
+
+    @contextlib.contextmanager
+    def read(self):
+        """Holds the lock shared with other readers."""
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        """Holds the lock exclusively."""
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    The HTTP server, answering each request on its own thread. Its listen backlog is larger than the default of
+    five, so a burst of parallel clients is queued instead of having connections reset.
+    """
+
+    daemon_threads = True
+    request_queue_size = 64
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /query?yields=...&combined=1 and POST /query with a JSON body {"yields": "...", "combined": false},
+    plus GET /health, which also reports the result cache counters. The workbook is reloaded automatically when it changes on disk.
+
+    POST /update with a JSON body {"connected": {"<Node ID>": true}, "available": [[<Node ID>, "<lodging name>", true]]}
+    changes "Connected" and "Available" flags of the loaded workbook in memory and returns the yields whose results
+    may have changed. Updates are lost when the workbook itself changes on disk; the server's player state file, in
+    contrast, is re-applied whenever it changes.
+
+    Queries only read the shared processor and run in parallel. Updates, and reloading a changed workbook or player
+    state, change it in place and wait until no query is running.
+    """
+
+    def do_GET(self):
+        parsed_url = urllib.parse.urlparse(self.path)
+        if parsed_url.path == "/health":
+            result_cache = self.server.processor_cache.result_cache
+            self.send_json(200, {"status": "ok", "workbook": self.server.excel_file_path, "result_cache": result_cache.stats() if result_cache is not None else None})
+        elif parsed_url.path == "/query":
+            query = urllib.parse.parse_qs(parsed_url.query)
+            self.answer_query(query.get("yields", [""])[0], query.get("combined", ["0"])[0] in ("1", "true"))
+        else:
+            self.send_json(404, {"error": f"Unknown path {parsed_url.path}"})
+
+    def do_POST(self):
+        request_path = urllib.parse.urlparse(self.path).path
+        if request_path not in ("/query", "/update"):
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request_body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError as error:
+            self.send_json(400, {"error": f"Invalid JSON body: {error}"})
+            return
+        if not isinstance(request_body, dict):
+            self.send_json(400, {"error": "The JSON body must be an object."})
+            return
+        if request_path == "/update":
+            self.apply_update(request_body)
+            return
+        yield_names = request_body.get("yields", "")
+        if not isinstance(yield_names, str):
+            self.send_json(400, {"error": "\"yields\" must be a string of comma-separated yield names."})
+            return
+        self.answer_query(yield_names, bool(request_body.get("combined", False)))
+
+    def answer_query(self, yield_names, combined):
+        """
+        Processes a query against the warm workbook and sends the results.
+
+        Parameters:
+            yield_names (str): Comma-separated yield names.
+            combined (bool): Whether to return one combined plan instead of per-yield results.
+        """
+        if not yield_names.strip():
+            self.send_json(400, {"error": "No yields given."})
+            return
+        started_at = time.perf_counter()
+        try:
+            with self.shared_processor() as processor:
+                if combined:
+                    all_yield_results = processor.process_combined_plan(yield_names)
+                else:
+                    all_yield_results = processor.process_nodes(yield_names)
+        except Exception as error:
+            self.send_json(500, {"error": str(error)})
+            return
+        self.send_json(200, {
+            "results": results_to_json(all_yield_results),
+            "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 3),
+        })
+
+    def apply_update(self, request_body):
+        """
+        Applies "Connected" and "Available" changes to the warm workbook and sends the affected yields.
+
+        Parameters:
+            request_body (dict): The decoded JSON body with optional "connected" and "available" keys.
+        """
+        started_at = time.perf_counter()
+        try:
+            connected_nodes = {int(node_id): bool(is_connected) for node_id, is_connected in request_body.get("connected", {}).items()}
+            available_lodgings = {(int(node_id), lodging_name): bool(is_available) for node_id, lodging_name, is_available in request_body.get("available", [])}
+        except (AttributeError, TypeError, ValueError) as error:
+            self.send_json(400, {"error": f"Invalid update: {error}"})
+            return
+        try:
+            with self.server.processor_lock.write():
+                processor = self.server.processor_cache.get_processor(self.server.excel_file_path)
+                affected_yields = processor.apply_changes(connected_nodes, available_lodgings)
+        except Exception as error:
+            self.send_json(500, {"error": str(error)})
+            return
+        self.send_json(200, {
+            "affected_yields": [yield_name.capitalize() for yield_name in affected_yields],
+            "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 3),
+        })
+
+    @contextlib.contextmanager
+    def shared_processor(self):
+        """
+        Holds the warm processor for a query, shared with the other queries. When the workbook or the player state
+        changed on disk, the processor is first brought up to date under the exclusive lock.
+
+        Yields:
+            NodeProcessor: The up-to-date processor, which must only be read.
+        """
+        processor_lock, processor_cache = self.server.processor_lock, self.server.processor_cache
+        while True:
+            with processor_lock.read():
+                processor = processor_cache.current_processor(self.server.excel_file_path)
+                if processor is not None:
+                    yield processor
+                    return
+            with processor_lock.write():
+                processor_cache.get_processor(self.server.excel_file_path)
+
+    def send_json(self, status_code, payload):
+        """
+        Sends a JSON response.
+
+        Parameters:
+            status_code (int): The HTTP status code.
+            payload (dict): The response body.
+        """
+        response_body = json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def log_message(self, format, *args):
+        if '--log' in sys.argv:
+            super().log_message(format, *args)
+
+def serve(excel_file_path, host=config.SERVER_HOST, port=config.SERVER_PORT, use_snapshot=True, use_result_cache=True, player_state_path=None):
+    """
+    Loads the workbook once and serves queries until interrupted.
+
+    Parameters:
+        excel_file_path (str): The path to the Excel workbook.
+        host (str, optional): The interface to listen on. Defaults to config.SERVER_HOST.
+        port (int, optional): The port to listen on. Defaults to config.SERVER_PORT.
+        use_snapshot (bool, optional): Whether the binary workbook snapshot is used. Defaults to True.
+        use_result_cache (bool, optional): Whether per-yield results are cached. Defaults to True.
+        player_state_path (str, optional): A player state file applied on top of the workbook. Defaults to none.
+    """
+    from workbook_cache import WarmProcessorCache
+    from result_cache import ResultCache
+
+    server = QueryServer((host, port), QueryRequestHandler)
+    server.excel_file_path = excel_file_path
+    server.processor_cache = WarmProcessorCache(use_snapshot=use_snapshot, result_cache=ResultCache() if use_result_cache else None, player_state_path=player_state_path)
+    server.processor_lock = ReadWriteLock()
+    server.processor_cache.get_processor(excel_file_path)
+    print(f"Serving {excel_file_path} on http://{host}:{port}/query")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def query(yield_names, combined=False, host=config.SERVER_HOST, port=config.SERVER_PORT):
+    """
+    Sends a query to a running server.
+
+    Parameters:
+        yield_names (str): Comma-separated yield names.
+        combined (bool, optional): Whether to ask for one combined plan. Defaults to False.
+        host (str, optional): The server's host. Defaults to config.SERVER_HOST.
+        port (int, optional): The server's port. Defaults to config.SERVER_PORT.
+
+    Returns:
+        dict: The decoded JSON response.
+    """
+    request = urllib.request.Request(
+        f"http://{host}:{port}/query",
+        data=json.dumps({"yields": yield_names, "combined": combined}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+def update(connected_nodes=None, available_lodgings=None, host=config.SERVER_HOST, port=config.SERVER_PORT):
+    """
+    Sends "Connected" and "Available" changes to a running server.
+
+    Parameters:
+        connected_nodes (dict, optional): Node IDs mapped to their new "Connected" flag.
+        available_lodgings (dict, optional): Tuples of (Node ID, lodging name) mapped to their new "Available" flag.
+        host (str, optional): The server's host. Defaults to config.SERVER_HOST.
+        port (int, optional): The server's port. Defaults to config.SERVER_PORT.
+
+    Returns:
+        dict: The decoded JSON response.
+    """
+    request_body = {
+        "connected": {str(node_id): is_connected for node_id, is_connected in (connected_nodes or {}).items()},
+        "available": [[node_id, lodging_name, is_available] for (node_id, lodging_name), is_available in (available_lodgings or {}).items()],
+    }
+    request = urllib.request.Request(
+        f"http://{host}:{port}/update",
+        data=json.dumps(request_body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+def parse_arguments():
+    """Parse the command-line arguments of the query server and client."""
+    parser = argparse.ArgumentParser(description="BDO NodePath Explorer query server")
+    parser.add_argument("--host", default=config.SERVER_HOST, help="Host to listen on or connect to.")
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT, help="Port to listen on or connect to.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Load the workbook once and answer queries.")
+    serve_parser.add_argument("--excel-file", default=config.EXCEL_FILE_PATH, help="Path to the Excel workbook (defaults to config.EXCEL_FILE_PATH).")
+    serve_parser.add_argument("--state", metavar="FILE", help="Player state file applied on top of the workbook.")
+    serve_parser.add_argument("--no-cache", action="store_true", help="Do not use the workbook snapshot.")
+    query_parser = commands.add_parser("query", help="Send a query to a running server and print the JSON response.")
+    query_parser.add_argument("yield_names", help="Comma-separated yield names.")
+    query_parser.add_argument("--combined", action="store_true", help="Ask for one combined plan covering all yields.")
+    update_parser = commands.add_parser("update", help="Change Connected and Available flags on a running server.")
+    update_parser.add_argument("--connect", type=int, nargs="+", default=[], metavar="NODE_ID", help="Mark nodes as connected.")
+    update_parser.add_argument("--disconnect", type=int, nargs="+", default=[], metavar="NODE_ID", help="Mark nodes as not connected.")
+    update_parser.add_argument("--available", nargs=2, action="append", default=[], metavar=("NODE_ID", "LODGING_NAME"), help="Mark a lodging as available.")
+    update_parser.add_argument("--unavailable", nargs=2, action="append", default=[], metavar=("NODE_ID", "LODGING_NAME"), help="Mark a lodging as not available.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    if arguments.command == "serve":
+        serve(arguments.excel_file, arguments.host, arguments.port, use_snapshot=not arguments.no_cache, player_state_path=arguments.state)
+    elif arguments.command == "update":
+        connected_nodes = {**{node_id: True for node_id in arguments.connect}, **{node_id: False for node_id in arguments.disconnect}}
+        available_lodgings = {
+            **{(int(node_id), lodging_name): True for node_id, lodging_name in arguments.available},
+            **{(int(node_id), lodging_name): False for node_id, lodging_name in arguments.unavailable},
+        }
+        print(json.dumps(update(connected_nodes, available_lodgings, arguments.host, arguments.port), indent=2))
+    else:
+        print(json.dumps(query(arguments.yield_names, arguments.combined, arguments.host, arguments.port), indent=2))
@@ -0,0 +1,416 @@
+import heapq
+import numpy as np
+import config
+from profiling import profiler
+
+class RoutedConnections:
+    """
+    The cheapest connections of some nodes found by a RegionRouter. It offers the parts of the ConnectionSolver
+    interface that NodeProcessor.process_yield reads, so routed results are formatted like any other.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph.
+        lodging_names (list): Name of the lodging used at each city or town.
+        lodging_cp_cost (ndarray): CP cost of the lodging used at each city or town.
+        total_cost (ndarray): Cheapest path CP plus lodging CP per routed node; inf for unreachable or unrouted nodes.
+        path_cost (ndarray): CP of the nodes on the cheapest path per routed node, lodging excluded.
+        root (ndarray): Dense index of the city or town each routed node's path ends at, or -1.
+    """
+
+    def __init__(self, node_graph, lodging_names, lodging_cp_cost):
+        """
+        Initializes an empty set of connections.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            lodging_names (list): Lodging name per node.
+            lodging_cp_cost (ndarray): Lodging CP cost per node.
+        """
+        self.node_graph = node_graph
+        self.lodging_names = lodging_names
+        self.lodging_cp_cost = lodging_cp_cost
+        self.total_cost = np.full(node_graph.node_count, np.inf)
+        self.path_cost = np.full(node_graph.node_count, np.inf)
+        self.root = np.full(node_graph.node_count, -1, dtype=np.int64)
+        self._paths = {}
+
+    def add(self, node_index, total_cost, path):
+        """
+        Records the cheapest connection of a node.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+            total_cost (float): Its cheapest path CP plus lodging CP, or inf when it cannot be connected.
+            path (list): Dense indices of the nodes on the path, ending at the city or town.
+        """
+        if total_cost == np.inf:
+            return
+        root_index = path[-1]
+        self.total_cost[node_index] = total_cost
+        self.path_cost[node_index] = total_cost - self.lodging_cp_cost[root_index]
+        self.root[node_index] = root_index
+        self._paths[node_index] = path
+
+    def is_reachable(self, node_index):
+        """
+        Returns whether a node was routed to a city or town.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            bool: True when a path to a city or town was found.
+        """
+        return self.root[node_index] >= 0
+
+    def path(self, node_index):
+        """
+        Returns the cheapest path of a routed node.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            list: Dense indices of the nodes on the path, starting at the node and ending at the city or town.
+        """
+        return self._paths.get(node_index, [node_index])
+
+    def lodging(self, node_index):
+        """
+        Returns the lodging used by a node's cheapest path.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+
+        Returns:
+            tuple: The lodging name and its CP cost.
+        """
+        root_index = self.root[node_index]
+        if root_index < 0:
+            return config.DEFAULT_NO_LODGING_NAME, config.DEFAULT_NO_LODGING_CP_COST
+        return self.lodging_names[root_index], self.lodging_cp_cost[root_index]
+
+
+class RegionRouter:
+    """
+    A hierarchical index over the node graph, partitioned by the "Node Region" column, that answers cheapest-connection
+    queries without searching the whole graph.
+
+    Entry nodes are the nodes reached by a connection from another region, and exit nodes the ones with a connection
+    into another region. For every entry node, a search restricted to its region precomputes its cost to every exit
+    node of the region (boundary-to-boundary) and to the region's cheapest city or town (boundary-to-city). Those
+    tables form a small overlay graph of entry nodes, on which one Dijkstra pass gives every entry node's cheapest
+    cost to any city or town. A query then searches the node's own region only, seeded with the region's cities and
+    towns and with its exit nodes priced through the overlay, so its cost grows with the size of the region rather
+    than of the graph. That search answers every node of the region and is remembered until the next update.
+
+    Queries can be restricted to a set of regions, in which case paths never leave them; the overlay pass is repeated
+    once per set of regions and remembered. Costs are the same as a ConnectionSolver's over the allowed regions, and
+    changes to some nodes only rebuild the tables of their regions.
+
+    Attributes:
+        node_graph (NodeGraph): The compiled node graph.
+        lodging_names (list): Name of the lodging used at each city or town.
+        lodging_cp_cost (ndarray): CP cost of the lodging used at each city or town.
+        region_names (list): The sorted region names.
+        region_of (ndarray): The position in region_names of each node's region.
+        region_nodes (list): Dense indices of the nodes of each region.
+        exit_targets (dict): Exit nodes mapped to the nodes of other regions they connect to.
+        region_tables (list): Per region, entry nodes mapped to their precomputed search.
+    """
+
+    def __init__(self, node_graph, node_regions, lodging_names=None, lodging_cp_cost=None):
+        """
+        Partitions the graph and precomputes the tables of every region.
+
+        Parameters:
+            node_graph (NodeGraph): The compiled node graph.
+            node_regions (list): The region name of each node, by dense index.
+            lodging_names (list, optional): Lodging name per node. Defaults to the node graph's lodging names.
+            lodging_cp_cost (ndarray, optional): Lodging CP cost per node. Defaults to the node graph's lodging costs.
+        """
+        self.node_graph = node_graph
+        self.lodging_names = node_graph.lodging_names if lodging_names is None else lodging_names
+        self.lodging_cp_cost = node_graph.lodging_cp_cost if lodging_cp_cost is None else lodging_cp_cost
+        self.region_names = sorted(set(node_regions))
+        position_of_region = {region_name: position for position, region_name in enumerate(self.region_names)}
+        self.region_of = np.array([position_of_region[region_name] for region_name in node_regions], dtype=np.int64)
+        self.region_nodes = [np.flatnonzero(self.region_of == region) for region in range(len(self.region_names))]
+
+        self._adjacency_offsets = node_graph.adjacency_offsets.tolist()
+        self._adjacency_indices = node_graph.adjacency_indices.tolist()
+        self._reverse_offsets = node_graph.reverse_offsets.tolist()
+        self._reverse_indices = node_graph.reverse_indices.tolist()
+        self._regions = self.region_of.tolist()
+        self.exit_targets = {}
+        self._entry_nodes = [set() for _ in self.region_names]
+        source_indices = np.repeat(np.arange(node_graph.node_count), np.diff(node_graph.adjacency_offsets))
+        crossing = self.region_of[source_indices] != self.region_of[node_graph.adjacency_indices]
+        for exit_index, entry_index in zip(source_indices[crossing].tolist(), node_graph.adjacency_indices[crossing].tolist()):
+            self.exit_targets.setdefault(exit_index, []).append(entry_index)
+            self._entry_nodes[self._regions[entry_index]].add(entry_index)
+
+        self.region_tables = [{} for _ in self.region_names]
+        self._overlays = {}
+        self._region_solutions = {}
+        self._node_costs = node_graph.connection_costs().tolist()
+        with profiler.span("region tables build"):
+            for region in range(len(self.region_names)):
+                self._build_region(region)
+
+    def _search(self, source_index):
+        """
+        Searches the region of a node for the cheapest paths to every node of that region.
+
+        Parameters:
+            source_index (int): The dense index of the node the paths start at.
+
+        Returns:
+            tuple: The path cost to each reached node, including both ends, the previous node on each path, the
+            cheapest city or town cost including its lodging and that city or town, and (cost, exit node) tuples for
+            every exit node reached.
+        """
+        region = self._regions[source_index]
+        node_costs = self._node_costs
+        adjacency_offsets, adjacency_indices, regions = self._adjacency_offsets, self._adjacency_indices, self._regions
+        costs = {source_index: node_costs[source_index]}
+        parents = {source_index: -1}
+        heap = [(costs[source_index], source_index)]
+        settled = set()
+        while heap:
+            current_cost, node_index = heapq.heappop(heap)
+            if node_index in settled:
+                continue
+            settled.add(node_index)
+            for next_index in adjacency_indices[adjacency_offsets[node_index]:adjacency_offsets[node_index + 1]]:
+                if regions[next_index] != region:
+                    continue
+                next_cost = current_cost + node_costs[next_index]
+                if next_cost < costs.get(next_index, np.inf):
+                    costs[next_index] = next_cost
+                    parents[next_index] = node_index
+                    heapq.heappush(heap, (next_cost, next_index))
+        profiler.count("nodes expanded", len(settled))
+
+        city_cost, city_index = np.inf, -1
+        for node_index in settled:
+            if self.node_graph.city_town_mask[node_index] and costs[node_index] + self.lodging_cp_cost[node_index] < city_cost:
+                city_cost, city_index = costs[node_index] + self.lodging_cp_cost[node_index], node_index
+        exits = [(costs[node_index], node_index) for node_index in settled if node_index in self.exit_targets]
+        return costs, parents, city_cost, city_index, exits
+
+    def _build_region(self, region):
+        """
+        Precomputes the searches of every entry node of a region.
+
+        Parameters:
+            region (int): The position of the region in region_names.
+        """
+        self.region_tables[region] = {entry_index: self._search(entry_index) for entry_index in sorted(self._entry_nodes[region])}
+
+    def update(self, changed_node_indices):
+        """
+        Rebuilds the tables of the regions holding nodes whose connection cost or lodging changed.
+
+        Parameters:
+            changed_node_indices (iterable): Dense indices of the changed nodes.
+
+        Returns:
+            list: The names of the rebuilt regions.
+        """
+        self._node_costs = self.node_graph.connection_costs().tolist()
+        changed_regions = sorted({self._regions[int(node_index)] for node_index in changed_node_indices})
+        with profiler.span("region tables build"):
+            for region in changed_regions:
+                self._build_region(region)
+        if changed_regions:
+            self.clear_solutions()
+        return [self.region_names[region] for region in changed_regions]
+
+    def clear_solutions(self):
+        """
+        Forgets the remembered overlay passes and region searches; they are recomputed by the next queries.
+        """
+        self._overlays.clear()
+        self._region_solutions.clear()
+
+    def resolve_regions(self, region_names):
+        """
+        Resolves region names case-insensitively: an exact match, otherwise the only region starting with the name,
+        e.g. "Balenos" for "Balenos Territory". Nodes without a region are never matched, and blank names are ignored.
+
+        Parameters:
+            region_names (iterable): The requested region names.
+
+        Returns:
+            tuple: The positions of the known regions, and the names that match no region or several.
+        """
+        position_of_region = {region_name.casefold(): position for position, region_name in enumerate(self.region_names) if region_name}
+        regions, unknown_names = set(), []
+        for region_name in region_names:
+            normalized_name = region_name.strip().casefold()
+            if not normalized_name:
+                continue
+            if normalized_name in position_of_region:
+                regions.add(position_of_region[normalized_name])
+                continue
+            prefix_matches = [position for name, position in position_of_region.items() if name.startswith(normalized_name)]
+            if len(prefix_matches) == 1:
+                regions.add(prefix_matches[0])
+            else:
+                unknown_names.append(region_name.strip())
+        return regions, unknown_names
+
+    def _overlay(self, allowed_regions):
+        """
+        Computes the cheapest cost from every entry node to a city or town over the overlay graph, using the
+        precomputed tables of the allowed regions only.
+
+        Parameters:
+            allowed_regions (frozenset): Positions of the allowed regions, or None for every region.
+
+        Returns:
+            tuple: Entry nodes mapped to their cheapest cost, and entry nodes mapped to how that cost is reached: the
+            city or town of their own region and -1, or the exit node taken and the entry node it leads to.
+        """
+        if allowed_regions not in self._overlays:
+            regions = range(len(self.region_names)) if allowed_regions is None else sorted(allowed_regions)
+            overlay_costs, choices, reverse_edges, heap = {}, {}, {}, []
+            for region in regions:
+                for entry_index, (_, _, city_cost, city_index, exits) in self.region_tables[region].items():
+                    if city_cost < np.inf:
+                        overlay_costs[entry_index] = city_cost
+                        choices[entry_index] = (city_index, -1)
+                        heap.append((city_cost, entry_index))
+                    for exit_cost, exit_index in exits:
+                        for next_entry_index in self.exit_targets[exit_index]:
+                            reverse_edges.setdefault(next_entry_index, []).append((entry_index, exit_cost, exit_index))
+            heapq.heapify(heap)
+            while heap:
+                current_cost, entry_index = heapq.heappop(heap)
+                if current_cost > overlay_costs[entry_index]:
+                    continue
+                for previous_entry_index, exit_cost, exit_index in reverse_edges.get(entry_index, []):
+                    candidate_cost = exit_cost + current_cost
+                    if candidate_cost < overlay_costs.get(previous_entry_index, np.inf):
+                        overlay_costs[previous_entry_index] = candidate_cost
+                        choices[previous_entry_index] = (exit_index, entry_index)
+                        heapq.heappush(heap, (candidate_cost, previous_entry_index))
+            self._overlays[allowed_regions] = (overlay_costs, choices)
+        return self._overlays[allowed_regions]
+
+    @staticmethod
+    def _segment(parents, end_index):
+        """
+        Follows the previous nodes of a search back from a node to where the search started.
+
+        Parameters:
+            parents (dict): The previous node on each path of the search.
+            end_index (int): The node the segment ends at.
+
+        Returns:
+            list: Dense indices from the search's start node to end_index.
+        """
+        segment = [end_index]
+        while parents[segment[-1]] >= 0:
+            segment.append(parents[segment[-1]])
+        return segment[::-1]
+
+    def _solve_region(self, region, allowed_regions):
+        """
+        Computes the cheapest connection of every node of a region in one search over the region's reverse
+        connections, seeded with its cities and towns and with its exit nodes, each priced through the overlay.
+        Solutions are remembered until the next update.
+
+        Parameters:
+            region (int): The position of the region in region_names.
+            allowed_regions (frozenset): Positions of the regions paths may use, or None for every region.
+
+        Returns:
+            tuple: Nodes of the region mapped to their cheapest cost, to the next node of their path inside the
+            region (-1 at a seed), and seeds mapped to how their path ends: the city or town itself and -1, or the
+            exit node and the entry node it leads to.
+        """
+        if (region, allowed_regions) not in self._region_solutions:
+            overlay_costs, _ = self._overlay(allowed_regions)
+            node_costs, regions = self._node_costs, self._regions
+            reverse_offsets, reverse_indices = self._reverse_offsets, self._reverse_indices
+            costs, next_nodes, seed_choices = {}, {}, {}
+            for node_index in self.region_nodes[region].tolist():
+                best_cost, best_choice = np.inf, None
+                if self.node_graph.city_town_mask[node_index]:
+                    best_cost, best_choice = node_costs[node_index] + self.lodging_cp_cost[node_index], (node_index, -1)
+                for next_entry_index in self.exit_targets.get(node_index, []):
+                    candidate_cost = node_costs[node_index] + overlay_costs.get(next_entry_index, np.inf)
+                    if candidate_cost < best_cost:
+                        best_cost, best_choice = candidate_cost, (node_index, next_entry_index)
+                if best_cost < np.inf:
+                    costs[node_index], next_nodes[node_index], seed_choices[node_index] = best_cost, -1, best_choice
+            heap = [(node_cost, node_index) for node_index, node_cost in costs.items()]
+            heapq.heapify(heap)
+            settled = set()
+            while heap:
+                current_cost, node_index = heapq.heappop(heap)
+                if node_index in settled:
+                    continue
+                settled.add(node_index)
+                for previous_index in reverse_indices[reverse_offsets[node_index]:reverse_offsets[node_index + 1]]:
+                    if regions[previous_index] != region:
+                        continue
+                    previous_cost = current_cost + node_costs[previous_index]
+                    if previous_cost < costs.get(previous_index, np.inf):
+                        costs[previous_index] = previous_cost
+                        next_nodes[previous_index] = node_index
+                        heapq.heappush(heap, (previous_cost, previous_index))
+            profiler.count("nodes expanded", len(settled))
+            self._region_solutions[(region, allowed_regions)] = (costs, next_nodes, seed_choices)
+        return self._region_solutions[(region, allowed_regions)]
+
+    def route(self, node_index, allowed_regions=None):
+        """
+        Finds the cheapest connection of one node to a city or town.
+
+        Parameters:
+            node_index (int): The dense index of the node.
+            allowed_regions (frozenset, optional): Positions of the regions paths may use. Defaults to every region.
+
+        Returns:
+            tuple: The path CP plus lodging CP, or inf when no city or town can be reached, and the dense indices of
+            the nodes on the path, ending at the city or town.
+        """
+        node_index = int(node_index)
+        region = self._regions[node_index]
+        if allowed_regions is not None and region not in allowed_regions:
+            return np.inf, [node_index]
+        costs, next_nodes, seed_choices = self._solve_region(region, allowed_regions)
+        if node_index not in costs:
+            return np.inf, [node_index]
+
+        # Follow the path inside the node's region to its seed, then the overlay choice of each entry node after it.
+        path = [node_index]
+        while next_nodes[path[-1]] >= 0:
+            path.append(next_nodes[path[-1]])
+        _, next_entry_index = seed_choices[path[-1]]
+        if next_entry_index >= 0:
+            _, choices = self._overlay(allowed_regions)
+            while next_entry_index >= 0:
+                end_index, following_entry_index = choices[next_entry_index]
+                path.extend(self._segment(self.region_tables[self._regions[next_entry_index]][next_entry_index][1], end_index))
+                next_entry_index = following_entry_index
+        return costs[node_index], path
+
+    def connections(self, node_indices, allowed_regions=None):
+        """
+        Finds the cheapest connections of several nodes.
+
+        Parameters:
+            node_indices (iterable): Dense indices of the nodes.
+            allowed_regions (frozenset, optional): Positions of the regions paths may use. Defaults to every region.
+
+        Returns:
+            RoutedConnections: The connections, usable in place of a ConnectionSolver for these nodes.
+        """
+        routed_connections = RoutedConnections(self.node_graph, self.lodging_names, self.lodging_cp_cost)
+        for node_index in np.asarray(node_indices).tolist():
+            routed_connections.add(node_index, *self.route(node_index, allowed_regions))
+        return routed_connections
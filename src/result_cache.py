@@ -0,0 +1,257 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import config
+from profiling import profiler
+
+class ResultCache:
+    """
+    Remembers processing results across queries and runs, in two tiers: an in-memory LRU of the most recent entries
+    and a directory of pickle files on disk.
+
+    Keys are hashes of everything a result depends on, so entries never need to be invalidated; a changed workbook
+    or player state simply produces new keys. Disk entries are written through a temporary file and an atomic rename,
+    so several processes can share the directory, and a reader never sees a half-written entry. Every disk hit
+    refreshes the entry's modification time, and once the directory grows past its size limit the entries used
+    least recently are removed.
+
+    Attributes:
+        cache_directory (str): The directory holding the disk entries, or None to keep entries in memory only.
+        memory_entries (int): The number of entries kept in memory.
+        disk_bytes (int): The size the disk entries are trimmed to.
+        memory_hits (int): Lookups answered from memory.
+        disk_hits (int): Lookups answered from disk.
+        misses (int): Lookups that found nothing.
+    """
+
+    # Returned by get when a key is not cached, as None is a valid cached result.
+    MISSING = object()
+
+    def __init__(self, cache_directory=config.RESULT_CACHE_DIRECTORY, memory_entries=config.RESULT_CACHE_MEMORY_ENTRIES, disk_bytes=config.RESULT_CACHE_DISK_BYTES):
+        """
+        Initializes the cache.
+
+        Parameters:
+            cache_directory (str, optional): The directory holding the disk entries, or None for memory only. Defaults to config.RESULT_CACHE_DIRECTORY.
+            memory_entries (int, optional): The number of entries kept in memory. Defaults to config.RESULT_CACHE_MEMORY_ENTRIES.
+            disk_bytes (int, optional): The size the disk entries are trimmed to. Defaults to config.RESULT_CACHE_DISK_BYTES.
+        """
+        self.cache_directory = cache_directory
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk_usage = None  # Bytes on disk, counted on the first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """
+        Builds a cache key from the values a result depends on.
+
+        Parameters:
+            *parts: JSON-serializable values, e.g. the workbook hash, the state hash and the yield name.
+
+        Returns:
+            str: The hexadecimal key.
+        """
+        return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key, default=None):
+        """
+        Looks up an entry, first in memory and then on disk.
+
+        Parameters:
+            key (str): A key built by ResultCache.key.
+            default (optional): Returned when the key is not cached, e.g. ResultCache.MISSING. Defaults to None.
+
+        Returns:
+            The cached value, or default.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                profiler.count("result cache hits")
+                return self._memory[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is self.MISSING:
+                self.misses += 1
+                profiler.count("result cache misses")
+                return default
+            self.disk_hits += 1
+            profiler.count("result cache hits")
+            self._remember(key, value)
+            return value
+
+    def put(self, key, value):
+        """
+        Stores an entry in memory and on disk.
+
+        Parameters:
+            key (str): A key built by ResultCache.key.
+            value: Any picklable value.
+        """
+        with self._lock:
+            self._remember(key, value)
+        if self.cache_directory is None:
+            return
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            os.makedirs(self.cache_directory, exist_ok=True)
+            entry_path = self._entry_path(key)
+            temporary_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "wb") as temporary_file:
+                temporary_file.write(payload)
+            os.replace(temporary_path, entry_path)
+        except (OSError, pickle.PicklingError) as error:
+            logging.debug(f'Could not write result cache entry {key}: {error}')
+            return
+        with self._lock:
+            if self._disk_usage is None:
+                self._disk_usage = self._scan_disk_usage()
+            else:
+                self._disk_usage += len(payload)
+            if self._disk_usage > self.disk_bytes:
+                self._disk_usage = self._evict()
+
+    def stats(self):
+        """
+        Returns the hit and miss counters.
+
+        Returns:
+            dict: The counters memory_hits, disk_hits, misses and the number of entries held in memory.
+        """
+        with self._lock:
+            return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+    def clear(self):
+        """
+        Drops every entry, in memory and on disk.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._disk_usage = 0
+            for entry_path, _, _ in self._disk_entries():
+                self._remove(entry_path)
+
+    def _remember(self, key, value):
+        """
+        Adds an entry to the in-memory tier, dropping the least recently used one when it is full. The lock must be held.
+
+        Parameters:
+            key (str): The key.
+            value: The value.
+        """
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _entry_path(self, key):
+        """
+        Returns the path of a disk entry.
+
+        Parameters:
+            key (str): The key.
+
+        Returns:
+            str: The entry's file path.
+        """
+        return os.path.join(self.cache_directory, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        """
+        Reads an entry from disk and refreshes its modification time.
+
+        Parameters:
+            key (str): The key.
+
+        Returns:
+            The stored value, or ResultCache.MISSING when the entry is missing or unreadable.
+        """
+        if self.cache_directory is None:
+            return self.MISSING
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as entry_file:
+                value = pickle.load(entry_file)
+        except FileNotFoundError:
+            return self.MISSING
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as error:
+            logging.debug(f'Discarding unreadable result cache entry {entry_path}: {error}')
+            self._remove(entry_path)
+            return self.MISSING
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return value
+
+    def _disk_entries(self):
+        """
+        Lists the disk entries. Entries removed by another process while listing are skipped.
+
+        Returns:
+            list: Tuples of (path, size, modification time).
+        """
+        if self.cache_directory is None or not os.path.isdir(self.cache_directory):
+            return []
+        disk_entries = []
+        for file_name in os.listdir(self.cache_directory):
+            if not file_name.endswith(".pkl"):
+                continue
+            entry_path = os.path.join(self.cache_directory, file_name)
+            try:
+                entry_stat = os.stat(entry_path)
+            except FileNotFoundError:
+                continue
+            disk_entries.append((entry_path, entry_stat.st_size, entry_stat.st_mtime_ns))
+        return disk_entries
+
+    def _scan_disk_usage(self):
+        """
+        Returns the total size of the disk entries.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict(self):
+        """
+        Removes the least recently used disk entries until the directory fits in its size limit.
+
+        Returns:
+            int: The size of the remaining entries in bytes.
+        """
+        disk_entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        disk_usage = sum(size for _, size, _ in disk_entries)
+        for entry_path, size, _ in disk_entries:
+            if disk_usage <= self.disk_bytes:
+                break
+            self._remove(entry_path)
+            disk_usage -= size
+            profiler.count("result cache evictions")
+        return disk_usage
+
+    @staticmethod
+    def _remove(entry_path):
+        """
+        Removes a disk entry, ignoring entries another process already removed.
+
+        Parameters:
+            entry_path (str): The entry's file path.
+        """
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
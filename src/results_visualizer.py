@@ -1,37 +1,22 @@
+import io
 import os
+import re
 import webbrowser
 import html
 import config
+from profiling import profiler
+from visited_path import VisitedPath
 
 class ResultsVisualizer:
     """
     Provides functionality for visualizing node processing results, both in the console and as an HTML document.
-    """
-
-    @staticmethod
-    def print_console_output(all_yield_results):
-        """
-        Prints the node processing results for each yield to the console.
-        
-        Parameters:
-            all_yield_results (list): A list of tuples, each containing a yield name and a DataFrame with the results for that yield.
-        """
-        for yield_name, node_results_dataframe in all_yield_results:
-            print(f"Node Processing Results for Yield: {yield_name}\n")
-            print(node_results_dataframe.to_string(index=False), "\n")
-
-    @staticmethod
-    def generate_html_output(all_yield_results):
-        """
-        Generates an HTML document string that visualizes the node processing results.
 
-        Parameters:
-            all_yield_results (list): A list of tuples, each containing a yield name and a DataFrame with the results for that yield.
+    The HTML report is written as a stream: the page header first, then one section per yield, each of which adds
+    its own tab button, so only one yield's output is held in memory at a time. Rows beyond the first page of a
+    table are wrapped in <template> elements and only rendered by the browser when their page is opened.
+    """
 
-        Returns:
-            str: A string containing the HTML document for visualizing the results.
-        """
-        html_output = """
+    HTML_HEADER = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -48,22 +33,26 @@ class ResultsVisualizer:
             .table th, .table td { text-align: left; padding: 8px; }
             .table th { background-color: #f2f2f2; }
             .highlight { background-color: lightblue; } /* CSS class for highlighting */
+            .pager { margin-top: 8px; }
+            .pager button { margin-right: 4px; }
+            .pager button.active { font-weight: bold; }
             ul { padding-left: 20px; } /* Style for bullet points */
             li { margin-bottom: 5px; } /* Space between items */
         </style>
     </head>
     <body>
 
-    <div class='tab'>
-    """
-        for yield_name, _ in all_yield_results:
-            escaped_yield_name = html.escape(yield_name)  # Escape special characters in yield names
-            html_output += f"<button class='tablinks' onclick='openYield(event, \"{escaped_yield_name}\")'>{escaped_yield_name}</button>\n"
-        html_output += "</div>\n"
+    <div class='tab' id='tabs'></div>
 
-        html_output += """
     <script>
-    function openYield(evt, yieldName) {
+    function addYieldTab(sectionId, yieldName) {
+    var button = document.createElement('button');
+    button.className = 'tablinks';
+    button.textContent = yieldName;
+    button.onclick = function(evt) { openYield(evt, sectionId); };
+    document.getElementById('tabs').appendChild(button);
+    }
+    function openYield(evt, sectionId) {
     var i, tabcontent, tablinks;
     tabcontent = document.getElementsByClassName("tabcontent");
     for (i = 0; i < tabcontent.length; i++) {
@@ -73,65 +62,247 @@ class ResultsVisualizer:
     for (i = 0; i < tablinks.length; i++) {
         tablinks[i].className = tablinks[i].className.replace(" active", "");
     }
-    document.getElementById(yieldName).style.display = "block";
+    document.getElementById(sectionId).style.display = "block";
     evt.currentTarget.className += " active";
-    highlightCP(); /* Call highlight function whenever a tab is opened */
+    }
+    function openPage(sectionId, page) {
+    var section = document.getElementById(sectionId);
+    var body = section.querySelector('tbody');
+    if (!section.querySelector('template[data-page="1"]')) { // Keep the initially rendered rows as page 1
+        var firstPage = document.createElement('template');
+        firstPage.setAttribute('data-page', '1');
+        firstPage.innerHTML = body.innerHTML;
+        section.appendChild(firstPage);
+    }
+    var template = section.querySelector('template[data-page="' + page + '"]');
+    body.innerHTML = '';
+    body.appendChild(template.content.cloneNode(true));
+    var buttons = section.querySelectorAll('.pager button');
+    for (var i = 0; i < buttons.length; i++) {
+        buttons[i].className = (i + 1 === page) ? 'active' : '';
+    }
     }
     </script>
     """
 
-        for yield_name, node_results_dataframe in all_yield_results:
-            escaped_yield_name = html.escape(yield_name)  # Escape special characters in yield names
-            # Disabling escaping for the whole table and manually escaping other content
-            html_table = node_results_dataframe.to_html(index=False, escape=False, classes="table", border=0, formatters={
-                "Visited Nodes Info": lambda x: '<ul>' + ''.join(f'<li>{item.strip()}</li>' for item in x.split(',')) + '</ul>'
-            })
-            html_output += f"<div id='{escaped_yield_name}' class='tabcontent'><h3>{escaped_yield_name}</h3>{html_table}</div>\n"
-
-        html_output += """
+    HTML_FOOTER = """
     <script>
-    document.getElementsByClassName('tablinks')[0].click(); // Activate the first tab initially
-
-    function highlightCP() {
-        var regex = /(?:^|<li>)([^<]*?\\(ID: \\d+ - CP: \\*0\\.0 CP\\))/g; // Updated regex for list items
-        var ulElements = document.querySelectorAll('.table ul');
-        ulElements.forEach(function(ul) {
-            var liElements = ul.children;
-            for (let li of liElements) {
-                var match = regex.exec(li.innerHTML);
-                if (match) {
-                    li.classList.add('highlight');
-                }
-                regex.lastIndex = 0; // Reset regex after each check
-            }
-        });
-    }
-    window.onload = highlightCP;
+    var firstTab = document.getElementsByClassName('tablinks')[0];
+    if (firstTab) { firstTab.click(); } // Activate the first tab initially
     </script>
     </body>
     </html>
     """
-        return html_output
+
+    @staticmethod
+    def print_console_output(all_yield_results):
+        """
+        Prints the node processing results for each yield to the console.
+
+        Parameters:
+            all_yield_results (list): A list of tuples, each containing a yield name and a DataFrame with the results for that yield.
+        """
+        for yield_name, node_results_dataframe in all_yield_results:
+            print(f"Node Processing Results for Yield: {yield_name}\n")
+            print(node_results_dataframe.to_string(index=False), "\n")
+
+    @staticmethod
+    def stream_console_output(all_yield_results):
+        """
+        Prints the node processing results for each yield to the console as it passes through, e.g. on its way into
+        save_html_report, so a generator of results is only consumed once.
+
+        Parameters:
+            all_yield_results (iterable): Tuples of a yield name and a DataFrame with the results for that yield; may be a generator.
+
+        Yields:
+            tuple: Each yield name and DataFrame, unchanged.
+        """
+        for yield_name, node_results_dataframe in all_yield_results:
+            ResultsVisualizer.print_console_output([(yield_name, node_results_dataframe)])
+            yield yield_name, node_results_dataframe
+
+    @staticmethod
+    def generate_html_output(all_yield_results):
+        """
+        Generates an HTML document string that visualizes the node processing results.
+
+        Parameters:
+            all_yield_results (list): A list of tuples, each containing a yield name and a DataFrame with the results for that yield.
+
+        Returns:
+            str: A string containing the HTML document for visualizing the results.
+        """
+        html_buffer = io.StringIO()
+        ResultsVisualizer.write_html_report(all_yield_results, html_buffer)
+        return html_buffer.getvalue()
+
+    @staticmethod
+    def write_html_report(all_yield_results, html_sink):
+        """
+        Streams the HTML report to a file-like sink, one yield at a time.
+
+        Parameters:
+            all_yield_results (iterable): Tuples of a yield name and a DataFrame with the results for that yield; may be a generator.
+            html_sink (file-like): Any object with a write method accepting strings.
+        """
+        with profiler.span("html render"):
+            html_sink.write(ResultsVisualizer.HTML_HEADER)
+            for section_number, (yield_name, node_results_dataframe) in enumerate(all_yield_results):
+                ResultsVisualizer.write_yield_section(html_sink, f"yield-{section_number}", yield_name, node_results_dataframe)
+            html_sink.write(ResultsVisualizer.HTML_FOOTER)
+
+    @staticmethod
+    def write_yield_section(html_sink, section_id, yield_name, node_results_dataframe):
+        """
+        Writes the tab and table of one yield. The first page of rows is rendered directly; later pages are
+        written into <template> elements behind a pager.
+
+        Parameters:
+            html_sink (file-like): Any object with a write method accepting strings.
+            section_id (str): The HTML id of the section.
+            yield_name (str): The yield name shown on the tab.
+            node_results_dataframe (DataFrame): The results for the yield.
+        """
+        escaped_yield_name = html.escape(yield_name)  # Escape special characters in yield names
+        html_sink.write(f"<div id='{section_id}' class='tabcontent'><h3>{escaped_yield_name}</h3>\n")
+        html_sink.write(f"<script>addYieldTab('{section_id}', {ResultsVisualizer._js_string(yield_name)});</script>\n")
+        html_sink.write("<table class='table'><thead><tr>")
+        for column_name in node_results_dataframe.columns:
+            html_sink.write(f"<th>{html.escape(str(column_name))}</th>")
+        html_sink.write("</tr></thead><tbody>\n")
+
+        page_size = config.HTML_TABLE_PAGE_SIZE
+        page_count = max((len(node_results_dataframe) + page_size - 1) // page_size, 1)
+        for row_number, row_values in enumerate(node_results_dataframe.itertuples(index=False, name=None)):
+            if row_number and row_number % page_size == 0:
+                html_sink.write("</tbody>\n" if row_number == page_size else "</template>\n")
+                html_sink.write(f"<template data-page='{row_number // page_size + 1}'>\n")
+            html_sink.write("<tr>")
+            for column_name, cell_value in zip(node_results_dataframe.columns, row_values):
+                if column_name == "Visited Nodes Info":
+                    cell_html = ResultsVisualizer._visited_nodes_html(cell_value)
+                else:
+                    cell_html = html.escape(str(cell_value))
+                html_sink.write(f"<td>{cell_html}</td>")
+            html_sink.write("</tr>\n")
+
+        if page_count == 1:
+            html_sink.write("</tbody></table>\n")
+        else:
+            html_sink.write("</template>\n</table>\n")
+            html_sink.write("<div class='pager'>")
+            for page in range(1, page_count + 1):
+                html_sink.write(f"<button class='{'active' if page == 1 else ''}' onclick=\"openPage('{section_id}', {page})\">{page}</button>")
+            html_sink.write("</div>\n")
+        html_sink.write("</div>\n")
+
+    @staticmethod
+    def _visited_nodes_html(visited_nodes_info):
+        """
+        Renders the visited nodes of one result as a bullet list, highlighting nodes that are already connected.
+
+        Parameters:
+            visited_nodes_info (VisitedPath): The visited nodes; formatted text is split apart as a fallback.
+
+        Returns:
+            str: The HTML of the list.
+        """
+        list_items = []
+        if isinstance(visited_nodes_info, VisitedPath):
+            for node_name, node_id, node_cp_cost, is_connected in visited_nodes_info.entries():
+                item_text = html.escape(VisitedPath.format_entry(node_name, node_id, node_cp_cost, is_connected))
+                list_items.append(f"<li class='highlight'>{item_text}</li>" if is_connected else f"<li>{item_text}</li>")
+        else:
+            for item in re.split(r"(?<=\)), ", str(visited_nodes_info)):
+                item_text = html.escape(item.strip())
+                list_items.append(f"<li class='highlight'>{item_text}</li>" if "CP: *0.0 CP)" in item else f"<li>{item_text}</li>")
+        return "<ul>" + "".join(list_items) + "</ul>"
+
+    @staticmethod
+    def _js_string(text):
+        """
+        Encodes text as a JavaScript string literal that is safe inside an HTML <script> element.
+
+        Parameters:
+            text (str): The text to encode.
+
+        Returns:
+            str: The string literal.
+        """
+        escaped_text = str(text).replace("\\", "\\\\").replace("'", "\\'").replace("<", "\\x3c").replace(">", "\\x3e").replace("\n", "\\n")
+        return f"'{escaped_text}'"
 
     @staticmethod
     def save_and_open_html(html_output, file_name=config.DEFAULT_HTML_FILE_NAME):
         """
         Saves the generated HTML output to a file and opens it in a web browser.
-        
+
         Parameters:
             html_output (str): The HTML document as a string.
             file_name (str, optional): The name of the file to save the HTML document as. Defaults to config.DEFAULT_HTML_FILE_NAME.
         """
+        ResultsVisualizer.save_html(html_output, file_name)
+        ResultsVisualizer.open_html(file_name)
+
+    @staticmethod
+    def save_html(html_output, file_name=config.DEFAULT_HTML_FILE_NAME):
+        """
+        Saves the generated HTML output to a file in the output directory.
+
+        Parameters:
+            html_output (str): The HTML document as a string.
+            file_name (str, optional): The name of the file to save the HTML document as. Defaults to config.DEFAULT_HTML_FILE_NAME.
+
+        Returns:
+            str: The absolute path of the saved file.
+        """
+        return ResultsVisualizer.save_html_report(None, file_name, html_output)
+
+    @staticmethod
+    def save_html_report(all_yield_results, file_name=config.DEFAULT_HTML_FILE_NAME, html_output=None):
+        """
+        Streams the HTML report straight into a file in the output directory. The report is written to a temporary
+        file first and then moved into place, so a browser never sees a half-written report; it is removed again if
+        writing fails.
+
+        Parameters:
+            all_yield_results (iterable): Tuples of a yield name and a DataFrame with the results for that yield; may be a generator.
+            file_name (str, optional): The name of the file to save the HTML document as. Defaults to config.DEFAULT_HTML_FILE_NAME.
+            html_output (str, optional): An already rendered document to save instead of all_yield_results.
+
+        Returns:
+            str: The absolute path of the saved file.
+        """
         output_directory = os.path.abspath(config.OUTPUT_DIRECTORY)
         file_path = os.path.join(output_directory, file_name)
-        
+
         # Create the output directory if it doesn't exist
         if not os.path.exists(output_directory):
             os.makedirs(output_directory)
-        
+
         # Save the HTML content to the file
-        with open(file_path, "w") as f:
-            f.write(html_output)
-        
-        # Open the file in the default web browser
+        temporary_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            with profiler.span("html write"), open(temporary_path, "w", encoding="utf-8") as f:
+                if html_output is not None:
+                    f.write(html_output)
+                else:
+                    ResultsVisualizer.write_html_report(all_yield_results, f)
+        except BaseException:
+            # E.g. a generator of results that failed or was cancelled half-way; the previous report stays in place.
+            os.remove(temporary_path)
+            raise
+        os.replace(temporary_path, file_path)
+        return file_path
+
+    @staticmethod
+    def open_html(file_name=config.DEFAULT_HTML_FILE_NAME):
+        """
+        Opens a saved HTML file from the output directory in a web browser.
+
+        Parameters:
+            file_name (str, optional): The name of the saved HTML file. Defaults to config.DEFAULT_HTML_FILE_NAME.
+        """
+        file_path = os.path.join(os.path.abspath(config.OUTPUT_DIRECTORY), file_name)
         webbrowser.open("file://" + file_path, new=config.WEBBROWSER_NEW_TAB)  # new=2 opens in a new tab, if possible
@@ -0,0 +1,232 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import config
+
+class WorkbookSnapshot:
+    """
+    Stores the parsed sheets of an Excel workbook as binary pickle files, so that later runs can skip the
+    openpyxl parse while the workbook is unchanged.
+
+    Each workbook gets its own directory inside the cache directory, named after a hash of its absolute path.
+    The directory holds one pickle file per snapshot entry and a manifest recording the workbook's size,
+    modification time and SHA-256 content hash. An entry is either a whole sheet, named after the sheet, or a
+    projected and typed view of a sheet, named by the caller. A snapshot is valid when the size and modification
+    time still match, or, when only the modification time changed, when the content hash still matches.
+
+    Attributes:
+        workbook_path (str): The absolute path to the Excel workbook.
+        snapshot_directory (str): The directory holding this workbook's snapshot files.
+        manifest_path (str): The path to the snapshot manifest.
+    """
+
+    MANIFEST_FILE_NAME = "manifest.json"
+
+    def __init__(self, workbook_path, cache_directory=None):
+        """
+        Initializes the snapshot for a workbook.
+
+        Parameters:
+            workbook_path (str): The path to the Excel workbook.
+            cache_directory (str, optional): The directory snapshots are stored in. Defaults to config.SNAPSHOT_DIRECTORY.
+        """
+        self.workbook_path = os.path.abspath(workbook_path)
+        path_digest = hashlib.sha1(self.workbook_path.encode("utf-8")).hexdigest()[:16]
+        self.snapshot_directory = os.path.join(cache_directory or config.SNAPSHOT_DIRECTORY, path_digest)
+        self.manifest_path = os.path.join(self.snapshot_directory, self.MANIFEST_FILE_NAME)
+
+    def content_hash(self):
+        """
+        Computes the SHA-256 hash of the workbook's contents.
+
+        Returns:
+            str: The hexadecimal content hash.
+        """
+        digest = hashlib.sha256()
+        with open(self.workbook_path, "rb") as workbook_file:
+            for chunk in iter(lambda: workbook_file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def read_manifest(self):
+        """
+        Reads the snapshot manifest.
+
+        Returns:
+            dict: The manifest, or None if it is missing, unreadable or written by another snapshot format version.
+        """
+        try:
+            with open(self.manifest_path, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format_version") != config.SNAPSHOT_FORMAT_VERSION or manifest.get("workbook_path") != self.workbook_path:
+            return None
+        return manifest
+
+    def read_valid_manifest(self):
+        """
+        Reads the manifest and checks that the snapshot still matches the workbook on disk. If only the
+        modification time changed but the contents are identical, the manifest is refreshed so the next check
+        is a plain stat.
+
+        Returns:
+            dict: The manifest, or None when the snapshot cannot be used in place of the workbook.
+        """
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+        try:
+            workbook_stat = os.stat(self.workbook_path)
+        except OSError:
+            return None
+        if workbook_stat.st_size != manifest["size"]:
+            return None
+        if workbook_stat.st_mtime_ns == manifest["mtime_ns"]:
+            return manifest
+        if self.content_hash() != manifest["content_hash"]:
+            return None
+        manifest["mtime_ns"] = workbook_stat.st_mtime_ns
+        self._write_atomic(self.manifest_path, json.dumps(manifest).encode("utf-8"))
+        return manifest
+
+    def current_content_hash(self):
+        """
+        Returns the workbook's content hash, taken from a valid manifest when possible so the file is only read
+        when it has changed.
+
+        Returns:
+            str: The hexadecimal content hash.
+        """
+        manifest = self.read_valid_manifest()
+        return manifest["content_hash"] if manifest is not None else self.content_hash()
+
+    def is_valid(self):
+        """
+        Checks whether the snapshot still matches the workbook on disk.
+
+        Returns:
+            bool: True when the snapshot can be used in place of the workbook.
+        """
+        return self.read_valid_manifest() is not None
+
+    def new_manifest(self):
+        """
+        Creates an empty manifest describing the workbook as it currently is on disk.
+
+        Returns:
+            dict: A manifest without any entries.
+        """
+        workbook_stat = os.stat(self.workbook_path)
+        return {
+            "format_version": config.SNAPSHOT_FORMAT_VERSION,
+            "workbook_path": self.workbook_path,
+            "size": workbook_stat.st_size,
+            "mtime_ns": workbook_stat.st_mtime_ns,
+            "content_hash": self.content_hash(),
+            "entries": {},
+            "workbook_sheets": None,
+        }
+
+    def load_entry(self, manifest, entry_name):
+        """
+        Loads a single entry of a validated snapshot.
+
+        Parameters:
+            manifest (dict): A manifest returned by read_valid_manifest.
+            entry_name (str): The name of the entry to load.
+
+        Returns:
+            DataFrame: The stored DataFrame, or None when the entry is missing or unreadable.
+        """
+        file_name = manifest["entries"].get(entry_name)
+        if file_name is None:
+            return None
+        try:
+            with open(os.path.join(self.snapshot_directory, file_name), "rb") as entry_file:
+                return pickle.load(entry_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as error:
+            logging.debug(f'Discarding unreadable snapshot entry {entry_name} in {self.snapshot_directory}: {error}')
+            return None
+
+    def save_entries(self, entries, manifest=None, workbook_sheets=None):
+        """
+        Writes entries to the snapshot. Entries are added to the given manifest when it is still valid;
+        otherwise a new manifest is started and entries of the previous workbook version are removed.
+        The manifest is written last, so an interrupted save never exposes a half-written entry.
+
+        Parameters:
+            entries (dict): Entry names mapped to DataFrames.
+            manifest (dict, optional): A manifest returned by read_valid_manifest. Defaults to starting a new one.
+            workbook_sheets (list, optional): Names of all sheets of the workbook, when entries holds all of them.
+
+        Returns:
+            dict: The manifest that was written.
+        """
+        os.makedirs(self.snapshot_directory, exist_ok=True)
+        if manifest is None:
+            self.invalidate()
+            manifest = self.new_manifest()
+        for entry_name, entry_data in entries.items():
+            file_name = hashlib.sha1(entry_name.encode("utf-8")).hexdigest()[:16] + ".pkl"
+            self._write_atomic(os.path.join(self.snapshot_directory, file_name), pickle.dumps(entry_data, protocol=pickle.HIGHEST_PROTOCOL))
+            manifest["entries"][entry_name] = file_name
+        if workbook_sheets is not None:
+            manifest["workbook_sheets"] = list(workbook_sheets)
+        self._write_atomic(self.manifest_path, json.dumps(manifest).encode("utf-8"))
+        return manifest
+
+    def load(self):
+        """
+        Loads all sheets of the workbook from the snapshot, if it is valid and holds the whole workbook.
+
+        Returns:
+            dict: Sheet names mapped to DataFrames, or None when the snapshot is missing, stale or incomplete.
+        """
+        manifest = self.read_valid_manifest()
+        if manifest is None or manifest["workbook_sheets"] is None:
+            return None
+        sheets = {}
+        for sheet_name in manifest["workbook_sheets"]:
+            sheets[sheet_name] = self.load_entry(manifest, sheet_name)
+            if sheets[sheet_name] is None:
+                return None
+        return sheets
+
+    def save(self, sheets):
+        """
+        Writes all sheets of the workbook to the snapshot.
+
+        Parameters:
+            sheets (dict): Sheet names mapped to DataFrames.
+        """
+        self.save_entries(sheets, self.read_valid_manifest(), workbook_sheets=sheets.keys())
+
+    def invalidate(self):
+        """
+        Removes the snapshot manifest and its entry files so the snapshot is no longer used.
+        """
+        try:
+            os.remove(self.manifest_path)
+        except FileNotFoundError:
+            pass
+        if os.path.isdir(self.snapshot_directory):
+            for file_name in os.listdir(self.snapshot_directory):
+                if file_name.endswith(".pkl"):
+                    os.remove(os.path.join(self.snapshot_directory, file_name))
+
+    @staticmethod
+    def _write_atomic(file_path, payload):
+        """
+        Writes bytes to a file through a temporary file and an atomic rename.
+
+        Parameters:
+            file_path (str): The destination path.
+            payload (bytes): The contents to write.
+        """
+        temporary_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as temporary_file:
+            temporary_file.write(payload)
+        os.replace(temporary_path, file_path)
@@ -0,0 +1,125 @@
+import numpy as np
+
+class VisitedPath:
+    """
+    The nodes visited by one connection plan, stored as compact per-hop arrays instead of a formatted string.
+
+    Results keep a VisitedPath in their "Visited Nodes Info" column, and it is only formatted for display when it
+    is converted to a string, e.g. by DataFrame.to_string. The HTML report reads entries() and JSON exports read
+    to_records(), so neither has to parse the text back apart.
+
+    Attributes:
+        node_ids (ndarray): Node ID per hop, from the node to the city or town.
+        node_names (tuple): Node name per hop.
+        cp_costs (ndarray): CP cost per hop, as listed on the sheet.
+        connected (ndarray): True for hops that are already connected and cost nothing.
+    """
+
+    __slots__ = ("node_ids", "node_names", "cp_costs", "connected")
+
+    def __init__(self, node_ids, node_names, cp_costs, connected):
+        """
+        Initializes the path from per-hop values.
+
+        Parameters:
+            node_ids (array-like): Node ID per hop.
+            node_names (iterable): Node name per hop.
+            cp_costs (array-like): CP cost per hop.
+            connected (array-like): Whether each hop is already connected.
+        """
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.node_names = tuple(node_names)
+        self.cp_costs = np.asarray(cp_costs, dtype=np.float64)
+        self.connected = np.asarray(connected, dtype=bool)
+
+    @classmethod
+    def from_path(cls, path, node_graph):
+        """
+        Builds the visited path of a list of dense graph indices.
+
+        Parameters:
+            path (list): Dense indices of the visited nodes, from the node to the city or town.
+            node_graph (NodeGraph): The compiled node graph.
+
+        Returns:
+            VisitedPath: The visited path.
+        """
+        path = np.asarray(path, dtype=np.int64)
+        return cls(node_graph.node_ids[path], [node_graph.node_names[node_index] for node_index in path.tolist()], node_graph.cp_cost[path], node_graph.connected[path])
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __eq__(self, other):
+        if not isinstance(other, VisitedPath):
+            return NotImplemented
+        return (
+            self.node_names == other.node_names
+            and np.array_equal(self.node_ids, other.node_ids)
+            and np.array_equal(self.cp_costs, other.cp_costs)
+            and np.array_equal(self.connected, other.connected)
+        )
+
+    def __hash__(self):
+        return hash((self.node_ids.tobytes(), self.node_names))
+
+    def __getstate__(self):
+        return self.node_ids, self.node_names, self.cp_costs, self.connected
+
+    def __setstate__(self, state):
+        self.node_ids, self.node_names, self.cp_costs, self.connected = state
+
+    def connection_cost(self):
+        """
+        Returns the CP still needed to connect every hop.
+
+        Returns:
+            float: The CP cost of the hops that are not connected yet.
+        """
+        return float(self.cp_costs[~self.connected].sum())
+
+    def entries(self):
+        """
+        Returns the display details of the hops, ordered by node ID.
+
+        Returns:
+            list: Tuples of node name, node ID, CP cost and whether the node is already connected.
+        """
+        return [
+            (self.node_names[hop], int(self.node_ids[hop]), float(self.cp_costs[hop]), bool(self.connected[hop]))
+            for hop in np.argsort(self.node_ids, kind="stable").tolist()
+        ]
+
+    def to_records(self):
+        """
+        Returns the hops as JSON-serializable records, in path order.
+
+        Returns:
+            list: One dict per hop with the keys "Node ID", "Node Name", "CP Cost" and "Connected".
+        """
+        return [
+            {"Node ID": int(node_id), "Node Name": node_name, "CP Cost": float(cp_cost), "Connected": bool(is_connected)}
+            for node_id, node_name, cp_cost, is_connected in zip(self.node_ids.tolist(), self.node_names, self.cp_costs.tolist(), self.connected.tolist())
+        ]
+
+    @staticmethod
+    def format_entry(node_name, node_id, node_cp_cost, is_connected):
+        """
+        Formats one hop for display; connected hops are shown as "*0.0 CP".
+
+        Parameters:
+            node_name (str): The node name.
+            node_id (int): The node ID.
+            node_cp_cost (float): The node's CP cost.
+            is_connected (bool): Whether the node is already connected.
+
+        Returns:
+            str: The formatted hop.
+        """
+        connection_cost_text = "*0.0 CP" if is_connected else f"{node_cp_cost} CP"
+        return f"{node_name} (ID: {node_id} - CP: {connection_cost_text})"
+
+    def __str__(self):
+        return ", ".join(self.format_entry(*entry) for entry in self.entries())
+
+    __repr__ = __str__
@@ -0,0 +1,167 @@
+import os
+import zipfile
+import threading
+from data_loader import ExcelDataLoader
+from node_processor import NodeProcessor
+from graph_file import GraphFile
+from player_state import PlayerState
+from workbook_watcher import sheet_hashes, changed_sheets
+
+class WarmProcessorCache:
+    """
+    Keeps a NodeProcessor per workbook in memory between runs, so that repeated queries reuse the parsed sheets
+    and compiled structures, which are built as soon as a workbook is loaded. A workbook is reloaded as soon as its size or modification time changes.
+    Only the sheets whose contents changed are parsed again, and only the structures built from them are rebuilt.
+    A player state file is applied on top of every loaded workbook and re-applied in place when it changes, which
+    never reloads the workbook.
+
+    The cache is safe to use from several threads; a workbook is loaded by one thread while others wait for it.
+
+    Attributes:
+        use_snapshot (bool): Whether loaders read and write the binary workbook snapshot, and processors the graph file.
+        rebuild_snapshot (bool): Whether the snapshot is rebuilt the first time each workbook is loaded.
+        result_cache (ResultCache): The result cache shared by every loaded processor, or None.
+        player_state_path (str): The player state file applied to every loaded processor, or None.
+    """
+
+    def __init__(self, use_snapshot=True, rebuild_snapshot=False, result_cache=None, player_state_path=None):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+            use_snapshot (bool, optional): Whether loaders read and write the binary workbook snapshot, and processors the graph file. Defaults to True.
+            rebuild_snapshot (bool, optional): Whether the snapshot is rebuilt the first time each workbook is loaded. Defaults to False.
+            result_cache (ResultCache, optional): A result cache to share between the loaded processors. Defaults to none.
+            player_state_path (str, optional): A player state file to apply to the loaded processors. Defaults to none.
+        """
+        self.use_snapshot = use_snapshot
+        self.rebuild_snapshot = rebuild_snapshot
+        self.result_cache = result_cache
+        self.player_state_path = player_state_path
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_signature(file_path):
+        """
+        Returns the size and modification time of a file, which change whenever the file is rewritten.
+
+        Parameters:
+            file_path (str): The path to the file.
+
+        Returns:
+            tuple: The file size and modification time in nanoseconds.
+        """
+        file_stat = os.stat(file_path)
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+    def player_state_signature(self):
+        """
+        Returns the signature of the player state file.
+
+        Returns:
+            tuple: The file signature, or None when there is no state file.
+        """
+        try:
+            return self.file_signature(self.player_state_path) if self.player_state_path else None
+        except OSError:
+            return None
+
+    def get_processor(self, file_path):
+        """
+        Returns the NodeProcessor of a workbook, loading it if it is not cached or has changed on disk, with the
+        current player state applied.
+
+        Parameters:
+            file_path (str): The path to the Excel workbook.
+
+        Returns:
+            NodeProcessor: A processor over the workbook's current contents.
+        """
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            signature = self.file_signature(file_path)
+            state_signature = self.player_state_signature()
+            cached_entry = self._entries.get(file_path)
+            if cached_entry is not None and cached_entry[0] == signature:
+                if cached_entry[2] != state_signature:
+                    cached_entry[1].apply_player_state(PlayerState.load(self.player_state_path))
+                    self._entries[file_path] = (signature, cached_entry[1], state_signature, cached_entry[3])
+                return cached_entry[1]
+            loader = ExcelDataLoader(file_path, use_snapshot=self.use_snapshot, rebuild_snapshot=self.rebuild_snapshot and file_path not in self._entries)
+            excel_sheets_data = loader.load_sheets(NodeProcessor.REQUIRED_COLUMNS, NodeProcessor.COLUMN_DTYPES)
+            workbook_hash = loader.content_hash() if self.use_snapshot or self.result_cache is not None else None
+            current_sheet_hashes = self.sheet_hashes(file_path)
+            if cached_entry is not None and cached_entry[3] is not None and current_sheet_hashes is not None:
+                # Only rebuild what the changed sheets feed; the graph file is not used, as the structures taken
+                # over may hold changes applied in memory.
+                processor = cached_entry[1]
+                processor.reload_workbook(excel_sheets_data, changed_sheets(cached_entry[3], current_sheet_hashes), workbook_hash)
+            else:
+                processor = NodeProcessor(excel_sheets_data)
+                if self.use_snapshot:
+                    processor.use_graph_file(GraphFile.for_workbook(file_path), workbook_hash, rebuild=self.rebuild_snapshot and file_path not in self._entries)
+                if self.result_cache is not None:
+                    processor.use_result_cache(self.result_cache, workbook_hash)
+            processor.build_connection_solver()
+            processor.build_yield_index()
+            if self.player_state_path:
+                processor.apply_player_state(PlayerState.load(self.player_state_path))
+            self._entries[file_path] = (signature, processor, state_signature, current_sheet_hashes)
+            return processor
+
+    @staticmethod
+    def sheet_hashes(file_path):
+        """
+        Hashes the sheets of a workbook, so a later change can be narrowed down to the sheets it touched.
+
+        Parameters:
+            file_path (str): The path to the Excel workbook.
+
+        Returns:
+            dict: Sheet names mapped to their hashes, or None when the file is not a readable xlsx workbook.
+        """
+        try:
+            return sheet_hashes(file_path) or None
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return None
+
+    def current_processor(self, file_path):
+        """
+        Returns the cached NodeProcessor of a workbook without loading anything, as long as neither the workbook nor
+        the player state changed on disk since it was loaded.
+
+        Parameters:
+            file_path (str): The path to the Excel workbook.
+
+        Returns:
+            NodeProcessor: The cached processor, or None when get_processor would have to load or update it first.
+        """
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            cached_entry = self._entries.get(file_path)
+            try:
+                if cached_entry is not None and cached_entry[0] == self.file_signature(file_path) and cached_entry[2] == self.player_state_signature():
+                    return cached_entry[1]
+            except OSError:
+                pass
+            return None
+
+    def is_current(self, file_path):
+        """
+        Returns whether a workbook is cached and neither it nor the player state changed on disk.
+
+        Parameters:
+            file_path (str): The path to the Excel workbook.
+
+        Returns:
+            bool: True when the cached processor matches the files on disk.
+        """
+        return self.current_processor(file_path) is not None
+
+    def clear(self):
+        """
+        Drops every cached processor.
+        """
+        with self._lock:
+            self._entries.clear()
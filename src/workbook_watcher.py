@@ -0,0 +1,144 @@
+import os
+import re
+import html
+import time
+import hashlib
+import zipfile
+import posixpath
+import config
+
+# Worksheets are read straight from the xlsx zip: xl/workbook.xml names the sheets and their relationship IDs,
+# xl/_rels/workbook.xml.rels maps those IDs to the worksheet parts, and cells of type "s" hold an index into
+# xl/sharedStrings.xml instead of their text.
+SHEET_ELEMENT = re.compile(rb'<sheet\b([^>]*)>')
+RELATIONSHIP_ELEMENT = re.compile(rb'<Relationship\b([^>]*)>')
+XML_ATTRIBUTE = re.compile(rb'([\w:]+)="([^"]*)"')
+SHARED_STRING_ITEM = re.compile(rb'<si(?:\s*/>|>(.*?)</si>)', re.S)
+SHARED_STRING_CELL = re.compile(rb'(<c\b[^>]*\bt="s"[^>]*>\s*<v>)(\d+)(</v>)')
+
+def sheet_hashes(workbook_path):
+    """
+    Hashes every worksheet of an xlsx workbook separately, from its XML part inside the zip, without parsing any
+    cell. Shared strings are substituted into the cells referencing them first, so a sheet's hash only changes
+    when its own contents do, even when Excel renumbers the workbook's shared strings on save.
+
+    Parameters:
+        workbook_path (str): The path to the Excel workbook.
+
+    Returns:
+        dict: Sheet names mapped to the SHA-256 hash of their contents.
+    """
+    with zipfile.ZipFile(workbook_path) as workbook_zip:
+        part_names = set(workbook_zip.namelist())
+        relationships = [dict(XML_ATTRIBUTE.findall(attributes)) for attributes in RELATIONSHIP_ELEMENT.findall(workbook_zip.read("xl/_rels/workbook.xml.rels"))]
+        targets = {relationship.get(b"Id"): relationship.get(b"Target", b"") for relationship in relationships}
+        shared_strings = []
+        if "xl/sharedStrings.xml" in part_names:
+            shared_strings = [shared_string or b"" for shared_string in SHARED_STRING_ITEM.findall(workbook_zip.read("xl/sharedStrings.xml"))]
+
+        def resolve_shared_string(cell_match):
+            string_index = int(cell_match.group(2))
+            shared_string = shared_strings[string_index] if string_index < len(shared_strings) else cell_match.group(2)
+            return cell_match.group(1) + shared_string + cell_match.group(3)
+
+        hashes = {}
+        for attributes in SHEET_ELEMENT.findall(workbook_zip.read("xl/workbook.xml")):
+            sheet = dict(XML_ATTRIBUTE.findall(attributes))
+            sheet_name = sheet.get(b"name", b"")
+            target = targets.get(sheet.get(b"r:id"), b"").decode("utf-8")
+            part_name = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            if part_name not in part_names:
+                continue
+            hashes[html.unescape(sheet_name.decode("utf-8"))] = hashlib.sha256(SHARED_STRING_CELL.sub(resolve_shared_string, workbook_zip.read(part_name))).hexdigest()
+    return hashes
+
+def changed_sheets(previous_hashes, current_hashes):
+    """
+    Compares two sets of sheet hashes.
+
+    Parameters:
+        previous_hashes (dict): Sheet names mapped to their hashes before the change.
+        current_hashes (dict): Sheet names mapped to their hashes after the change.
+
+    Returns:
+        set: The names of the sheets that changed, were added or were removed.
+    """
+    return {sheet_name for sheet_name in set(previous_hashes) | set(current_hashes) if previous_hashes.get(sheet_name) != current_hashes.get(sheet_name)}
+
+
+class FileWatcher:
+    """
+    Watches files for changes by polling their size and modification time, which needs no platform-specific
+    notification API and also notices files replaced by an atomic rename, as Excel and the player state do on save.
+
+    Changes are debounced: they are only reported once the files have stayed unchanged for debounce_seconds, so a
+    burst of saves is reported once.
+
+    Attributes:
+        file_paths (list): The watched files.
+        poll_interval (float): Seconds between two checks.
+        debounce_seconds (float): Seconds the files must stay unchanged before a change is reported.
+    """
+
+    def __init__(self, file_paths, poll_interval=config.WATCH_POLL_INTERVAL, debounce_seconds=config.WATCH_DEBOUNCE_SECONDS):
+        """
+        Starts watching files, taking their current state as unchanged.
+
+        Parameters:
+            file_paths (list): The files to watch; missing files are watched for being created.
+            poll_interval (float, optional): Seconds between two checks. Defaults to config.WATCH_POLL_INTERVAL.
+            debounce_seconds (float, optional): Seconds of quiet before a change is reported. Defaults to config.WATCH_DEBOUNCE_SECONDS.
+        """
+        self.file_paths = [os.path.abspath(file_path) for file_path in file_paths]
+        self.poll_interval = poll_interval
+        self.debounce_seconds = debounce_seconds
+        self._reported_signatures = self.signatures()
+        self._seen_signatures = self._reported_signatures
+        self._changed_at = None
+
+    def signatures(self):
+        """
+        Returns the current size and modification time of every watched file.
+
+        Returns:
+            dict: File paths mapped to their size and modification time in nanoseconds, or None when missing.
+        """
+        signatures = {}
+        for file_path in self.file_paths:
+            try:
+                file_stat = os.stat(file_path)
+                signatures[file_path] = (file_stat.st_size, file_stat.st_mtime_ns)
+            except OSError:
+                signatures[file_path] = None
+        return signatures
+
+    def poll(self):
+        """
+        Checks the files once, without waiting.
+
+        Returns:
+            list: The files that changed since the last report, once they have settled; otherwise an empty list.
+        """
+        signatures = self.signatures()
+        if signatures != self._seen_signatures:
+            self._seen_signatures = signatures
+            self._changed_at = time.monotonic()
+        if self._changed_at is None or time.monotonic() - self._changed_at < self.debounce_seconds:
+            return []
+        self._changed_at = None
+        changed_paths = [file_path for file_path in self.file_paths if signatures[file_path] != self._reported_signatures[file_path]]
+        self._reported_signatures = signatures
+        return changed_paths
+
+    def wait_for_changes(self):
+        """
+        Blocks until some of the files have changed and settled.
+
+        Returns:
+            list: The files that changed.
+        """
+        while True:
+            changed_paths = self.poll()
+            if changed_paths:
+                return changed_paths
+            time.sleep(self.poll_interval)
@@ -0,0 +1,190 @@
+import re
+import bisect
+import numpy as np
+import pandas as pd
+import config
+
+class YieldIndex:
+    """
+    An inverted index from normalized yield names to the Node IDs that produce them, built once from the
+    "Node Yields" sheet. Yield names are normalized by case-folding and collapsing whitespace, and can be
+    looked up exactly, by prefix, or by edit distance to resolve misspelled names.
+
+    Attributes:
+        node_ids_by_yield (dict): Normalized yield names mapped to sorted arrays of Node IDs.
+        yield_names (list): All normalized yield names in sorted order.
+        yields_by_node_id (dict): Node IDs mapped to the sorted normalized names of the yields they produce.
+    """
+
+    def __init__(self, node_yields_data):
+        """
+        Builds the index from the "Node Yields" sheet.
+
+        Parameters:
+            node_yields_data (DataFrame): Data for node yields.
+        """
+        yield_columns = [config.COLUMN_YIELD_1, config.COLUMN_YIELD_2]
+        stacked_yields = pd.DataFrame({
+            "yield": pd.concat([node_yields_data[column].astype(object) for column in yield_columns], ignore_index=True),
+            "node_id": np.tile(node_yields_data[config.COLUMN_NODE_ID].to_numpy(dtype=np.int64), len(yield_columns)),
+        }).dropna()
+        unique_names = stacked_yields["yield"].unique()
+        normalized_names = dict(zip(unique_names, map(self.normalize_yield_name, unique_names)))
+        stacked_yields["yield"] = stacked_yields["yield"].map(normalized_names)
+        stacked_yields = stacked_yields[stacked_yields["yield"] != ""]
+
+        self.node_ids_by_yield = {
+            yield_name: np.unique(node_ids)
+            for yield_name, node_ids in stacked_yields.groupby("yield", sort=False)["node_id"]
+        }
+        self.yield_names = sorted(self.node_ids_by_yield)
+        self.yields_by_node_id = {
+            node_id: sorted(set(yield_names))
+            for node_id, yield_names in stacked_yields.groupby("node_id", sort=False)["yield"]
+        }
+
+    @staticmethod
+    def normalize_yield_name(yield_name):
+        """
+        Normalizes a yield name by case-folding it and collapsing runs of whitespace into single spaces.
+
+        Parameters:
+            yield_name (str): The yield name to normalize.
+
+        Returns:
+            str: The normalized yield name.
+        """
+        return re.sub(r"\s+", " ", str(yield_name)).strip().casefold()
+
+    def lookup(self, yield_name):
+        """
+        Returns the Node IDs producing a yield, matched exactly after normalization.
+
+        Parameters:
+            yield_name (str): The yield name.
+
+        Returns:
+            ndarray: The sorted Node IDs, empty when the yield is unknown.
+        """
+        return self.node_ids_by_yield.get(self.normalize_yield_name(yield_name), np.empty(0, dtype=np.int64))
+
+    def prefix_matches(self, prefix):
+        """
+        Returns every normalized yield name starting with a prefix.
+
+        Parameters:
+            prefix (str): The prefix to match.
+
+        Returns:
+            list: The matching yield names in sorted order.
+        """
+        prefix = self.normalize_yield_name(prefix)
+        start = bisect.bisect_left(self.yield_names, prefix)
+        end = start
+        while end < len(self.yield_names) and self.yield_names[end].startswith(prefix):
+            end += 1
+        return self.yield_names[start:end]
+
+    def fuzzy_matches(self, yield_name, max_distance=None):
+        """
+        Returns the normalized yield names within an edit distance of a yield name, closest first.
+
+        Parameters:
+            yield_name (str): The yield name.
+            max_distance (int, optional): The largest accepted edit distance. Defaults to config.YIELD_FUZZY_MAX_DISTANCE,
+                or one edit for names of at most config.YIELD_FUZZY_SHORT_NAME_LENGTH characters.
+
+        Returns:
+            list: Tuples of (edit distance, yield name), sorted by distance and then name.
+        """
+        yield_name = self.normalize_yield_name(yield_name)
+        if max_distance is None:
+            max_distance = config.YIELD_FUZZY_MAX_DISTANCE if len(yield_name) > config.YIELD_FUZZY_SHORT_NAME_LENGTH else min(config.YIELD_FUZZY_MAX_DISTANCE, 1)
+        matches = []
+        for candidate in self.yield_names:
+            if abs(len(candidate) - len(yield_name)) > max_distance:
+                continue
+            distance = self.edit_distance(yield_name, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return sorted(matches)
+
+    def resolve(self, yield_name):
+        """
+        Resolves a requested yield name to a known yield: an exact match first, then the only yield starting
+        with the name, then the closest yield by edit distance.
+
+        Parameters:
+            yield_name (str): The requested yield name.
+
+        Returns:
+            str: The resolved normalized yield name, or None when nothing is close enough.
+        """
+        normalized_name = self.normalize_yield_name(yield_name)
+        if normalized_name in self.node_ids_by_yield:
+            return normalized_name
+        if not normalized_name:
+            return None
+        prefix_matches = self.prefix_matches(normalized_name)
+        if len(prefix_matches) == 1:
+            return prefix_matches[0]
+        fuzzy_matches = self.fuzzy_matches(normalized_name)
+        return fuzzy_matches[0][1] if fuzzy_matches else None
+
+    def lookup_many(self, yield_names):
+        """
+        Resolves a batch of yield names and returns the Node IDs for each of them.
+
+        Parameters:
+            yield_names (iterable): The requested yield names.
+
+        Returns:
+            dict: Each requested name mapped to a tuple of (resolved yield name or None, Node IDs).
+        """
+        results = {}
+        for yield_name in yield_names:
+            resolved_name = self.resolve(yield_name)
+            results[yield_name] = (resolved_name, self.node_ids_by_yield.get(resolved_name, np.empty(0, dtype=np.int64)))
+        return results
+
+    def yields_of(self, node_ids):
+        """
+        Returns the yields produced by any of the given nodes.
+
+        Parameters:
+            node_ids (ndarray): Node IDs to look up.
+
+        Returns:
+            list: The normalized yield names in sorted order.
+        """
+        yield_names = set()
+        for node_id in np.asarray(node_ids, dtype=np.int64).tolist():
+            yield_names.update(self.yields_by_node_id.get(node_id, ()))
+        return sorted(yield_names)
+
+    @staticmethod
+    def edit_distance(source, target, max_distance):
+        """
+        Computes the Levenshtein distance between two strings, giving up once it exceeds max_distance.
+
+        Parameters:
+            source (str): The first string.
+            target (str): The second string.
+            max_distance (int): The distance beyond which the exact value is not needed.
+
+        Returns:
+            int: The edit distance, or max_distance + 1 when it is larger than max_distance.
+        """
+        previous_row = list(range(len(target) + 1))
+        for source_position, source_character in enumerate(source, 1):
+            current_row = [source_position]
+            for target_position, target_character in enumerate(target, 1):
+                current_row.append(min(
+                    previous_row[target_position] + 1,
+                    current_row[target_position - 1] + 1,
+                    previous_row[target_position - 1] + (source_character != target_character),
+                ))
+            if min(current_row) > max_distance:
+                return max_distance + 1
+            previous_row = current_row
+        return min(previous_row[-1], max_distance + 1)
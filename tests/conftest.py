@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules in src/ import each other by name, as when run from there; the synthetic workbook generator used by
+# the tests lives with the benchmarks.
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPOSITORY_DIRECTORY, "src"))
+sys.path.insert(0, os.path.join(REPOSITORY_DIRECTORY, "benchmarks"))
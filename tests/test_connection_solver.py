@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from connection_solver import ConnectionSolver
+from node_processor import NodeProcessor
+from synthetic_graph import generate_synthetic_sheets
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_update_equals_full_solve(seed):
+    processor = NodeProcessor(generate_synthetic_sheets(400, seed=seed))
+    node_graph = processor.build_node_graph()
+    connection_solver = processor.build_connection_solver()
+    random_generator = np.random.default_rng(seed)
+    city_indices = np.flatnonzero(node_graph.city_town_mask)
+
+    for _ in range(6):
+        changed_node_indices = set(random_generator.choice(node_graph.node_count, 12, replace=False).tolist())
+        for node_index in changed_node_indices:
+            node_graph.connected[node_index] = not node_graph.connected[node_index]
+        for city_index in random_generator.choice(city_indices, 2, replace=False).tolist():
+            node_graph.lodging_cp_cost[city_index] = float(random_generator.integers(0, 6))
+            changed_node_indices.add(city_index)
+        connection_solver.update(changed_node_indices)
+
+        full_solve = ConnectionSolver(node_graph)
+        np.testing.assert_allclose(connection_solver.total_cost, full_solve.total_cost)
+        # Paths of equal Total CP may end at different cities, so the paths are checked against their own costs.
+        for node_index in np.flatnonzero(np.isfinite(full_solve.total_cost)).tolist():
+            path = connection_solver.path(node_index)
+            assert node_graph.connection_costs()[path].sum() == pytest.approx(connection_solver.path_cost[node_index])
+            assert connection_solver.path_cost[node_index] + connection_solver.lodging_cp_cost[path[-1]] == pytest.approx(full_solve.total_cost[node_index])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from node_processor import NodeProcessor
+from path_ranker import PathRanker
+from synthetic_graph import generate_synthetic_sheets
+
+def all_plans(node_graph, candidate_indices):
+    """Enumerates every simple path from a candidate node to a city or town with its Total CP."""
+    node_costs = node_graph.connection_costs()
+    plans = []
+
+    def extend(path, path_cp):
+        node_index = path[-1]
+        if node_graph.city_town_mask[node_index] and np.isfinite(node_graph.lodging_cp_cost[node_index]):
+            plans.append((path_cp + node_graph.lodging_cp_cost[node_index], list(path)))
+        for next_index in node_graph.adjacency_indices[node_graph.adjacency_offsets[node_index]:node_graph.adjacency_offsets[node_index + 1]].tolist():
+            if next_index not in path:
+                path.append(next_index)
+                extend(path, path_cp + node_costs[next_index])
+                path.pop()
+
+    for candidate_index in candidate_indices:
+        extend([candidate_index], node_costs[candidate_index])
+    return plans
+
+@pytest.mark.parametrize("seed", range(4))
+def test_rank_equals_brute_force(seed):
+    processor = NodeProcessor(generate_synthetic_sheets(18, mean_degree=2.6, city_density=0.15, seed=seed))
+    node_graph = processor.build_node_graph()
+    path_ranker = PathRanker(node_graph, processor.build_connection_solver())
+    random_generator = np.random.default_rng(seed)
+    candidate_indices = random_generator.choice(node_graph.node_count, 3, replace=False)
+
+    expected_costs = sorted(total_cp for total_cp, _ in all_plans(node_graph, candidate_indices.tolist()))
+    for k in (1, 3, 8):
+        ranked_paths = path_ranker.rank(candidate_indices, k)
+        assert [total_cp for total_cp, _ in ranked_paths] == pytest.approx(expected_costs[:k])
+        assert len({tuple(path) for _, path in ranked_paths}) == len(ranked_paths)
+        for total_cp, path in ranked_paths:
+            assert path_ranker.path_cost(path) == pytest.approx(total_cp)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from connection_solver import ConnectionSolver
+from node_processor import NodeProcessor
+from synthetic_graph import generate_synthetic_sheets
+
+@pytest.mark.parametrize("seed", range(4))
+def test_region_overlay_equals_flat_solver(seed):
+    # Regions of 100 nodes, so paths regularly cross several of them
+    sheets = generate_synthetic_sheets(600, seed=seed)
+    node_names_and_regions = sheets["Nodes Name & Region"]
+    node_names_and_regions["Node Region"] = [f"Region {(node_id - 1) // 100}" for node_id in node_names_and_regions["Node ID"]]
+    processor = NodeProcessor(sheets)
+    node_graph = processor.build_node_graph()
+    region_router = processor.build_region_router()
+    connection_solver = processor.build_connection_solver()
+
+    routed_connections = region_router.connections(np.arange(node_graph.node_count))
+    for node_index in range(node_graph.node_count):
+        total_cost, path = region_router.route(node_index)
+        assert total_cost == pytest.approx(connection_solver.total_cost[node_index])
+        if np.isfinite(total_cost):
+            assert path[0] == node_index and node_graph.city_town_mask[path[-1]]
+            assert node_graph.connection_costs()[path].sum() + node_graph.lodging_cp_cost[path[-1]] == pytest.approx(total_cost)
+        assert routed_connections.is_reachable(node_index) == connection_solver.is_reachable(node_index)
+
+    # After a change, only the changed regions are rebuilt and the answers still match a fresh solve.
+    changed_node_indices = set(np.random.default_rng(seed).choice(node_graph.node_count, 20, replace=False).tolist())
+    for node_index in changed_node_indices:
+        node_graph.connected[node_index] = not node_graph.connected[node_index]
+    region_router.update(changed_node_indices)
+    full_solve = ConnectionSolver(node_graph)
+    for node_index in range(node_graph.node_count):
+        assert region_router.route(node_index)[0] == pytest.approx(full_solve.total_cost[node_index])